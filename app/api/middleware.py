@@ -1,45 +1,157 @@
 import time
-from fastapi import Request, HTTPException
+
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logger import logger, should_log
+from app.core.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+from app.core.profiler import RequestProfile, current_profile, finish
+
+
+class LoggingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-from app.core.config import settings
-from app.core.logger import logger
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        start_time = time.perf_counter()
+        status_code = None
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = None
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
         try:
-            response = await call_next(request)
-            process_time = (time.time() - start_time) * 1000
-            logger.info(
-                f"{request.method} {request.url.path} "
-                f"-> {response.status_code} ({process_time:.2f} ms)"
-            )
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            logger.exception(f"Ошибка при обработке запроса {request.url.path}: {e}")
+            logger.exception(f"Ошибка при обработке запроса {scope['path']}: {e}")
             raise
         finally:
-            if not response:
-                logger.warning(f"{request.method} {request.url.path} завершился без ответа.")
+            if status_code is None:
+                logger.warning(f"{scope['method']} {scope['path']} завершился без ответа.")
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        if not should_log(route, status_code):
+            return
+        process_time = (time.perf_counter() - start_time) * 1000
+        logger.info(
+            f"{scope['method']} {scope['path']} "
+            f"-> {status_code} ({process_time:.2f} ms)",
+            extra={
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status_code,
+                "duration_ms": round(process_time, 2),
+            },
+        )
+
+
+class ExceptionHandlerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
-class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         try:
-            return await call_next(request)
-        except HTTPException as e:
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"error": e.detail, "path": request.url.path},
-            )
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            logger.exception(f"Необработанная ошибка: {e}")
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Internal Server Error", "path": request.url.path},
-            )
+            # заголовки уже отправлены — подменить ответ нельзя
+            if response_started:
+                raise
+            if isinstance(e, HTTPException):
+                response = JSONResponse(
+                    status_code=e.status_code,
+                    content={"error": e.detail, "path": scope["path"]},
+                )
+            else:
+                logger.exception(f"Необработанная ошибка: {e}")
+                response = JSONResponse(
+                    status_code=500,
+                    content={"error": "Internal Server Error", "path": scope["path"]},
+                )
+            await response(scope, receive, send)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # labels() берёт lock и строит ключ — дочерние метрики кэшируются
+        self._children: dict[tuple[str, str, int], tuple] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # шаблон пути, а не сам путь: иначе метка растёт без ограничений
+            route = getattr(scope.get("route"), "path", "unmatched")
+            key = (scope["method"], route, status_code)
+            children = self._children.get(key)
+            if children is None:
+                children = self._children[key] = (
+                    HTTP_REQUESTS.labels(*key),
+                    HTTP_LATENCY.labels(*key[:2]),
+                )
+            children[0].inc()
+            children[1].observe(time.perf_counter() - start_time)
+
+
+class ProfilerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(method=scope["method"], path=scope["path"])
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"server-timing", profile.server_timing().encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", None)
+            finish(profile)
@@ -0,0 +1,59 @@
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from app.core.profiler import span
+from app.schemas import serializers
+from app.services.etag import Versioned, etag_matches, make_etag
+
+
+class PayloadResponse(ORJSONResponse):
+    """orjson response that also writes asyncpg UUIDs"""
+
+    def render(self, content: Any) -> bytes:
+        return serializers.dumps(content)
+
+
+def respond(payload: Any, headers: dict[str, str] | None = None) -> Any:
+    """
+    ready dict payloads go straight to orjson, skipping the second
+    response_model validation, ready JSON bytes are sent as is; pydantic
+    models take the regular path unless headers have to be set.
+    """
+    if isinstance(payload, dict):
+        with span("serialize"):
+            return PayloadResponse(payload, headers=headers)
+    if isinstance(payload, bytes):
+        # JSON, собранный базой (json_agg)
+        return Response(
+            payload, media_type="application/json", headers=headers
+        )
+    if headers and isinstance(payload, BaseModel):
+        with span("serialize"):
+            return PayloadResponse(
+                payload.model_dump(mode="json", by_alias=True),
+                headers=headers,
+            )
+    return payload
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def respond_versioned(
+    result: Versioned, if_none_match: str | None, etag: str
+) -> Any:
+    """304 without serializing when the client already has this version"""
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return respond(result.value, headers={"ETag": etag})
+
+
+def list_etag(request: Request, version: str) -> str:
+    """weak: same entities, same request parameters"""
+    return make_etag(
+        version, request.url.path, request.url.query, weak=True
+    )
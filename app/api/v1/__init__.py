@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from app.api.v1.org_router import router as organization_router
+from app.api.v1.activity_router import router as activity_router
 
 api_router = APIRouter()
 api_router.include_router(organization_router)
+api_router.include_router(activity_router)
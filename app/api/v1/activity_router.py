@@ -0,0 +1,70 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Query, HTTPException, status, Depends, \
+    Header, Request
+
+from app.api.responses import respond_versioned
+from app.api.v1.dependencies import get_activity_service, verify_api_key
+from app.schemas.activity import ActivityTree, ActivityTreeResponse
+from app.services.activity_service import ActivityService
+from app.services.etag import make_etag
+
+router = APIRouter(
+    prefix="/activities",
+    tags=["Activities"],
+    dependencies=[Depends(verify_api_key)]
+)
+
+WITH_COUNTS = Query(
+    False,
+    description="Число организаций в каждом узле (включая вложенные виды)",
+)
+
+
+@router.get(
+    "/tree",
+    response_model=ActivityTreeResponse,
+    summary="Дерево видов деятельности",
+)
+async def get_tree(
+    request: Request,
+    with_counts: bool = WITH_COUNTS,
+    service: ActivityService = Depends(get_activity_service),
+    if_none_match: str | None = Header(None),
+):
+    result = await service.get_tree(with_counts)
+    return respond_versioned(
+        result, if_none_match,
+        make_etag(result.version, request.url.path, request.url.query),
+    )
+
+
+@router.get(
+    "/{activity_id}/subtree",
+    response_model=ActivityTree,
+    summary="Поддерево вида деятельности",
+)
+async def get_subtree(
+    request: Request,
+    activity_id: UUID,
+    max_depth: int = Query(
+        3, ge=1, le=3,
+        description="Сколько уровней дерева отдавать (1 — только сам вид)",
+    ),
+    with_counts: bool = WITH_COUNTS,
+    service: ActivityService = Depends(get_activity_service),
+    if_none_match: str | None = Header(None),
+):
+    try:
+        result = await service.get_subtree(activity_id, max_depth, with_counts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Вид деятельности с ID={activity_id} не найден",
+        )
+    return respond_versioned(
+        result, if_none_match,
+        make_etag(result.version, request.url.path, request.url.query),
+    )
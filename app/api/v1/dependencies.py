@@ -1,34 +1,142 @@
-from http.client import HTTPException
+from dataclasses import dataclass
 
-from fastapi import Depends, Security
+from fastapi import Depends, Header, HTTPException, Query, Security
 from fastapi.security import APIKeyHeader
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.core.config import settings
-from app.database.database import get_db_session
+from app.database.database import get_db_session, get_read_session
+from app.repositories.activity_repo import ActivityRepository
+from app.repositories.document_repo import OrganizationDocumentRepository
+from app.repositories.json_repo import OrganizationJsonRepository
 from app.repositories.org_repo import OrganizationRepository
+from app.schemas.serializers import SHORT_FIELDS
+from app.services.activity_service import ActivityService
 from app.services.org_service import OrganizationService
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
-async def get_db() -> AsyncSession:
-    async with get_db_session() as session:
+def get_client_id(
+        client_id: str | None = Header(
+            None, alias="X-Client-Id", max_length=128,
+            description="Идентификатор клиента для read-your-writes: после "
+                        "его записи его же чтения идут в primary",
+        ),
+) -> str | None:
+    # API_KEY один на всех клиентов и клиента не различает: без заголовка
+    # чтения не закрепляются за primary
+    return client_id or None
+
+
+async def get_db(
+        client_id: str | None = Depends(get_client_id),
+) -> AsyncSession:
+    async with get_db_session(pin_key=client_id) as session:
+        yield session
+
+
+async def get_read_db(
+        client_id: str | None = Depends(get_client_id),
+) -> AsyncSession:
+    async with get_read_session(pin_key=client_id) as session:
         yield session
 
 
 async def get_organization_repository(
-        session: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_read_db),
 ) -> OrganizationRepository:
     return OrganizationRepository(session)
 
 
+async def get_activity_repository(
+        session: AsyncSession = Depends(get_read_db),
+) -> ActivityRepository:
+    return ActivityRepository(session)
+
+
+async def get_document_repository(
+        session: AsyncSession = Depends(get_read_db),
+) -> OrganizationDocumentRepository:
+    return OrganizationDocumentRepository(session)
+
+
+async def get_json_repository(
+        session: AsyncSession = Depends(get_read_db),
+) -> OrganizationJsonRepository:
+    return OrganizationJsonRepository(session)
+
+
 async def get_organization_service(
         repository: OrganizationRepository = Depends(
             get_organization_repository),
+        activity_repository: ActivityRepository = Depends(
+            get_activity_repository),
+        document_repository: OrganizationDocumentRepository = Depends(
+            get_document_repository),
+        json_repository: OrganizationJsonRepository = Depends(
+            get_json_repository),
 ) -> OrganizationService:
-    return OrganizationService(repository)
+    return OrganizationService(
+        repository, activity_repository, document_repository,
+        json_repository,
+    )
+
+
+async def get_activity_service(
+        repository: ActivityRepository = Depends(get_activity_repository),
+) -> ActivityService:
+    return ActivityService(repository)
+
+
+@dataclass(slots=True)
+class PageParams:
+    limit: int
+    cursor: str | None
+    with_total: bool
+
+
+def get_page_params(
+        limit: int = Query(
+            settings.page_size_default, ge=1, le=settings.page_size_max,
+            description="Размер страницы",
+        ),
+        cursor: str | None = Query(
+            None, description="Курсор из next_cursor предыдущей страницы"
+        ),
+        with_total: bool = Query(
+            False, description="Посчитать общее количество (доп. запрос)"
+        ),
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor, with_total=with_total)
+
+
+def get_fields_param(
+        fields: str | None = Query(
+            None,
+            description="Поля элементов списка через запятую: "
+                        + ", ".join(SHORT_FIELDS),
+        ),
+) -> tuple[str, ...] | None:
+    """requested list item fields in schema order, None for all of them"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указано ни одного поля",
+        )
+    unknown = requested.difference(SHORT_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные поля: {', '.join(sorted(unknown))}",
+        )
+    if len(requested) == len(SHORT_FIELDS):
+        return None
+    return tuple(name for name in SHORT_FIELDS if name in requested)
 
 
 async def verify_api_key(api_key: str = Security(api_key_header)):
@@ -1,10 +1,21 @@
+from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Query, HTTPException, status, Depends
+from fastapi import APIRouter, Query, HTTPException, status, Depends, \
+    Header, Request
+from fastapi.responses import StreamingResponse
 
-from app.api.v1.dependencies import get_organization_service, verify_api_key
+from app.api.responses import respond, respond_versioned, list_etag, \
+    not_modified
+from app.api.v1.dependencies import get_organization_service, verify_api_key, \
+    get_page_params, PageParams, get_fields_param
+from app.core.config import settings
 from app.schemas.org_response import OrganizationListResponse, \
-    OrganizationDetailResponse
+    OrganizationDetailResponse, OrganizationNearbyResponse, \
+    OrganizationBatchResponse, ActivityFacetResponse, BuildingFacetResponse
+from app.schemas.organization import OrganizationBatchRequest
+from app.services.etag import etag_matches, make_etag
+from app.services.export import EXPORT_FORMATS
 from app.services.org_service import OrganizationService
 
 router = APIRouter(
@@ -20,10 +31,23 @@ router = APIRouter(
     summary="Организации в конкретном здании",
 )
 async def get_by_building(
+    request: Request,
     building_id: UUID,
+    page: PageParams = Depends(get_page_params),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
     service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
 ):
-    return await service.get_by_building(building_id)
+    try:
+        result = await service.get_by_building(
+            building_id, page.limit, page.cursor, page.with_total,
+            fields=fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
 
 
 @router.get(
@@ -32,13 +56,27 @@ async def get_by_building(
     summary="Организации по виду деятельности (включая вложенные категории)",
 )
 async def get_by_activity(
+    request: Request,
     activity_id: UUID,
+    max_depth: int = Query(
+        3, ge=1, le=3,
+        description="Сколько уровней дерева учитывать (1 — только сам вид)",
+    ),
+    page: PageParams = Depends(get_page_params),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
     service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
 ):
     try:
-        return await service.get_by_activity(activity_id)
+        result = await service.get_by_activity(
+            activity_id, page.limit, page.cursor, page.with_total,
+            max_depth=max_depth, fields=fields,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
 
 
 @router.get(
@@ -47,13 +85,50 @@ async def get_by_activity(
     summary="Организации в заданной области по координатам",
 )
 async def get_in_area(
+    request: Request,
     lat_min: float = Query(..., description="Минимальная широта"),
     lat_max: float = Query(..., description="Максимальная широта"),
     lon_min: float = Query(..., description="Минимальная долгота"),
     lon_max: float = Query(..., description="Максимальная долгота"),
+    page: PageParams = Depends(get_page_params),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
+    service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
+):
+    try:
+        result = await service.get_in_area(
+            lat_min, lat_max, lon_min, lon_max,
+            page.limit, page.cursor, page.with_total, fields=fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
+
+
+@router.get(
+    "/nearby",
+    response_model=OrganizationNearbyResponse,
+    summary="Ближайшие организации к точке (по расстоянию)",
+)
+async def get_nearby(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Широта точки"),
+    lon: float = Query(..., ge=-180, le=180, description="Долгота точки"),
+    radius: float | None = Query(
+        None, gt=0, le=settings.geo_max_radius_m,
+        description="Радиус поиска в метрах",
+    ),
+    k: int = Query(10, ge=1, le=100, description="Сколько ближайших вернуть"),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
     service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
 ):
-    return await service.get_in_area(lat_min, lat_max, lon_min, lon_max)
+    result = await service.get_nearby(lat, lon, k, radius, fields=fields)
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
 
 
 @router.get(
@@ -62,14 +137,175 @@ async def get_in_area(
     summary="Поиск организаций по названию",
 )
 async def search_by_name(
+    request: Request,
     q: str = Query(..., min_length=2,
                    description="Поисковый запрос (название организации)"),
+    page: PageParams = Depends(get_page_params),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
+    service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
+):
+    try:
+        result = await service.search_by_name(
+            q, page.limit, page.cursor, page.with_total, fields=fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
+
+
+@router.get(
+    "/query",
+    response_model=OrganizationListResponse,
+    summary="Организации по сочетанию фильтров",
+)
+async def query(
+    request: Request,
+    activity_id: UUID | None = Query(
+        None, description="Вид деятельности (включая вложенные)",
+    ),
+    max_depth: int = Query(3, ge=1, le=3),
+    building_id: UUID | None = Query(None, description="Здание"),
+    lat_min: float | None = Query(None, description="Область: мин. широта"),
+    lat_max: float | None = Query(None, description="Область: макс. широта"),
+    lon_min: float | None = Query(None, description="Область: мин. долгота"),
+    lon_max: float | None = Query(None, description="Область: макс. долгота"),
+    lat: float | None = Query(None, ge=-90, le=90, description="Широта точки"),
+    lon: float | None = Query(
+        None, ge=-180, le=180, description="Долгота точки",
+    ),
+    radius: float | None = Query(
+        None, gt=0, le=settings.geo_max_radius_m,
+        description="Радиус вокруг точки в метрах",
+    ),
+    q: str | None = Query(None, min_length=2, description="Часть названия"),
+    sort: Literal["name", "relevance", "distance"] = Query(
+        "name",
+        description="name; relevance — по совпадению с q; "
+                    "distance — по ближайшему к точке офису",
+    ),
+    page: PageParams = Depends(get_page_params),
+    fields: tuple[str, ...] | None = Depends(get_fields_param),
     service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
 ):
     try:
-        return await service.search_by_name(q)
+        result = await service.query(
+            page.limit, page.cursor, page.with_total, fields=fields,
+            activity_id=activity_id, max_depth=max_depth,
+            building_id=building_id,
+            lat_min=lat_min, lat_max=lat_max,
+            lon_min=lon_min, lon_max=lon_max,
+            lat=lat, lon=lon, radius_m=radius, q=q, sort=sort,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond_versioned(
+        result, if_none_match, list_etag(request, result.version)
+    )
+
+
+@router.get(
+    "/facets/activities",
+    response_model=ActivityFacetResponse,
+    summary="Число организаций по видам деятельности (с вложенными)",
+)
+async def facets_by_activity(
+    lat_min: float | None = Query(None, description="Область: мин. широта"),
+    lat_max: float | None = Query(None, description="Область: макс. широта"),
+    lon_min: float | None = Query(None, description="Область: мин. долгота"),
+    lon_max: float | None = Query(None, description="Область: макс. долгота"),
+    q: str | None = Query(None, min_length=2, description="Часть названия"),
+    service: OrganizationService = Depends(get_organization_service),
+):
+    try:
+        return respond(await service.facets_by_activity(
+            lat_min, lat_max, lon_min, lon_max, q=q,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/facets/buildings",
+    response_model=BuildingFacetResponse,
+    summary="Число организаций по зданиям",
+)
+async def facets_by_building(
+    limit: int = Query(
+        settings.page_size_default, ge=1, le=settings.page_size_max,
+        description="Сколько зданий вернуть (по убыванию числа организаций)",
+    ),
+    lat_min: float | None = Query(None, description="Область: мин. широта"),
+    lat_max: float | None = Query(None, description="Область: макс. широта"),
+    lon_min: float | None = Query(None, description="Область: мин. долгота"),
+    lon_max: float | None = Query(None, description="Область: макс. долгота"),
+    q: str | None = Query(None, min_length=2, description="Часть названия"),
+    service: OrganizationService = Depends(get_organization_service),
+):
+    try:
+        return respond(await service.facets_by_building(
+            limit, lat_min, lat_max, lon_min, lon_max, q=q,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post(
+    "/batch",
+    response_model=OrganizationBatchResponse,
+    summary="Получить несколько организаций по списку ID",
+)
+async def get_batch(
+    body: OrganizationBatchRequest,
+    service: OrganizationService = Depends(get_organization_service),
+):
+    try:
+        return respond(await service.get_batch(body.ids))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка каталога потоком (NDJSON или CSV)",
+    response_class=StreamingResponse,
+)
+async def export(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    activity_id: UUID | None = Query(
+        None, description="Только организации этого вида деятельности",
+    ),
+    max_depth: int = Query(3, ge=1, le=3),
+    lat_min: float | None = Query(None),
+    lat_max: float | None = Query(None),
+    lon_min: float | None = Query(None),
+    lon_max: float | None = Query(None),
+    accept_encoding: str | None = Header(None),
+    service: OrganizationService = Depends(get_organization_service),
+):
+    compress = (
+        settings.export_gzip_level > 0
+        and "gzip" in (accept_encoding or "").lower()
+    )
+    try:
+        stream = await service.export(
+            format, activity_id, max_depth,
+            (lat_min, lat_max, lon_min, lon_max), compress=compress,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = {
+        "Content-Disposition":
+            f'attachment; filename="organizations.{extension}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
 
 
 @router.get(
@@ -80,11 +316,19 @@ async def search_by_name(
 async def get_by_id(
     organization_id: UUID,
     service: OrganizationService = Depends(get_organization_service),
+    if_none_match: str | None = Header(None),
 ):
-    org = await service.get_by_id(organization_id)
-    if not org:
+    if if_none_match:
+        # проверка версии одним запросом, без загрузки связей
+        version = await service.get_version(organization_id)
+        if version is not None:
+            etag = make_etag(version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+    result = await service.get_by_id(organization_id)
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Организация с ID={organization_id} не найдена",
         )
-    return org
+    return respond_versioned(result, if_none_match, make_etag(result.version))
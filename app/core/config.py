@@ -11,9 +11,85 @@ class Settings(BaseSettings):
     postgres_user: str
     postgres_password: str
     postgres_db: str
+    # реплики только для чтения, например
+    # DATABASE_REPLICA_URLS='["postgresql+asyncpg://...@replica:5432/db"]'
+    database_replica_urls: list[str] = []
+    # round_robin | least_connections
+    replica_balance: str = "round_robin"
+    replica_check_interval_s: float = 5
+    # после записи чтения клиента (заголовок X-Client-Id) идут в primary
+    # столько секунд (0 — выкл.)
+    read_your_writes_s: float = 0
+    # кэш скомпилированного SQL в SQLAlchemy (на engine)
+    db_query_cache_size: int = 1000
+    # кэш prepared statements asyncpg на соединение (0 — выкл.)
+    db_prepared_statement_cache_size: int = 500
+    # чтения (GET) в autocommit: без BEGIN/ROLLBACK; иначе READ ONLY транзакция
+    db_read_autocommit: bool = True
+    # проверять соединение при выдаче из пула, только если оно простаивало
+    # дольше (0 — проверять всегда, как pool_pre_ping)
+    db_ping_idle_s: float = 30
+
+    # pagination
+    page_size_default: int = 50
+    page_size_max: int = 500
+    batch_max_ids: int = 100
+
+    # export: строк на чанк серверного курсора, уровень gzip (0 — без сжатия)
+    export_chunk_size: int = 1000
+    export_gzip_level: int = 5
+
+    # organization_document: денормализованная модель чтения для списков
+    # by-building / by-activity, обновляется в хуках flush
+    org_documents: bool = True
+
+    # activity tree: перечитывается не реже ttl и при смене версии таблицы
+    # activity (max(updated_at), count), версия сверяется не чаще check_s
+    activity_cache_ttl: float = 300
+    activity_version_check_s: float = 2
+    # число организаций по узлам дерева (with_counts)
+    activity_counts_ttl: float = 60
+
+    # search: auto | trigram | like
+    search_backend: str = "auto"
+
+    # geo
+    geo_knn_candidates: int = 8
+    geo_max_radius_m: float = 50_000
+    geo_index_enabled: bool = False
+    geo_index_cell_deg: float = 0.05
+    geo_index_refresh_s: float = 30
+    geo_index_refresh_overlap_s: float = 60
+    geo_index_full_rebuild_s: float = 600
+    # больше совпадений в области — страница через SQL, а не по списку id
+    geo_index_max_ids: int = 500
+
+    # response cache: свой в каждом воркере, изменения из других
+    # процессов видны не позже cache_ttl
+    cache_enabled: bool = True
+    cache_ttl: float = 60
+    cache_max_entries: int = 10_000
+    # счётчики организаций (facets): короткий ttl поверх инвалидации
+    facet_cache_ttl: float = 10
+
+    # serialization: dict + orjson вместо from_orm + response_model
+    fast_serialization: bool = True
+    # маршруты, чей JSON собирает PostgreSQL одним запросом (json_agg):
+    # get_by_id, get_by_building, get_by_activity; например
+    # JSON_AGG_ROUTES='["get_by_id"]'
+    json_agg_routes: set[str] = set()
+
+    # prometheus /metrics
+    metrics_enabled: bool = True
+
+    # профилировщик запросов: SQL по запросу, N+1, Server-Timing
+    profiler_enabled: bool = False
+    profiler_n1_threshold: int = 5
+    profiler_slow_ms: float = 200
+    profiler_slow_keep: int = 50
 
     # logger
-    log_level: str = "DEBUG"
+    log_level: str = "INFO"
     log_dir: str = "logs"
     log_file: str = "app.log"
     log_max_bytes: int = 5 * 1024 * 1024
@@ -22,6 +98,14 @@ class Settings(BaseSettings):
         "%(asctime)s | %(levelname)s | %(name)s | "
         "%(funcName)s:%(lineno)d | %(message)s"
     )
+    log_json: bool = False
+    log_color: bool = True
+    log_console: bool = True
+    log_queue: bool = True
+    # доля логируемых успешных запросов: по умолчанию и по шаблону пути,
+    # например LOG_SAMPLE_RATES='{"/health": 0, "/api/v1/organizations/geo": 0.1}'
+    log_sample_rate: float = 1.0
+    log_sample_rates: dict[str, float] = {}
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
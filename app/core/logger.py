@@ -1,6 +1,11 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from colorama import Fore, Style, init as colorama_init
 
@@ -17,12 +22,53 @@ COLORS = {
     "CRITICAL": Fore.MAGENTA,
 }
 
+# атрибуты LogRecord, которые не считаются пользовательскими extra-полями
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
 
 class ColorFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
-        formatter = logging.Formatter(settings.log_format)
         color = COLORS.get(record.levelname, "")
-        return f"{color}{formatter.format(record)}{Style.RESET_ALL}"
+        return f"{color}{super().format(record)}{Style.RESET_ALL}"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc)
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": f"{record.funcName}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        payload.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS
+        )
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def sample_rate(route: str) -> float:
+    """share of successful requests on route that get logged"""
+    return settings.log_sample_rates.get(route, settings.log_sample_rate)
+
+
+def should_log(route: str, status_code: int | None) -> bool:
+    if status_code is None or status_code >= 400:
+        return True
+    rate = sample_rate(route)
+    return rate >= 1 or random.random() < rate
+
+
+def _make_formatter(color: bool) -> logging.Formatter:
+    if settings.log_json:
+        return JsonFormatter()
+    if color:
+        return ColorFormatter(settings.log_format)
+    return logging.Formatter(settings.log_format)
 
 
 def init_logger(name: str) -> logging.Logger:
@@ -34,10 +80,14 @@ def init_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(settings.log_level.upper())
 
+    handlers: list[logging.Handler] = []
+
     # console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(settings.log_level.upper())
-    console_handler.setFormatter(ColorFormatter())
+    if settings.log_console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(settings.log_level.upper())
+        console_handler.setFormatter(_make_formatter(settings.log_color))
+        handlers.append(console_handler)
 
     # file handler
     file_handler = RotatingFileHandler(
@@ -47,11 +97,22 @@ def init_logger(name: str) -> logging.Logger:
         encoding="utf-8",
     )
     file_handler.setLevel(settings.log_level.upper())
-    file_handler.setFormatter(logging.Formatter(settings.log_format))
+    file_handler.setFormatter(_make_formatter(color=False))
+    handlers.append(file_handler)
 
     if not logger.handlers:
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        if settings.log_queue:
+            # запись в stdout и файл идёт в фоновом потоке, не в event loop
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            listener = QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            listener.start()
+            atexit.register(listener.stop)
+            logger.addHandler(QueueHandler(log_queue))
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
 
     logger.propagate = False
     return logger
@@ -0,0 +1,141 @@
+"""
+Prometheus metrics: HTTP routes, SQL queries and connection pools.
+
+Per-request cost is a few counter/histogram updates; pool gauges are read
+from the pool only when /metrics is scraped.
+"""
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed"
+)
+
+DB_QUERIES = Counter(
+    "db_queries_total", "SQL statements executed", ["operation"]
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "SQL statements that raised", ["operation"]
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement latency",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool (including connect)",
+    ["pool"], buckets=LATENCY_BUCKETS,
+)
+# autocommit-чтения без BEGIN/ROLLBACK и пропущенные проверки соединения
+DB_ROUNDTRIPS_SAVED = Counter(
+    "db_roundtrips_saved_total",
+    "Database round trips avoided, per http_requests_total for a "
+    "per-request rate", ["reason"],
+)
+
+_OPERATIONS = frozenset(
+    ("select", "insert", "update", "delete", "with", "begin", "commit")
+)
+
+
+def operation(statement: str) -> str:
+    """first keyword of the statement, bounded label cardinality"""
+    words = statement[:16].split(None, 1)
+    keyword = words[0].lower() if words else ""
+    return keyword if keyword in _OPERATIONS else "other"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """queue pool that records how long checkouts wait"""
+
+    metrics_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_name).observe(
+                time.perf_counter() - start
+            )
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() подменяет пул новым экземпляром
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+class PoolCollector(Collector):
+    """checked out / overflow / size gauges, read at scrape time"""
+
+    def __init__(self):
+        self.engines: dict[str, Engine] = {}
+
+    def collect(self):
+        gauges = {
+            "db_pool_checked_out": (
+                "Connections in use", lambda pool: pool.checkedout()
+            ),
+            "db_pool_checked_in": (
+                "Idle connections in pool", lambda pool: pool.checkedin()
+            ),
+            # QueuePool.overflow() отрицательный, пока pool_size не выбран
+            "db_pool_overflow": (
+                "Connections over pool_size",
+                lambda pool: max(pool.overflow(), 0),
+            ),
+            "db_pool_size": ("Configured pool_size", lambda pool: pool.size()),
+        }
+        for name, (doc, read) in gauges.items():
+            family = GaugeMetricFamily(name, doc, labels=["pool"])
+            for pool_name, engine in self.engines.items():
+                family.add_metric([pool_name], read(engine.pool))
+            yield family
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+def instrument_engine(engine: Engine, name: str = "default") -> None:
+    """query counts/latency via engine events, pool gauges via collector"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, params, context, many):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, params, context, many):
+        label = operation(statement)
+        DB_QUERIES.labels(label).inc()
+        DB_QUERY_LATENCY.labels(label).observe(
+            time.perf_counter() - context._metrics_start
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        if context.statement:
+            DB_QUERY_ERRORS.labels(operation(context.statement)).inc()
+
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics_name = name
+    if isinstance(engine.pool, QueuePool):
+        pool_collector.engines[name] = engine
@@ -0,0 +1,134 @@
+"""
+Opt-in per-request SQL profiler (PROFILER_ENABLED=true).
+
+Every statement executed while a request is in flight is recorded with its
+duration and row count; repeated statement shapes are reported as possible
+N+1, timings go to the Server-Timing header and slow requests are kept for
+/debug/slow-requests.
+"""
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# списки параметров IN (...) разной длины считаются одной формой запроса
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\$\d+|\?|%\(\w+\)s|:\w+)\s*,?)+\)")
+
+
+@dataclass(slots=True)
+class QueryRecord:
+    statement: str
+    duration_ms: float
+    rows: int | None
+
+
+@dataclass(slots=True)
+class RequestProfile:
+    method: str
+    path: str
+    started: float = field(default_factory=time.perf_counter)
+    route: str | None = None
+    status: int | None = None
+    queries: list[QueryRecord] = field(default_factory=list)
+    spans: dict[str, float] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    @property
+    def db_ms(self) -> float:
+        return sum(query.duration_ms for query in self.queries)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        timings = {"db": self.db_ms, **self.spans,
+                   "total": self.elapsed_ms()}
+        return ", ".join(
+            f"{name};dur={duration:.1f}" for name, duration in timings.items()
+        )
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        shapes = Counter(
+            statement_shape(query.statement) for query in self.queries
+        )
+        return [
+            (shape, count) for shape, count in shapes.most_common()
+            if count >= threshold
+        ]
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("started")
+        data["db_ms"] = round(self.db_ms, 2)
+        return data
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+slow_requests: deque[RequestProfile] = deque(
+    maxlen=settings.profiler_slow_keep
+)
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAM_LIST.sub("(?)", " ".join(statement.split()))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """add the block duration to the current request's Server-Timing"""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans[name] = profile.spans.get(name, 0.0) + (
+            time.perf_counter() - start
+        ) * 1000
+
+
+def finish(profile: RequestProfile) -> None:
+    profile.total_ms = round(profile.elapsed_ms(), 2)
+    for shape, count in profile.repeated(settings.profiler_n1_threshold):
+        logger.warning(
+            f"Возможный N+1: {profile.method} {profile.route or profile.path} "
+            f"выполнил {count} одинаковых запросов: {shape[:200]}",
+            extra={"route": profile.route, "repeats": count},
+        )
+    if profile.total_ms >= settings.profiler_slow_ms:
+        slow_requests.append(profile)
+
+
+def profile_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, params, context, many):
+        if current_profile.get() is not None:
+            context._profiler_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, params, context, many):
+        profile = current_profile.get()
+        if profile is None or not hasattr(context, "_profiler_start"):
+            return
+        rows = cursor.rowcount
+        profile.queries.append(QueryRecord(
+            statement=statement,
+            duration_ms=round(
+                (time.perf_counter() - context._profiler_start) * 1000, 3
+            ),
+            # sqlite и часть драйверов не сообщают число строк для SELECT
+            rows=rows if rows is not None and rows >= 0 else None,
+        ))
@@ -1,5 +1,6 @@
-from app.database.models.activity import Activity
+from app.database.models.activity import Activity, ActivityClosure
 from app.database.models.building import Building
+from app.database.models.document import OrganizationDocument
 from app.database.models.office import Office
 from app.database.models.organization import Organization, OrganizationPhone, \
     OrganizationOffice, OrganizationActivity
@@ -7,11 +8,14 @@ from app.database.models.organization import Organization, OrganizationPhone, \
 
 __all__ = [
     "Activity",
+    "ActivityClosure",
     "Building",
     "Office",
     "Organization",
     "OrganizationPhone",
     "OrganizationOffice",
     "OrganizationActivity",
+    "OrganizationDocument",
 ]
 
+from app.database import events  # noqa: E402,F401
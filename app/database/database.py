@@ -1,16 +1,34 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Callable
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Sequence
 
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.pool import AsyncAdaptedQueuePool
-
 from app.core.config import settings
+from app.core.metrics import DB_ROUNDTRIPS_SAVED, InstrumentedQueuePool, \
+    instrument_engine
+
+
+@dataclass(slots=True)
+class Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    snapshot_session_factory: async_sessionmaker
+    healthy: bool = True
+    in_use: int = 0
 
 
 class Database:
@@ -22,46 +40,233 @@ class Database:
         max_overflow: int = 10,
         pool_timeout: int = 30,
         pool_recycle: int = 1800,
+        replica_urls: Sequence[str] = (),
+        balance: str = "round_robin",
+        read_your_writes_s: float = 0,
+        query_cache_size: int = 1000,
+        prepared_statement_cache_size: int = 500,
+        read_autocommit: bool = True,
+        ping_idle_s: float = 30,
     ):
-        self._engine: AsyncEngine = create_async_engine(
-            db_url,
+        engine_options = dict(
             echo=echo,
             future=True,
-            poolclass=AsyncAdaptedQueuePool,
+            poolclass=InstrumentedQueuePool,
             pool_size=pool_size,
             max_overflow=max_overflow,
             pool_timeout=pool_timeout,
             pool_recycle=pool_recycle,
-            pool_pre_ping=True,
+            query_cache_size=query_cache_size,
+        )
+        self._prepared_statement_cache_size = prepared_statement_cache_size
+        self._ping_idle_s = ping_idle_s
+        self._read_autocommit = read_autocommit
+        self._engine: AsyncEngine = self._create_engine(
+            db_url, "primary", engine_options
+        )
+        self._session_factory = self._create_session_factory(self._engine)
+        self._read_session_factory = self._create_session_factory(
+            self._read_engine(self._engine)
+        )
+        self._snapshot_session_factory = self._create_session_factory(
+            self._snapshot_engine(self._engine)
         )
 
-        self._session_factory = async_sessionmaker(
+        self._replicas: list[Replica] = []
+        for i, url in enumerate(replica_urls, start=1):
+            name = f"replica{i}"
+            engine = self._create_engine(url, name, engine_options)
+            self._replicas.append(Replica(
+                name, engine,
+                self._create_session_factory(self._read_engine(engine)),
+                self._create_session_factory(self._snapshot_engine(engine)),
+            ))
+        self._balance = balance
+        self._round_robin = itertools.cycle(self._replicas)
+        self._read_your_writes_s = read_your_writes_s
+        # ключ клиента -> момент, до которого его чтения идут в primary;
+        # срок у всех одинаковый, поэтому порядок вставки — порядок истечения
+        self._pinned: OrderedDict[str, float] = OrderedDict()
+
+    def _create_engine(
+        self, url: str, name: str, options: dict
+    ) -> AsyncEngine:
+        if make_url(url).get_driver_name() == "asyncpg":
+            options = dict(options, connect_args={
+                "prepared_statement_cache_size":
+                    self._prepared_statement_cache_size,
+            })
+        engine = create_async_engine(url, **options)
+        ping_idle_connections(engine.sync_engine, self._ping_idle_s)
+        if settings.metrics_enabled:
+            instrument_engine(engine.sync_engine, name)
+        return engine
+
+    def _read_engine(self, engine: AsyncEngine) -> AsyncEngine:
+        """
+        same pool, read mode: autocommit (no BEGIN/ROLLBACK round trips,
+        each statement sees its own snapshot) or a READ ONLY transaction.
+        """
+        if self._read_autocommit:
+            return engine.execution_options(isolation_level="AUTOCOMMIT")
+        return engine.execution_options(postgresql_readonly=True)
+
+    @staticmethod
+    def _snapshot_engine(engine: AsyncEngine) -> AsyncEngine:
+        """
+        same pool, READ ONLY transaction with one snapshot for every
+        statement; server-side cursors (streaming) need a transaction.
+        """
+        if engine.dialect.name == "postgresql":
+            return engine.execution_options(
+                isolation_level="REPEATABLE READ", postgresql_readonly=True
+            )
+        return engine
+
+    @staticmethod
+    def _create_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+        return async_sessionmaker(
             autocommit=False,
             autoflush=False,
-            bind=self._engine,
+            bind=engine,
             expire_on_commit=False,
         )
 
     @asynccontextmanager
-    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+    async def session(
+        self, pin_key: str | None = None
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """
+        read-write session on the primary. With pin_key, a commit that
+        changed something pins that client's reads to the primary.
+        """
         async with self._session_factory() as session:
             try:
                 yield session
+                wrote = bool(
+                    session.new or session.dirty or session.deleted
+                    or session.info.get("pending_changes")
+                )
                 await session.commit()
-            except Exception as e:
+                if wrote and pin_key is not None:
+                    self.pin(pin_key)
+            except Exception:
                 await session.rollback()
                 raise
             finally:
                 await session.close()
 
-    async def check_connection(self) -> bool:
+    @asynccontextmanager
+    async def read_session(
+        self, pin_key: str | None = None, snapshot: bool = False
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """
+        session for reads: a healthy replica if there is one and the
+        client is not pinned, the primary otherwise. Nothing is committed.
+        snapshot=True runs a read-only transaction, for streaming.
+        """
+        replica = None if self.is_pinned(pin_key) else self._pick_replica()
+        if replica is None:
+            session_factory = (
+                self._snapshot_session_factory if snapshot
+                else self._read_session_factory
+            )
+            async with self._read_scope(session_factory, snapshot) as session:
+                yield session
+            return
+
+        session_factory = (
+            replica.snapshot_session_factory if snapshot
+            else replica.session_factory
+        )
+        replica.in_use += 1
+        try:
+            async with self._read_scope(session_factory, snapshot) as session:
+                yield session
+        except DBAPIError as e:
+            # только обрыв соединения: таймаут запроса или ошибка в SQL
+            # реплику не выводят
+            if e.connection_invalidated:
+                replica.healthy = False
+            raise
+        except OSError:
+            # соединение не установилось (отказ, таймаут, DNS); реплика
+            # выведена до следующей успешной проверки
+            replica.healthy = False
+            raise
+        finally:
+            replica.in_use -= 1
+
+    @asynccontextmanager
+    async def _read_scope(
+        self, session_factory: async_sessionmaker, snapshot: bool = False
+    ) -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as session:
+            yield session
+            if (self._read_autocommit and not snapshot
+                    and session.in_transaction()):
+                DB_ROUNDTRIPS_SAVED.labels("transaction").inc(2)
+
+    def _pick_replica(self) -> Replica | None:
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self._balance == "least_connections":
+            return min(healthy, key=lambda replica: replica.in_use)
+        for _ in range(len(self._replicas)):
+            replica = next(self._round_robin)
+            if replica.healthy:
+                return replica
+        return None
+
+    def pin(self, pin_key: str) -> None:
+        if self._read_your_writes_s <= 0:
+            return
+        now = time.monotonic()
+        # истёкшие записи снимаются с начала, словарь не растёт без предела
+        while self._pinned:
+            key, until = next(iter(self._pinned.items()))
+            if until >= now:
+                break
+            del self._pinned[key]
+        self._pinned[pin_key] = now + self._read_your_writes_s
+        self._pinned.move_to_end(pin_key)
+
+    def is_pinned(self, pin_key: str | None) -> bool:
+        if pin_key is None or not self._pinned:
+            return False
+        until = self._pinned.get(pin_key)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del self._pinned[pin_key]
+            return False
+        return True
+
+    async def check_connection(
+        self, engine: AsyncEngine | None = None
+    ) -> bool:
         try:
-            async with self._engine.connect() as conn:
+            async with (engine or self._engine).connect() as conn:
                 result = await conn.execute(sa.text("SELECT 1"))
                 return result.scalar() == 1
-        except Exception as e:
+        except Exception:
             return False
 
+    async def check_replicas(self) -> None:
+        """eject unreachable replicas, bring recovered ones back"""
+        results = await asyncio.gather(
+            *(self.check_connection(replica.engine)
+              for replica in self._replicas)
+        )
+        for replica, healthy in zip(self._replicas, results):
+            replica.healthy = healthy
+
+    async def run_replica_checks(self, interval: float) -> None:
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(interval)
+
     @property
     def session_factory(self) -> Callable[[], AsyncSession]:
         return self._session_factory
@@ -70,8 +275,49 @@ class Database:
     def engine(self) -> AsyncEngine:
         return self._engine
 
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        return [self._engine, *(replica.engine for replica in self._replicas)]
+
+    @property
+    def replicas(self) -> list[Replica]:
+        return self._replicas
+
     async def dispose(self) -> None:
-        await self._engine.dispose()
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def ping_idle_connections(engine: Engine, idle_s: float) -> None:
+    """
+    liveness check instead of pool_pre_ping: only connections that sat in
+    the pool longer than idle_s are pinged on checkout, a failed ping makes
+    the pool replace the connection. Connections that break while in use
+    are invalidated by the regular disconnect handling.
+    """
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, record):
+        record.info.pop("checked_in", None)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, record):
+        record.info["checked_in"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, record, proxy):
+        checked_in = record.info.get("checked_in")
+        if checked_in is None:
+            return
+        if time.monotonic() - checked_in < idle_s:
+            DB_ROUNDTRIPS_SAVED.labels("pre_ping").inc()
+            return
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            raise sa.exc.DisconnectionError("Соединение с БД не отвечает")
 
 
 _db_instance: Database | None = None
@@ -80,12 +326,34 @@ _db_instance: Database | None = None
 def get_database() -> Database:
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database(settings.database_url)
+        _db_instance = Database(
+            settings.database_url,
+            replica_urls=settings.database_replica_urls,
+            balance=settings.replica_balance,
+            read_your_writes_s=settings.read_your_writes_s,
+            query_cache_size=settings.db_query_cache_size,
+            prepared_statement_cache_size=(
+                settings.db_prepared_statement_cache_size
+            ),
+            read_autocommit=settings.db_read_autocommit,
+            ping_idle_s=settings.db_ping_idle_s,
+        )
     return _db_instance
 
 
 @asynccontextmanager
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_db_session(
+    pin_key: str | None = None,
+) -> AsyncGenerator[AsyncSession, None]:
+    db = get_database()
+    async with db.session(pin_key) as session:
+        yield session
+
+
+@asynccontextmanager
+async def get_read_session(
+    pin_key: str | None = None, snapshot: bool = False,
+) -> AsyncGenerator[AsyncSession, None]:
     db = get_database()
-    async with db.session() as session:
+    async with db.read_session(pin_key, snapshot) as session:
         yield session
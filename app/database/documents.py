@@ -0,0 +1,186 @@
+"""
+Maintenance of the organization_document read model.
+
+Documents are assembled from the relational tables with four batched
+selects and replaced wholesale (delete + insert), inside the same
+transaction as the change that made them stale.
+"""
+from collections.abc import Collection, Iterable, Iterator
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import Connection, delete, insert, select
+
+from app.database.models.activity import ActivityClosure
+from app.database.models.building import Building
+from app.database.models.document import OrganizationDocument
+from app.database.models.office import Office
+from app.database.models.organization import Organization, \
+    OrganizationActivity, OrganizationOffice, OrganizationPhone
+
+# организаций в одном IN-списке
+BATCH_SIZE = 500
+
+
+def _batches(ids: Iterable[UUID], size: int) -> Iterator[list[UUID]]:
+    batch = []
+    for item in ids:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_documents(
+    connection: Connection, organization_ids: Collection[UUID]
+) -> list[dict[str, Any]]:
+    """organization_document rows for existing organizations among ids"""
+    ids = list(organization_ids)
+    docs: dict[UUID, dict[str, Any]] = {}
+    for org_id, name, updated_at in connection.execute(
+        select(Organization.id, Organization.name, Organization.updated_at)
+        .where(Organization.id.in_(ids))
+    ):
+        docs[org_id] = {
+            "organization_id": org_id,
+            "name": name,
+            "phones": [],
+            "offices": [],
+            "activity_ids": set(),
+            "activity_path_ids": set(),
+            "building_ids": set(),
+            "source_updated_at": updated_at,
+            "source_parts": 1,
+        }
+
+    def touch(doc: dict[str, Any], *timestamps) -> None:
+        doc["source_updated_at"] = max(doc["source_updated_at"], *timestamps)
+        doc["source_parts"] += len(timestamps)
+
+    for org_id, phone_number, updated_at in connection.execute(
+        select(OrganizationPhone.organization_id,
+               OrganizationPhone.phone_number, OrganizationPhone.updated_at)
+        .where(OrganizationPhone.organization_id.in_(ids))
+        .order_by(OrganizationPhone.phone_number)
+    ):
+        if doc := docs.get(org_id):
+            doc["phones"].append({"phone_number": phone_number})
+            touch(doc, updated_at)
+
+    for (org_id, office_id, floor, unit, office_updated_at, address, lat,
+         lon, building_id, building_updated_at) in connection.execute(
+        select(OrganizationOffice.organization_id, Office.id, Office.floor,
+               Office.unit, Office.updated_at, Building.address, Building.lat,
+               Building.lon, Building.id, Building.updated_at)
+        .join(Office, Office.id == OrganizationOffice.office_id)
+        .join(Building, Building.id == Office.building_id)
+        .where(OrganizationOffice.organization_id.in_(ids))
+        .order_by(Office.id)
+    ):
+        if doc := docs.get(org_id):
+            # поля и порядок как в serializers.office
+            doc["offices"].append({
+                "id": str(office_id),
+                "floor": floor,
+                "unit": unit,
+                "building": {
+                    "address": address,
+                    "lat": float(lat),
+                    "lon": float(lon),
+                    "id": str(building_id),
+                },
+            })
+            doc["building_ids"].add(building_id)
+            touch(doc, office_updated_at, building_updated_at)
+
+    for org_id, activity_id, ancestor_id in connection.execute(
+        select(OrganizationActivity.organization_id,
+               OrganizationActivity.activity_id, ActivityClosure.ancestor_id)
+        .join(ActivityClosure,
+              ActivityClosure.descendant_id == OrganizationActivity.activity_id)
+        .where(OrganizationActivity.organization_id.in_(ids))
+    ):
+        if doc := docs.get(org_id):
+            doc["activity_ids"].add(activity_id)
+            doc["activity_path_ids"].add(ancestor_id)
+
+    for doc in docs.values():
+        for key in ("activity_ids", "activity_path_ids", "building_ids"):
+            doc[key] = sorted(doc[key])
+    return list(docs.values())
+
+
+def refresh_documents(
+    connection: Connection, organization_ids: Collection[UUID]
+) -> None:
+    """replace documents of the given organizations (deleted ones vanish)"""
+    for batch in _batches(organization_ids, BATCH_SIZE):
+        connection.execute(
+            delete(OrganizationDocument)
+            .where(OrganizationDocument.organization_id.in_(batch))
+        )
+        rows = build_documents(connection, batch)
+        if rows:
+            connection.execute(insert(OrganizationDocument), rows)
+
+
+def affected_organizations(
+    connection: Connection,
+    organization_ids: Collection[UUID] = (),
+    office_ids: Collection[UUID] = (),
+    building_ids: Collection[UUID] = (),
+    activity_ids: Collection[UUID] = (),
+) -> set[UUID]:
+    """
+    organizations whose documents depend on the given rows; activity_ids
+    are moved activities, their whole subtree is affected.
+    """
+    affected = set(organization_ids)
+    queries = []
+    for batch in _batches(office_ids, BATCH_SIZE):
+        queries.append(
+            select(OrganizationOffice.organization_id)
+            .where(OrganizationOffice.office_id.in_(batch))
+        )
+    for batch in _batches(building_ids, BATCH_SIZE):
+        queries.append(
+            select(OrganizationOffice.organization_id)
+            .join(Office, Office.id == OrganizationOffice.office_id)
+            .where(Office.building_id.in_(batch))
+        )
+    for batch in _batches(activity_ids, BATCH_SIZE):
+        queries.append(
+            select(OrganizationActivity.organization_id)
+            .join(ActivityClosure,
+                  ActivityClosure.descendant_id
+                  == OrganizationActivity.activity_id)
+            .where(ActivityClosure.ancestor_id.in_(batch))
+        )
+    for query in queries:
+        affected.update(connection.scalars(query))
+    return affected
+
+
+def rebuild_documents(
+    connection: Connection, batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    full rebuild, for bulk loads that bypass the ORM. Returns the number
+    of documents.
+    """
+    connection.execute(delete(OrganizationDocument))
+    total = 0
+    last_id = None
+    while True:
+        stmt = select(Organization.id).order_by(Organization.id)
+        if last_id is not None:
+            stmt = stmt.where(Organization.id > last_id)
+        ids = connection.scalars(stmt.limit(batch_size)).all()
+        if not ids:
+            return total
+        rows = build_documents(connection, ids)
+        connection.execute(insert(OrganizationDocument), rows)
+        total += len(rows)
+        last_id = ids[-1]
@@ -0,0 +1,188 @@
+from collections import defaultdict
+from collections.abc import Callable
+from uuid import UUID
+
+from sqlalchemy import Connection, delete, event, insert, literal, select, \
+    text, true, union_all
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.database.documents import affected_organizations, refresh_documents
+from app.database.models.activity import Activity, ActivityClosure
+from app.database.models.building import Building
+from app.database.models.office import Office
+
+Changes = dict[str, set[UUID]]
+ChangeListener = Callable[[Changes], None]
+
+_listeners: list[ChangeListener] = []
+
+_CHANGES_KEY = "pending_changes"
+_STALE_DOCUMENTS_KEY = "stale_documents"
+
+
+def subscribe(listener: ChangeListener) -> ChangeListener:
+    """
+    call listener with {table: ids} after every commit that touched them.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def _changed_keys(obj) -> list[tuple[str, UUID]]:
+    keys = []
+    table = getattr(obj, "__tablename__", None)
+    obj_id = getattr(obj, "id", None)
+    if table and obj_id is not None:
+        keys.append((table, obj_id))
+    org_id = getattr(obj, "organization_id", None)
+    if org_id is not None:
+        keys.append(("organization", org_id))
+    return keys
+
+
+def _parent_changed(activity: Activity) -> bool:
+    attrs = sa_inspect(activity).attrs
+    return (
+        attrs.parent_id.history.has_changes()
+        or attrs.parent.history.has_changes()
+    )
+
+
+def _add_closure(session: Session, activity: Activity) -> None:
+    rows = [select(literal(activity.id), literal(activity.id), literal(0))]
+    if activity.parent_id is not None:
+        rows.append(
+            select(
+                ActivityClosure.ancestor_id,
+                literal(activity.id),
+                ActivityClosure.depth + 1,
+            ).where(ActivityClosure.descendant_id == activity.parent_id)
+        )
+    session.connection().execute(
+        insert(ActivityClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"], union_all(*rows)
+        )
+    )
+
+
+def _move_closure(session: Session, activity: Activity) -> None:
+    subtree = select(ActivityClosure.descendant_id).where(
+        ActivityClosure.ancestor_id == activity.id
+    )
+    session.connection().execute(
+        delete(ActivityClosure).where(
+            ActivityClosure.descendant_id.in_(subtree),
+            ActivityClosure.ancestor_id.not_in(subtree),
+        )
+    )
+    if activity.parent_id is None:
+        return
+    sup = aliased(ActivityClosure)
+    sub = aliased(ActivityClosure)
+    session.connection().execute(
+        insert(ActivityClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(
+                sup.ancestor_id,
+                sub.descendant_id,
+                sup.depth + sub.depth + 1,
+            ).select_from(sup).join(sub, true()).where(
+                sup.descendant_id == activity.parent_id,
+                sub.ancestor_id == activity.id,
+            ),
+        )
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """
+    organizations of offices and buildings about to be deleted: after the
+    flush their organization_office rows are gone.
+    """
+    if not settings.org_documents:
+        return
+    office_ids = [o.id for o in session.deleted if isinstance(o, Office)]
+    building_ids = [b.id for b in session.deleted if isinstance(b, Building)]
+    if office_ids or building_ids:
+        session.info.setdefault(_STALE_DOCUMENTS_KEY, set()).update(
+            affected_organizations(
+                session.connection(),
+                office_ids=office_ids, building_ids=building_ids,
+            )
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    changes: Changes = session.info.setdefault(_CHANGES_KEY, defaultdict(set))
+    flushed: Changes = defaultdict(set)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        for table, obj_id in _changed_keys(obj):
+            changes[table].add(obj_id)
+            flushed[table].add(obj_id)
+
+    # родители вставляются раньше детей, иначе у ребёнка не найдутся предки
+    pending = {a.id: a for a in session.new if isinstance(a, Activity)}
+    while pending:
+        ready = [a for a in pending.values() if a.parent_id not in pending]
+        if not ready:
+            break
+        for activity in ready:
+            _add_closure(session, activity)
+            del pending[activity.id]
+
+    moved = []
+    for obj in session.dirty:
+        if isinstance(obj, Activity) and _parent_changed(obj):
+            _move_closure(session, obj)
+            moved.append(obj.id)
+
+    # документы — после closure: пути видов деятельности уже обновлены
+    if settings.org_documents:
+        stale = session.info.pop(_STALE_DOCUMENTS_KEY, set())
+        stale |= affected_organizations(
+            session.connection(),
+            organization_ids=flushed["organization"],
+            office_ids=flushed["office"],
+            building_ids=flushed["building"],
+            activity_ids=moved,
+        )
+        if stale:
+            refresh_documents(session.connection(), stale)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if not changes:
+        return
+    for listener in _listeners:
+        listener(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_CHANGES_KEY, None)
+    session.info.pop(_STALE_DOCUMENTS_KEY, None)
+
+
+def rebuild_activity_closure(connection: Connection) -> None:
+    """
+    full rebuild, for bulk loads that bypass the ORM.
+    """
+    connection.execute(text("DELETE FROM activity_closure"))
+    connection.execute(text(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM activity
+            UNION ALL
+            SELECT tree.ancestor_id, a.id, tree.depth + 1
+            FROM tree JOIN activity a ON a.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    ))
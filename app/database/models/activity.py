@@ -34,3 +34,28 @@ class Activity(UUIDPrimaryKeyMixin, TimestampMixin, Base):
         Index("ix_activity_parent_level","parent_id", "level"),
         Index("ix_activity_name", "name")
     )
+
+
+class ActivityClosure(Base):
+    """
+    (ancestor, descendant) pairs of activity tree, self included with depth 0.
+    """
+    __tablename__ = "activity_closure"
+
+    ancestor_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("activity.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    descendant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("activity.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    depth: Mapped[int] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_activity_closure_ancestor_depth",
+              "ancestor_id", "depth", "descendant_id"),
+        Index("ix_activity_closure_descendant", "descendant_id"),
+    )
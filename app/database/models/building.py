@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Index, Text, Numeric
+from sqlalchemy import Index, Text, Numeric, Float, cast, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.base import Base
@@ -18,4 +18,10 @@ class Building(UUIDPrimaryKeyMixin, TimestampMixin, Base):
         "Office", back_populates="building", cascade="all, delete-orphan"
     )
 
-    __table_args__ = (Index("ix_building_lat_lon", "lat", "lon"),)
+
+# GiST по point(lon, lat): bbox (<@) и KNN (<->) запросы
+Index(
+    "ix_building_location",
+    func.point(cast(Building.lon, Float), cast(Building.lat, Float)),
+    postgresql_using="gist",
+).ddl_if(dialect="postgresql")
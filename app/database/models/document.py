@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import ARRAY, JSON, DateTime, ForeignKey, Index, String, \
+    TypeDecorator
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.base import Base
+
+
+class UUIDArray(TypeDecorator):
+    """uuid[] on postgres, JSON list of strings elsewhere"""
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(ARRAY(UUID(as_uuid=True)))
+        return dialect.type_descriptor(JSON())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return [str(item) for item in value]
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return [uuid.UUID(item) for item in value]
+
+
+class OrganizationDocument(Base):
+    """
+    denormalized read model, one row per organization: list response
+    fields as stored JSON plus id arrays for filtering. Maintained from
+    the ORM flush hooks (app.database.documents), rebuilt in full by
+    app.scripts.rebuild_documents after bulk loads.
+    """
+    __tablename__ = "organization_document"
+
+    organization_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("organization.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    name: Mapped[str] = mapped_column(String(300), nullable=False)
+    # json, не jsonb: порядок ключей совпадает со схемами ответа
+    phones: Mapped[list[dict[str, Any]]] = mapped_column(
+        JSON, nullable=False
+    )
+    offices: Mapped[list[dict[str, Any]]] = mapped_column(
+        JSON, nullable=False
+    )
+    # виды деятельности организации и все их предки
+    activity_ids: Mapped[list[uuid.UUID]] = mapped_column(
+        UUIDArray, nullable=False
+    )
+    activity_path_ids: Mapped[list[uuid.UUID]] = mapped_column(
+        UUIDArray, nullable=False
+    )
+    building_ids: Mapped[list[uuid.UUID]] = mapped_column(
+        UUIDArray, nullable=False
+    )
+    # max(updated_at) и число строк, из которых собран документ (ETag)
+    source_updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False), nullable=False
+    )
+    source_parts: Mapped[int] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_org_document_name_id", "name", "organization_id"),
+    )
+
+
+# GIN по массивам: && и @> фильтры списков
+for _column in ("activity_ids", "activity_path_ids", "building_ids"):
+    Index(
+        f"ix_org_document_{_column}",
+        getattr(OrganizationDocument, _column),
+        postgresql_using="gin",
+    ).ddl_if(dialect="postgresql")
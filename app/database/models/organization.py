@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import uuid
 
-from sqlalchemy import String, UniqueConstraint, Index, ForeignKey
+from sqlalchemy import DDL, String, UniqueConstraint, Index, ForeignKey, \
+    event, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -22,15 +23,30 @@ class Organization(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     offices: Mapped[list["Office"]] = relationship(
         secondary="organization_office",
         back_populates="organizations",
-        lazy="selectin"
+        lazy="raise"
     )
     activities: Mapped[list["Activity"]] = relationship(
         secondary="organization_activity",
         backref="organizations",
-        lazy="selectin"
+        lazy="raise"
     )
 
-    __table_args__ = (Index("ix_org_name", "name"),)
+    __table_args__ = (Index("ix_org_name_id", "name", "id"),)
+
+
+# pg_trgm GIN по lower(name): поиск по подстроке и с опечатками;
+# расширение — до таблицы, как в миграции c41f7e09a3b5
+event.listen(
+    Organization.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    .execute_if(dialect="postgresql"),
+)
+Index(
+    "ix_org_name_trgm",
+    func.lower(Organization.name).label("name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"name_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
 
 
 class OrganizationPhone(UUIDPrimaryKeyMixin, TimestampMixin, Base):
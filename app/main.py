@@ -1,19 +1,81 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
 
-from app.api.middleware import ExceptionHandlerMiddleware, LoggingMiddleware
+from fastapi import Depends, FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.api.middleware import ExceptionHandlerMiddleware, LoggingMiddleware, \
+    MetricsMiddleware, ProfilerMiddleware
 from app.api.v1 import api_router
+from app.api.v1.dependencies import verify_api_key
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.profiler import profile_engine, slow_requests
+from app.database.database import get_database
+from app.services.cache import response_cache
+from app.services.geo_index import run_geo_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if settings.geo_index_enabled:
+        tasks.append(asyncio.create_task(run_geo_index()))
+    if get_database().replicas:
+        tasks.append(asyncio.create_task(
+            get_database().run_replica_checks(
+                settings.replica_check_interval_s
+            )
+        ))
+    yield
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
 
-app = FastAPI(title="Organization Directory API", version="1.0")
+
+app = FastAPI(
+    title="Organization Directory API", version="1.0", lifespan=lifespan
+)
 
 app.add_middleware(ExceptionHandlerMiddleware)
 app.add_middleware(LoggingMiddleware)
+if settings.profiler_enabled:
+    app.add_middleware(ProfilerMiddleware)
+    for engine in get_database().engines:
+        profile_engine(engine.sync_engine)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/health", tags=["System"])
 async def health_check():
     return {"status": "ok"}
 
+
+@app.get(
+    "/cache/stats", tags=["System"], dependencies=[Depends(verify_api_key)]
+)
+async def cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+if settings.profiler_enabled:
+    @app.get(
+        "/debug/slow-requests",
+        tags=["System"],
+        dependencies=[Depends(verify_api_key)],
+    )
+    async def debug_slow_requests():
+        """requests slower than profiler_slow_ms with their SQL, newest first"""
+        return [profile.to_dict() for profile in reversed(slow_requests)]
+
 app.include_router(api_router, prefix="/api/v1")
 
 logger.info("FastAPI app started successfully")
@@ -0,0 +1,49 @@
+from collections.abc import Sequence
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Row, distinct, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Activity, ActivityClosure, OrganizationActivity
+
+
+class ActivityRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_tree_rows(
+        self,
+    ) -> Sequence[Row[tuple[UUID, UUID | None, str]]]:
+        """(id, parent_id, name) of every activity, one query."""
+        result = await self.session.execute(
+            select(Activity.id, Activity.parent_id, Activity.name)
+        )
+        return result.all()
+
+    async def get_version(self) -> tuple[datetime | None, int]:
+        """max(updated_at) and row count of the activity table"""
+        result = await self.session.execute(
+            select(func.max(Activity.updated_at), func.count())
+            .select_from(Activity)
+        )
+        return tuple(result.one())
+
+    async def get_organization_counts(self) -> Sequence[Row[tuple[UUID, int]]]:
+        """
+        (activity id, organizations in its subtree) for every activity with
+        organizations; an organization is counted once per node. One
+        aggregate over the closure table.
+        """
+        result = await self.session.execute(
+            select(
+                ActivityClosure.ancestor_id,
+                func.count(distinct(OrganizationActivity.organization_id)),
+            )
+            .join(OrganizationActivity,
+                  OrganizationActivity.activity_id
+                  == ActivityClosure.descendant_id)
+            .group_by(ActivityClosure.ancestor_id)
+        )
+        return result.all()
@@ -0,0 +1,147 @@
+from collections.abc import Callable, Collection, Hashable, Sequence
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import ARRAY, ColumnElement, Integer, Row, Select, String, \
+    bindparam, exists, func, select, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import OrganizationDocument
+from app.repositories.org_repo import OrgKey, _prepared
+from app.repositories.pagination import Page
+
+Doc = OrganizationDocument
+
+# колонки ответа: массивы id нужны только для фильтров
+_FIELD_COLUMNS = {"phones": Doc.phones, "offices": Doc.offices}
+
+
+def _overlaps(column: ColumnElement, name: str, dialect_name: str):
+    """
+    array column shares an element with <list parameter>: && over the GIN
+    index on postgres, json_each elsewhere.
+    """
+    if dialect_name == "postgresql":
+        return column.op("&&")(
+            bindparam(name, type_=ARRAY(PG_UUID(as_uuid=True)))
+        )
+    items = func.json_each(column).table_valued("value")
+    return exists().where(items.c.value.in_(bindparam(name, expanding=True)))
+
+
+def _array_param(ids: Sequence[UUID], dialect_name: str) -> list:
+    if dialect_name == "postgresql":
+        return list(ids)
+    return [str(item) for item in ids]
+
+
+class OrganizationDocumentRepository:
+    """
+    list queries over organization_document: one indexed statement per
+    page, no joins and no relationship loads.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @property
+    def dialect_name(self) -> str:
+        return self.session.bind.dialect.name
+
+    async def _paginate(
+        self,
+        shape: Hashable,
+        condition: Callable[[], ColumnElement[bool]],
+        params: dict[str, Any],
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Row]:
+        """keyset page over (name, organization_id)"""
+        total = None
+        if with_total:
+            count = _prepared(
+                ("documents", shape, "count"),
+                lambda: select(func.count()).select_from(Doc)
+                .where(condition()),
+            )
+            total = await self.session.scalar(count, params)
+
+        def build_page() -> Select:
+            columns = [
+                column for name, column in _FIELD_COLUMNS.items()
+                if fields is None or name in fields
+            ]
+            stmt = select(
+                Doc.name, Doc.organization_id, *columns,
+                Doc.source_updated_at, Doc.source_parts,
+            ).where(condition())
+            if after is not None:
+                stmt = stmt.where(
+                    tuple_(Doc.name, Doc.organization_id) > tuple_(
+                        bindparam("after_name", type_=String),
+                        bindparam("after_id",
+                                  type_=Doc.organization_id.type),
+                    )
+                )
+            return (
+                stmt.order_by(Doc.name, Doc.organization_id)
+                .limit(bindparam("limit", type_=Integer))
+            )
+
+        stmt = _prepared(
+            ("documents", shape, "page", after is not None,
+             None if fields is None else frozenset(fields)),
+            build_page,
+        )
+        params = {**params, "limit": limit + 1}
+        if after is not None:
+            params["after_name"], params["after_id"] = after
+        rows = (await self.session.execute(stmt, params)).all()
+
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1].name, rows[-1].organization_id)
+        return Page(items=rows, next_key=next_key, total=total)
+
+    async def get_by_building(
+        self,
+        building_id: UUID,
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Row]:
+        dialect_name = self.dialect_name
+        return await self._paginate(
+            ("by_building", dialect_name),
+            lambda: _overlaps(Doc.building_ids, "building_ids", dialect_name),
+            {"building_ids": _array_param([building_id], dialect_name)},
+            limit, after, with_total, fields,
+        )
+
+    async def get_by_activity(
+        self,
+        activity_ids: Sequence[UUID],
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+        subtree: bool = False,
+    ) -> Page[Row]:
+        """
+        organizations linked to any of activity_ids; with subtree=True
+        also to any of their descendants (matched on ancestor paths, the
+        tree does not have to be resolved).
+        """
+        dialect_name = self.dialect_name
+        column = Doc.activity_path_ids if subtree else Doc.activity_ids
+        return await self._paginate(
+            ("by_activity", dialect_name, subtree),
+            lambda: _overlaps(column, "activity_ids", dialect_name),
+            {"activity_ids": _array_param(activity_ids, dialect_name)},
+            limit, after, with_total, fields,
+        )
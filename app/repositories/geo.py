@@ -0,0 +1,73 @@
+import math
+
+from sqlalchemy import ColumnElement, Float, and_, cast, func
+
+from app.database import Building
+
+METERS_PER_DEG_LAT = 111_132.0
+METERS_PER_DEG_LON = 111_320.0
+
+# координаты — числа или bind-параметры (для заранее собранных запросов)
+Coord = float | ColumnElement[float]
+
+
+def building_point() -> ColumnElement:
+    """
+    point(lon, lat) exactly as indexed by ix_building_location (GiST).
+    """
+    return func.point(cast(Building.lon, Float), cast(Building.lat, Float))
+
+
+def radius_bbox(
+    lat: float, lon: float, radius_m: float
+) -> tuple[float, float, float, float]:
+    """lat_min, lat_max, lon_min, lon_max enclosing the circle"""
+    d_lat = radius_m / METERS_PER_DEG_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    d_lon = radius_m / (METERS_PER_DEG_LON * cos_lat)
+    return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
+
+
+def lon_scale(lat: float) -> float:
+    """meters per degree of longitude at latitude lat"""
+    return METERS_PER_DEG_LON * math.cos(math.radians(lat))
+
+
+def in_bbox(
+    dialect_name: str,
+    lat_min: Coord,
+    lat_max: Coord,
+    lon_min: Coord,
+    lon_max: Coord,
+) -> ColumnElement[bool]:
+    if dialect_name == "postgresql":
+        return building_point().op("<@")(
+            func.box(func.point(lon_min, lat_min),
+                     func.point(lon_max, lat_max))
+        )
+    return and_(
+        Building.lat >= lat_min,
+        Building.lat <= lat_max,
+        Building.lon >= lon_min,
+        Building.lon <= lon_max,
+    )
+
+
+def knn_order(lat: Coord, lon: Coord) -> ColumnElement:
+    """GiST KNN ordering, planar in degrees (postgres only)"""
+    return building_point().op("<->")(func.point(lon, lat))
+
+
+def distance_sq_m(
+    lat: Coord, lon: Coord, kx: Coord | None = None
+) -> ColumnElement[float]:
+    """
+    equirectangular squared distance in m^2, portable arithmetic only.
+    Error stays well below 1% at city scale. kx is lon_scale(lat), required
+    when lat is a bind parameter.
+    """
+    if kx is None:
+        kx = lon_scale(lat)
+    dx = (cast(Building.lon, Float) - lon) * kx
+    dy = (cast(Building.lat, Float) - lat) * METERS_PER_DEG_LAT
+    return dx * dx + dy * dy
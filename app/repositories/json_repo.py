@@ -0,0 +1,297 @@
+"""
+Response JSON built by PostgreSQL in a single statement.
+
+Relations come from LATERAL subqueries (json_agg of json_build_object),
+and the response version (max updated_at, row count) and the list total are
+computed alongside, so an endpoint needs exactly one round trip and the
+JSON text goes to the client without ORM objects. Key order follows the
+response schemas; json (not jsonb) keeps it.
+"""
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import ARRAY, Float, Integer, Select, String, Text, any_, \
+    bindparam, cast, func, literal, literal_column, select, true, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Activity, Building, Office, Organization, \
+    OrganizationActivity, OrganizationOffice, OrganizationPhone
+from app.repositories.org_repo import OrgKey, _fields_key, _prepared
+
+_EMPTY = literal_column("'[]'::json")
+
+
+@dataclass(frozen=True, slots=True)
+class JsonDetail:
+    body: str
+    updated_at: datetime
+    parts: int
+
+
+@dataclass(frozen=True, slots=True)
+class JsonPage:
+    items: str
+    updated_at: datetime | None
+    parts: int
+    ids: list[UUID]
+    next_key: OrgKey | None = None
+    total: int | None = None
+
+
+def _phones(org_id) -> Select:
+    phone = func.json_build_object(
+        "phone_number", OrganizationPhone.phone_number
+    )
+    return select(
+        func.json_agg(
+            aggregate_order_by(phone, OrganizationPhone.phone_number)
+        ).label("items"),
+        func.max(OrganizationPhone.updated_at).label("updated_at"),
+        func.count().label("parts"),
+    ).where(OrganizationPhone.organization_id == org_id)
+
+
+def _offices(org_id) -> Select:
+    # поля и порядок как в serializers.office / OfficeRead
+    office = func.json_build_object(
+        "id", Office.id,
+        "floor", Office.floor,
+        "unit", Office.unit,
+        "building", func.json_build_object(
+            "address", Building.address,
+            "lat", cast(Building.lat, Float),
+            "lon", cast(Building.lon, Float),
+            "id", Building.id,
+        ),
+    )
+    return (
+        select(
+            func.json_agg(aggregate_order_by(office, Office.id))
+            .label("items"),
+            func.greatest(
+                func.max(Office.updated_at), func.max(Building.updated_at)
+            ).label("updated_at"),
+            (func.count() * 2).label("parts"),
+        )
+        .select_from(OrganizationOffice)
+        .join(Office, Office.id == OrganizationOffice.office_id)
+        .join(Building, Building.id == Office.building_id)
+        .where(OrganizationOffice.organization_id == org_id)
+    )
+
+
+def _activities(org_id) -> Select:
+    activity = func.json_build_object(
+        "name", Activity.name,
+        "id", Activity.id,
+        "parent_id", Activity.parent_id,
+    )
+    return (
+        select(
+            func.json_agg(aggregate_order_by(activity, Activity.name))
+            .label("items"),
+            func.max(Activity.updated_at).label("updated_at"),
+            func.count().label("parts"),
+        )
+        .select_from(OrganizationActivity)
+        .join(Activity, Activity.id == OrganizationActivity.activity_id)
+        .where(OrganizationActivity.organization_id == org_id)
+    )
+
+
+_RELATIONS = {
+    "phones": _phones, "offices": _offices, "activities": _activities,
+}
+
+
+def _organization_json(
+    org_id, name, updated_at, relations: Collection[str],
+    fields: Collection[str] | None = None,
+) -> tuple[Any, Any, Any, list]:
+    """
+    (json object, version updated_at, version parts, lateral subqueries)
+    of one organization; fields limits both the keys and the laterals.
+    """
+    laterals = {
+        relation: _RELATIONS[relation](org_id).lateral(relation)
+        for relation in relations
+        if fields is None or relation in fields
+    }
+    values = {"name": name, "id": org_id}
+    for relation, lateral in laterals.items():
+        values[relation] = func.coalesce(lateral.c["items"], _EMPTY)
+    keys = fields if fields is not None else values
+    obj = func.json_build_object(*(
+        part for key in keys for part in (key, values[key])
+    ))
+    newest = func.greatest(
+        updated_at, *(lateral.c.updated_at for lateral in laterals.values())
+    )
+    parts = sum(
+        (func.coalesce(lateral.c.parts, 0) for lateral in laterals.values()),
+        start=literal(1),
+    )
+    return obj, newest, parts, list(laterals.values())
+
+
+class OrganizationJsonRepository:
+    """postgresql only"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @property
+    def dialect_name(self) -> str:
+        return self.session.bind.dialect.name
+
+    async def get_detail(self, organization_id: UUID) -> JsonDetail | None:
+        def build() -> Select:
+            obj, newest, parts, laterals = _organization_json(
+                Organization.id, Organization.name, Organization.updated_at,
+                ("phones", "offices", "activities"),
+            )
+            stmt = select(
+                cast(obj, Text), newest.label("updated_at"),
+                parts.label("parts"),
+            ).select_from(Organization)
+            for lateral in laterals:
+                stmt = stmt.join(lateral, true())
+            return stmt.where(
+                Organization.id == bindparam("organization_id")
+            )
+
+        stmt = _prepared(("json", "detail"), build)
+        row = (await self.session.execute(
+            stmt, {"organization_id": organization_id}
+        )).first()
+        return JsonDetail(*row) if row is not None else None
+
+    async def _page(
+        self,
+        shape: str,
+        condition,
+        params: dict[str, Any],
+        limit: int,
+        after: OrgKey | None,
+        with_total: bool,
+        fields: Collection[str] | None,
+    ) -> JsonPage:
+        """
+        keyset page over (name, id) as one json array: limit + 1 rows are
+        numbered, relations are built only for the first limit of them.
+        """
+        def build() -> Select:
+            name_id = tuple_(Organization.name, Organization.id)
+            page = select(
+                Organization.id, Organization.name, Organization.updated_at,
+                func.row_number().over(order_by=name_id).label("rn"),
+            ).where(condition())
+            if after is not None:
+                page = page.where(name_id > tuple_(
+                    bindparam("after_name", type_=String),
+                    bindparam("after_id", type_=Organization.id.type),
+                ))
+            page = page.order_by(Organization.name, Organization.id).limit(
+                bindparam("limit", type_=Integer) + 1
+            ).cte("page")
+
+            within = page.c.rn <= bindparam("limit", type_=Integer)
+            obj, newest, parts, laterals = _organization_json(
+                page.c.id, page.c.name, page.c.updated_at,
+                ("phones", "offices"), fields,
+            )
+            items = select(
+                page.c.id, page.c.name, page.c.rn, obj.label("item"),
+                newest.label("updated_at"), parts.label("parts"),
+            ).select_from(page)
+            for lateral in laterals:
+                items = items.join(lateral, true())
+            items = items.where(within).subquery("items")
+
+            last = items.c.rn == bindparam("limit", type_=Integer)
+            columns = [
+                cast(func.coalesce(
+                    func.json_agg(aggregate_order_by(items.c.item,
+                                                     items.c.rn)),
+                    _EMPTY,
+                ), Text).label("items"),
+                func.max(items.c.updated_at).label("updated_at"),
+                func.coalesce(func.sum(items.c.parts), 0).label("parts"),
+                func.coalesce(
+                    func.array_agg(aggregate_order_by(items.c.id, items.c.rn)),
+                    cast(literal_column("'{}'"), ARRAY(Organization.id.type)),
+                ).label("ids"),
+                func.max(items.c.name).filter(last).label("last_name"),
+                (func.array_agg(items.c.id).filter(last))[1].label("last_id"),
+                # есть ли строка limit + 1
+                select(func.max(page.c.rn)).scalar_subquery().label("rows"),
+            ]
+            if with_total:
+                columns.append(
+                    select(func.count()).select_from(Organization)
+                    .where(condition()).scalar_subquery().label("total")
+                )
+            return select(*columns).select_from(items)
+
+        stmt = _prepared(
+            ("json", shape, after is not None, with_total,
+             _fields_key(fields)),
+            build,
+        )
+        params = {**params, "limit": limit}
+        if after is not None:
+            params["after_name"], params["after_id"] = after
+        row = (await self.session.execute(stmt, params)).one()
+        next_key = None
+        if row.rows is not None and row.rows > limit:
+            next_key = (row.last_name, row.last_id)
+        return JsonPage(
+            items=row.items, updated_at=row.updated_at, parts=row.parts,
+            ids=row.ids, next_key=next_key,
+            total=row.total if with_total else None,
+        )
+
+    async def get_by_building(
+        self,
+        building_id: UUID,
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> JsonPage:
+        return await self._page(
+            "by_building",
+            lambda: Organization.id.in_(
+                select(OrganizationOffice.organization_id)
+                .join(Office, Office.id == OrganizationOffice.office_id)
+                .where(Office.building_id == bindparam("building_id"))
+            ),
+            {"building_id": building_id},
+            limit, after, with_total, fields,
+        )
+
+    async def get_by_activity(
+        self,
+        activity_ids: Sequence[UUID],
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> JsonPage:
+        return await self._page(
+            "by_activity",
+            lambda: Organization.id.in_(
+                select(OrganizationActivity.organization_id).where(
+                    OrganizationActivity.activity_id == any_(bindparam(
+                        "activity_ids",
+                        type_=ARRAY(OrganizationActivity.activity_id.type),
+                    ))
+                )
+            ),
+            {"activity_ids": list(activity_ids)},
+            limit, after, with_total, fields,
+        )
@@ -1,11 +1,78 @@
-from collections.abc import Sequence
+import math
+from collections.abc import AsyncIterator, Callable, Collection, Hashable, \
+    Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
 from uuid import UUID
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import ARRAY, ColumnElement, DateTime, Float, Integer, Row, \
+    Select, String, any_, bindparam, cast, select, func, and_, or_, true, \
+    tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import load_only, selectinload
 
-from app.database import Activity, Organization, Office, Building
+from app.core.config import settings
+from app.database import (Activity, ActivityClosure, Organization, Office,
+                          Building, OrganizationOffice, OrganizationActivity,
+                          OrganizationPhone)
+from app.repositories.geo import METERS_PER_DEG_LAT, distance_sq_m, \
+    in_bbox, knn_order, lon_scale, radius_bbox
+from app.repositories.pagination import Page
+from app.repositories.search import get_name_search
+
+OrgKey = tuple[Any, ...]
+
+# сортировки составного запроса: name — по имени, relevance — по совпадению
+# с name (нужен name), distance — по ближайшему офису (нужен point)
+QUERY_SORTS = ("name", "relevance", "distance")
+
+
+@dataclass(frozen=True, slots=True)
+class OrganizationQuery:
+    """combinable filters, every one that is set must match"""
+    activity_ids: tuple[UUID, ...] | None = None
+    building_id: UUID | None = None
+    bbox: tuple[float, float, float, float] | None = None
+    point: tuple[float, float] | None = None
+    radius_m: float | None = None
+    name: str | None = None
+
+    @property
+    def shape(self) -> tuple[bool, ...]:
+        """which filters are set, the statement text depends only on it"""
+        return (
+            self.activity_ids is not None, self.building_id is not None,
+            self.bbox is not None, self.radius_m is not None,
+            self.name is not None,
+        )
+
+# Запросы собираются один раз на форму (ключ), значения идут bind-параметрами.
+# Построение select() с loader-опциями и вычисление его cache key стоят
+# дороже, чем компиляция из кэша, а одинаковый SQL-текст даёт asyncpg
+# переиспользовать prepared statement. Билдеры не должны захватывать значения.
+_statements: dict[Hashable, Select] = {}
+
+
+def _prepared(key: Hashable, build: Callable[[], Select]) -> Select:
+    stmt = _statements.get(key)
+    if stmt is None:
+        stmt = _statements[key] = build()
+    return stmt
+
+
+def _in_list(column: ColumnElement, name: str, dialect_name: str):
+    """
+    column IN <list parameter>. On postgres = ANY(array): one SQL text
+    for any list length instead of one per length.
+    """
+    if dialect_name == "postgresql":
+        return column == any_(bindparam(name, type_=ARRAY(column.type)))
+    return column.in_(bindparam(name, expanding=True))
+
+
+def _fields_key(fields: Collection[str] | None) -> frozenset[str] | None:
+    return None if fields is None else frozenset(fields)
 
 
 class OrganizationRepository:
@@ -13,75 +80,188 @@ class OrganizationRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_by_building(self, building_id: UUID) -> Sequence[Organization]:
-        """organization via building"""
-        stmt = (
-            select(Organization)
-            .join(Organization.offices)
-            .join(Office.building)
-            .where(Building.id == building_id)
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
-            )
+    @property
+    def dialect_name(self) -> str:
+        return self.session.bind.dialect.name
+
+    @staticmethod
+    def _with_relations(stmt: Select) -> Select:
+        return stmt.options(
+            selectinload(Organization.activities),
+            selectinload(Organization.phones),
+            selectinload(Organization.offices).selectinload(Office.building),
         )
-        result = await self.session.execute(stmt)
-        return result.scalars().unique().all()
 
-    async def get_by_activity(
+    @staticmethod
+    def _list_options(
+        stmt: Select, fields: Collection[str] | None = None
+    ) -> Select:
+        """
+        list shape: id/name/updated_at columns plus only requested
+        relationships (all of phones/offices when fields is None).
+        """
+        options = [load_only(
+            Organization.id, Organization.name, Organization.updated_at
+        )]
+        if fields is None or "phones" in fields:
+            options.append(selectinload(Organization.phones))
+        if fields is None or "offices" in fields:
+            options.append(
+                selectinload(Organization.offices)
+                .selectinload(Office.building)
+            )
+        return stmt.options(*options)
+
+    async def _paginate(
         self,
-        activity_id: UUID,
-    ) -> Sequence[Organization]:
+        shape: Hashable,
+        build: Callable[[], Select],
+        params: dict[str, Any],
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        rank: ColumnElement[float] | None = None,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
         """
-        Get organization via activity,
-        include inner levels.
+        keyset page over (name, id), or (rank desc, name, id) when ranked.
+        build() returns the filtered select for `shape`, parametrized
+        by `params`.
         """
-        # рекурсивный CTE для поиска дочерних видов деятельности
-        cte = (
-            select(Activity.id, Activity.parent_id)
-            .where(Activity.id == activity_id)
-            .cte(name="activity_tree", recursive=True)
-        )
+        total = None
+        if with_total:
+            count = _prepared(
+                (shape, "count"),
+                lambda: select(func.count()).select_from(build().subquery()),
+            )
+            total = await self.session.scalar(count, params)
 
-        cte = cte.union_all(
-            select(Activity.id, Activity.parent_id).where(
-                Activity.parent_id == cte.c.id
+        def build_page() -> Select:
+            stmt = build()
+            name_id = tuple_(Organization.name, Organization.id)
+            after_name_id = tuple_(
+                bindparam("after_name", type_=String),
+                bindparam("after_id", type_=Organization.id.type),
+            )
+            if rank is None:
+                if after is not None:
+                    stmt = stmt.where(name_id > after_name_id)
+                stmt = stmt.order_by(Organization.name, Organization.id)
+            else:
+                stmt = stmt.add_columns(rank)
+                if after is not None:
+                    after_rank = bindparam("after_rank", type_=Float)
+                    stmt = stmt.where(or_(
+                        rank < after_rank,
+                        and_(rank == after_rank, name_id > after_name_id),
+                    ))
+                stmt = stmt.order_by(
+                    rank.desc(), Organization.name, Organization.id
+                )
+            return self._list_options(
+                stmt.limit(bindparam("limit", type_=Integer)), fields
             )
+
+        stmt = _prepared(
+            (shape, "page", after is not None, _fields_key(fields)),
+            build_page,
         )
+        params = {**params, "limit": limit + 1}
+        if after is not None:
+            *after_rank, params["after_name"], params["after_id"] = after
+            if after_rank:
+                params["after_rank"] = after_rank[0]
+        result = await self.session.execute(stmt, params)
+        rows = result.all()
 
-        stmt = (
-            select(Organization)
-            .join(Organization.activities)
-            .where(Activity.id.in_(select(cte.c.id)))
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
-            )
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_key = (*last[1:], last[0].name, last[0].id)
+        return Page(items=[row[0] for row in rows], next_key=next_key,
+                    total=total)
+
+    @staticmethod
+    def _in_buildings(building_filter) -> Select:
+        return (
+            select(OrganizationOffice.organization_id)
+            .join(Office, Office.id == OrganizationOffice.office_id)
+            .join(Building, Building.id == Office.building_id)
+            .where(building_filter)
         )
 
-        result = await self.session.execute(stmt)
-        return result.scalars().unique().all()
+    async def get_by_building(
+        self,
+        building_id: UUID,
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
+        """organization via building"""
+        def build() -> Select:
+            return select(Organization).where(
+                Organization.id.in_(
+                    select(OrganizationOffice.organization_id)
+                    .join(Office, Office.id == OrganizationOffice.office_id)
+                    .where(Office.building_id == bindparam("building_id"))
+                )
+            )
+
+        return await self._paginate(
+            "by_building", build, {"building_id": building_id},
+            limit, after, with_total, fields=fields,
+        )
 
-    async def search_by_name(self, query: str) -> Sequence[Organization]:
+    async def get_by_activity(
+        self,
+        activity_ids: Sequence[UUID],
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
         """
-        name search, ignore register.
+        Get organization via any of activities
+        (resolved subtree of requested activity).
         """
-        stmt = (
-            select(Organization)
-            .where(func.lower(Organization.name).ilike(f"%{query.lower()}%"))
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
+        dialect_name = self.dialect_name
+
+        def build() -> Select:
+            return select(Organization).where(
+                Organization.id.in_(
+                    select(OrganizationActivity.organization_id).where(
+                        _in_list(OrganizationActivity.activity_id,
+                                 "activity_ids", dialect_name)
+                    )
+                )
             )
+
+        return await self._paginate(
+            ("by_activity", dialect_name), build,
+            {"activity_ids": list(activity_ids)},
+            limit, after, with_total, fields=fields,
+        )
+
+    async def search_by_name(
+        self,
+        query: str,
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
+        """
+        name search, ignore register, best matches first.
+        """
+        search = get_name_search(self.dialect_name)
+        return await self._paginate(
+            ("search", type(search).__name__),
+            lambda: select(Organization).where(search.condition()),
+            search.params(query),
+            limit, after, with_total, rank=search.rank(), fields=fields,
         )
-        result = await self.session.execute(stmt)
-        return result.scalars().unique().all()
 
     async def get_in_area(
         self,
@@ -89,56 +269,572 @@ class OrganizationRepository:
         lat_max: float,
         lon_min: float,
         lon_max: float,
-    ) -> Sequence[Organization]:
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
         """
         search organizations in area
         """
-        stmt = (
-            select(Organization)
-            .join(Organization.offices)
-            .join(Office.building)
-            .where(
-                and_(
-                    Building.lat >= lat_min,
-                    Building.lat <= lat_max,
-                    Building.lon >= lon_min,
-                    Building.lon <= lon_max,
+        dialect_name = self.dialect_name
+
+        def build() -> Select:
+            bbox = (bindparam(name, type_=Float) for name in
+                    ("lat_min", "lat_max", "lon_min", "lon_max"))
+            return select(Organization).where(
+                Organization.id.in_(
+                    self._in_buildings(in_bbox(dialect_name, *bbox))
                 )
             )
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
+
+        return await self._paginate(
+            ("in_area", dialect_name), build,
+            {"lat_min": lat_min, "lat_max": lat_max,
+             "lon_min": lon_min, "lon_max": lon_max},
+            limit, after, with_total, fields=fields,
+        )
+
+    async def query(
+        self,
+        filters: OrganizationQuery,
+        limit: int,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        sort: str = "name",
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
+        """
+        one statement for any combination of filters: activity and office
+        location conditions are separate semi-joins (IN subqueries), so
+        organizations are never multiplied by joins and need no DISTINCT.
+        Building, bbox and radius apply to the same office.
+        """
+        dialect_name = self.dialect_name
+        search = (
+            get_name_search(dialect_name) if filters.name is not None
+            else None
+        )
+        lat = bindparam("lat", type_=Float)
+        lon = bindparam("lon", type_=Float)
+        kx = bindparam("kx", type_=Float)
+
+        def build() -> Select:
+            stmt = select(Organization)
+            if search is not None:
+                stmt = stmt.where(search.condition())
+            if filters.activity_ids is not None:
+                stmt = stmt.where(Organization.id.in_(
+                    select(OrganizationActivity.organization_id).where(
+                        _in_list(OrganizationActivity.activity_id,
+                                 "activity_ids", dialect_name)
+                    )
+                ))
+            location = []
+            if filters.building_id is not None:
+                location.append(
+                    Office.building_id == bindparam("building_id")
+                )
+            if filters.bbox is not None or filters.radius_m is not None:
+                bbox = (bindparam(name, type_=Float) for name in
+                        ("lat_min", "lat_max", "lon_min", "lon_max"))
+                location.append(in_bbox(dialect_name, *bbox))
+            if filters.radius_m is not None:
+                location.append(
+                    distance_sq_m(lat, lon, kx)
+                    <= bindparam("radius_sq", type_=Float)
+                )
+            if location:
+                offices = (
+                    select(OrganizationOffice.organization_id)
+                    .join(Office, Office.id == OrganizationOffice.office_id)
+                )
+                if filters.bbox is not None or filters.radius_m is not None:
+                    offices = offices.join(
+                        Building, Building.id == Office.building_id
+                    )
+                stmt = stmt.where(
+                    Organization.id.in_(offices.where(*location))
+                )
+            return stmt
+
+        rank = None
+        if sort == "relevance":
+            rank = search.rank()
+        elif sort == "distance":
+            # ближайший офис; внутри радиуса минимум тот же, что по всем
+            nearest = (
+                select(func.min(distance_sq_m(lat, lon, kx)))
+                .select_from(OrganizationOffice)
+                .join(Office, Office.id == OrganizationOffice.office_id)
+                .join(Building, Building.id == Office.building_id)
+                .where(OrganizationOffice.organization_id == Organization.id)
+                .scalar_subquery()
             )
+            rank = -func.coalesce(nearest, float("inf"))
+
+        params: dict[str, Any] = {}
+        if search is not None:
+            params.update(search.params(filters.name))
+        if filters.activity_ids is not None:
+            params["activity_ids"] = list(filters.activity_ids)
+        if filters.building_id is not None:
+            params["building_id"] = filters.building_id
+        if filters.point is not None:
+            params["lat"], params["lon"] = filters.point
+            params["kx"] = lon_scale(filters.point[0])
+        if filters.radius_m is not None:
+            params.update(zip(
+                ("lat_min", "lat_max", "lon_min", "lon_max"),
+                radius_bbox(*filters.point, filters.radius_m),
+            ))
+            params["radius_sq"] = filters.radius_m * filters.radius_m
+        elif filters.bbox is not None:
+            params.update(zip(
+                ("lat_min", "lat_max", "lon_min", "lon_max"), filters.bbox
+            ))
+
+        shape = (
+            "query", dialect_name, filters.shape, sort,
+            type(search).__name__ if search is not None else None,
+        )
+        return await self._paginate(
+            shape, build, params, limit, after, with_total,
+            rank=rank, fields=fields,
         )
-        result = await self.session.execute(stmt)
-        return result.scalars().unique().all()
+
+    async def get_page_by_ids(
+        self,
+        organization_ids: Sequence[UUID],
+        limit: int,
+        after: OrgKey | None = None,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
+        """keyset page over (name, id) among the given ids"""
+        dialect_name = self.dialect_name
+        return await self._paginate(
+            ("page_by_ids", dialect_name),
+            lambda: select(Organization).where(
+                _in_list(Organization.id, "ids", dialect_name)
+            ),
+            {"ids": list(organization_ids)},
+            limit, after, fields=fields,
+        )
+
+    async def get_nearby(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        radius_m: float | None = None,
+        fields: Collection[str] | None = None,
+    ) -> list[tuple[Organization, float]]:
+        """
+        k nearest organizations (by closest office) with distance in meters.
+
+        Radius is filtered exactly via GiST bbox + distance check; without
+        radius the candidates come from a GiST KNN window of buildings and
+        are re-ranked in meters. The window widens until it holds k
+        organizations that no building outside it can beat, or covers the
+        whole table.
+        """
+        dialect_name = self.dialect_name
+        with_radius = radius_m is not None
+        knn = not with_radius and dialect_name == "postgresql"
+
+        def build() -> Select:
+            lat_p = bindparam("lat", type_=Float)
+            lon_p = bindparam("lon", type_=Float)
+            dist_sq = distance_sq_m(
+                lat_p, lon_p, bindparam("kx", type_=Float)
+            )
+            buildings = select(
+                Building.id.label("building_id"), dist_sq.label("dist_sq")
+            )
+            if with_radius:
+                bbox = (bindparam(name, type_=Float) for name in
+                        ("lat_min", "lat_max", "lon_min", "lon_max"))
+                buildings = buildings.where(
+                    in_bbox(dialect_name, *bbox),
+                    dist_sq <= bindparam("radius_sq", type_=Float),
+                )
+            elif knn:
+                distance_deg = knn_order(lat_p, lon_p)
+                buildings = (
+                    buildings.add_columns(distance_deg.label("knn"))
+                    .order_by(distance_deg)
+                    .limit(bindparam("candidates", type_=Integer))
+                )
+            buildings = buildings.cte("candidates")
+
+            min_dist = func.min(buildings.c.dist_sq)
+            nearest = (
+                select(
+                    OrganizationOffice.organization_id,
+                    min_dist.label("dist_sq"),
+                )
+                .join(Office, Office.id == OrganizationOffice.office_id)
+                .join(buildings,
+                      buildings.c.building_id == Office.building_id)
+                .group_by(OrganizationOffice.organization_id)
+                .order_by(min_dist, OrganizationOffice.organization_id)
+                .limit(bindparam("k", type_=Integer))
+                .subquery()
+            )
+            if not knn:
+                stmt = (
+                    select(Organization, nearest.c.dist_sq)
+                    .join(nearest,
+                          nearest.c.organization_id == Organization.id)
+                )
+            else:
+                # окно целиком: сколько зданий и самое дальнее (в градусах);
+                # строка есть, даже если в окне нет ни одной организации
+                window = select(
+                    func.count().label("size"),
+                    func.max(buildings.c.knn).label("edge"),
+                ).subquery()
+                stmt = (
+                    select(Organization, nearest.c.dist_sq,
+                           window.c.size, window.c.edge)
+                    .select_from(window)
+                    .outerjoin(nearest, true())
+                    .outerjoin(Organization,
+                               Organization.id == nearest.c.organization_id)
+                )
+            return self._list_options(
+                stmt.order_by(nearest.c.dist_sq, Organization.id), fields
+            )
+
+        stmt = _prepared(
+            ("nearby", dialect_name, with_radius, _fields_key(fields)), build
+        )
+        params = {"lat": lat, "lon": lon, "kx": lon_scale(lat), "k": k}
+        if with_radius:
+            params.update(zip(
+                ("lat_min", "lat_max", "lon_min", "lon_max"),
+                radius_bbox(lat, lon, radius_m),
+            ))
+            params["radius_sq"] = radius_m * radius_m
+        if not knn:
+            result = await self.session.execute(stmt, params)
+            return [(org, math.sqrt(d)) for org, d in result.all()]
+
+        # здание вне окна не ближе edge градусов, то есть edge * min(kx, ky)
+        # метров: порядок <-> плоский в градусах, а расстояние — в метрах
+        meters_per_deg = min(params["kx"], METERS_PER_DEG_LAT)
+        candidates = k * settings.geo_knn_candidates
+        while True:
+            params["candidates"] = candidates
+            rows = (await self.session.execute(stmt, params)).all()
+            size, edge = rows[0].size, rows[0].edge
+            found = [(org, math.sqrt(d)) for org, d, _, _ in rows
+                     if org is not None]
+            if size < candidates:
+                return found
+            if len(found) == k and found[-1][1] <= edge * meters_per_deg:
+                return found
+            candidates *= 4
+
+    def _facet_filters(
+        self, organization_id: ColumnElement, bbox: bool, name: bool,
+    ) -> list[ColumnElement[bool]]:
+        """
+        bbox (an office inside the area) and name conditions on
+        organization_id as semi-joins, parameters as in query().
+        """
+        dialect_name = self.dialect_name
+        conditions = []
+        if bbox:
+            area = (bindparam(param, type_=Float) for param in
+                    ("lat_min", "lat_max", "lon_min", "lon_max"))
+            conditions.append(organization_id.in_(
+                self._in_buildings(in_bbox(dialect_name, *area))
+            ))
+        if name:
+            search = get_name_search(dialect_name)
+            conditions.append(organization_id.in_(
+                select(Organization.id).where(search.condition())
+            ))
+        return conditions
+
+    def _facet_params(
+        self,
+        bbox: tuple[float, float, float, float] | None,
+        name: str | None,
+    ) -> dict[str, Any]:
+        params: dict[str, Any] = {}
+        if bbox is not None:
+            params.update(zip(
+                ("lat_min", "lat_max", "lon_min", "lon_max"), bbox
+            ))
+        if name is not None:
+            params.update(get_name_search(self.dialect_name).params(name))
+        return params
+
+    async def count_by_activity(
+        self,
+        bbox: tuple[float, float, float, float] | None = None,
+        name: str | None = None,
+    ) -> Sequence[Row[tuple[UUID, int]]]:
+        """
+        (activity id, organizations in its subtree) for every activity
+        with matching organizations, most first. One GROUP BY over the
+        closure table; an organization is counted once per node.
+        """
+        dialect_name = self.dialect_name
+
+        def build() -> Select:
+            organizations = func.count(
+                OrganizationActivity.organization_id.distinct()
+            )
+            return (
+                select(ActivityClosure.ancestor_id, organizations)
+                .join(OrganizationActivity,
+                      OrganizationActivity.activity_id
+                      == ActivityClosure.descendant_id)
+                .where(*self._facet_filters(
+                    OrganizationActivity.organization_id,
+                    bbox is not None, name is not None,
+                ))
+                .group_by(ActivityClosure.ancestor_id)
+                .order_by(organizations.desc(), ActivityClosure.ancestor_id)
+            )
+
+        stmt = _prepared(
+            ("count_by_activity", dialect_name, bbox is not None,
+             type(get_name_search(dialect_name)).__name__
+             if name is not None else None),
+            build,
+        )
+        result = await self.session.execute(
+            stmt, self._facet_params(bbox, name)
+        )
+        return result.all()
+
+    async def count_by_building(
+        self,
+        limit: int,
+        bbox: tuple[float, float, float, float] | None = None,
+        name: str | None = None,
+    ) -> Sequence[Row[tuple[UUID, int]]]:
+        """
+        (building id, organizations with an office there), most first;
+        with bbox only buildings inside the area. One GROUP BY.
+        """
+        dialect_name = self.dialect_name
+
+        def build() -> Select:
+            organizations = func.count(
+                OrganizationOffice.organization_id.distinct()
+            )
+            stmt = (
+                select(Office.building_id, organizations)
+                .join(OrganizationOffice,
+                      OrganizationOffice.office_id == Office.id)
+            )
+            if bbox is not None:
+                area = (bindparam(param, type_=Float) for param in
+                        ("lat_min", "lat_max", "lon_min", "lon_max"))
+                stmt = stmt.join(
+                    Building, Building.id == Office.building_id
+                ).where(in_bbox(dialect_name, *area))
+            return (
+                stmt.where(*self._facet_filters(
+                    OrganizationOffice.organization_id, False,
+                    name is not None,
+                ))
+                .group_by(Office.building_id)
+                .order_by(organizations.desc(), Office.building_id)
+                .limit(bindparam("limit", type_=Integer))
+            )
+
+        stmt = _prepared(
+            ("count_by_building", dialect_name, bbox is not None,
+             type(get_name_search(dialect_name)).__name__
+             if name is not None else None),
+            build,
+        )
+        result = await self.session.execute(
+            stmt, {**self._facet_params(bbox, name), "limit": limit}
+        )
+        return result.all()
 
     async def get_by_id(self, organization_id: UUID) -> Organization | None:
-        stmt = (
+        stmt = _prepared("by_id", lambda: self._with_relations(
             select(Organization)
-            .where(Organization.id == organization_id)
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
-            )
+            .where(Organization.id == bindparam("organization_id"))
+        ))
+        result = await self.session.execute(
+            stmt, {"organization_id": organization_id}
         )
-        result = await self.session.execute(stmt)
         return result.scalars().first()
 
-    async def get_all(self, limit: int = 100) -> Sequence[Organization]:
-        stmt = (
-            select(Organization)
-            .limit(limit)
-            .options(
-                selectinload(Organization.activities),
-                selectinload(Organization.phones),
-                selectinload(Organization.offices).selectinload(
-                    Office.building),
+    async def get_version(
+        self, organization_id: UUID
+    ) -> tuple[datetime | None, int]:
+        """
+        max(updated_at) and row count over the organization, its phones,
+        offices, their buildings and activities: the detail response
+        version without loading it.
+        """
+        def build() -> Select:
+            org_id = bindparam("organization_id")
+            offices = (
+                select(Office.id.label("office_id"), Office.building_id,
+                       Office.updated_at)
+                .join(OrganizationOffice,
+                      OrganizationOffice.office_id == Office.id)
+                .where(OrganizationOffice.organization_id == org_id)
+                .subquery()
             )
+            rows = union_all(
+                select(Organization.updated_at)
+                .where(Organization.id == org_id),
+                select(OrganizationPhone.updated_at)
+                .where(OrganizationPhone.organization_id == org_id),
+                select(offices.c.updated_at),
+                select(Building.updated_at)
+                .join(offices, offices.c.building_id == Building.id),
+                select(Activity.updated_at)
+                .join(OrganizationActivity,
+                      OrganizationActivity.activity_id == Activity.id)
+                .where(OrganizationActivity.organization_id == org_id),
+            ).subquery()
+            return select(func.max(rows.c.updated_at), func.count())
+
+        result = await self.session.execute(
+            _prepared("version", build), {"organization_id": organization_id}
+        )
+        return tuple(result.one())
+
+    async def get_by_ids(
+        self,
+        organization_ids: Sequence[UUID],
+        fields: Collection[str] | None = None,
+    ) -> list[Organization]:
+        """list-shaped organizations in requested order, missing ids skipped"""
+        if not organization_ids:
+            return []
+        dialect_name = self.dialect_name
+        stmt = _prepared(
+            ("by_ids", dialect_name, _fields_key(fields)),
+            lambda: self._list_options(
+                select(Organization).where(
+                    _in_list(Organization.id, "ids", dialect_name)
+                ),
+                fields,
+            ),
+        )
+        result = await self.session.execute(
+            stmt, {"ids": list(organization_ids)}
+        )
+        by_id = {org.id: org for org in result.scalars().all()}
+        return [by_id[i] for i in organization_ids if i in by_id]
+
+    async def get_details_by_ids(
+        self, organization_ids: Collection[UUID]
+    ) -> dict[UUID, Organization]:
+        """
+        detail-shaped organizations by id: one IN query plus one batched
+        load per relationship, regardless of the number of ids.
+        """
+        if not organization_ids:
+            return {}
+        dialect_name = self.dialect_name
+        stmt = _prepared(
+            ("details_by_ids", dialect_name),
+            lambda: self._with_relations(
+                select(Organization).where(
+                    _in_list(Organization.id, "ids", dialect_name)
+                )
+            ),
+        )
+        result = await self.session.execute(
+            stmt, {"ids": list(organization_ids)}
+        )
+        return {org.id: org for org in result.scalars().all()}
+
+    async def stream_details(
+        self,
+        activity_ids: Sequence[UUID] | None = None,
+        bbox: tuple[float, float, float, float] | None = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Organization]]:
+        """
+        detail-shaped organizations in id order, chunk by chunk from a
+        server-side cursor (relations loaded per chunk). The identity map
+        holds objects weakly, so a chunk is freed once the caller drops it
+        and memory stays flat. Needs a session in a transaction
+        (snapshot=True).
+        """
+        dialect_name = self.dialect_name
+        stmt = select(Organization).order_by(Organization.id)
+        params = {}
+        if activity_ids is not None:
+            stmt = stmt.where(Organization.id.in_(
+                select(OrganizationActivity.organization_id).where(
+                    _in_list(OrganizationActivity.activity_id,
+                             "activity_ids", dialect_name)
+                )
+            ))
+            params["activity_ids"] = list(activity_ids)
+        if bbox is not None:
+            stmt = stmt.where(Organization.id.in_(
+                self._in_buildings(in_bbox(dialect_name, *bbox))
+            ))
+        result = await self.session.stream_scalars(
+            self._with_relations(stmt), params,
+            execution_options={"yield_per": chunk_size},
         )
+        async for chunk in result.partitions():
+            yield chunk
+
+    async def db_now(self) -> datetime:
+        """database clock in the same form as updated_at columns"""
+        now = func.now()
+        if self.dialect_name == "postgresql":
+            # timestamptz -> timestamp, как now() пишется в updated_at
+            now = cast(now, DateTime)
+        return await self.session.scalar(select(now))
+
+    async def get_locations(
+        self,
+        org_ids: Collection[UUID] | None = None,
+        changed_since: datetime | None = None,
+    ) -> Sequence[Row[tuple[UUID, float | None, float | None]]]:
+        """
+        (org_id, lat, lon) per office, organizations without offices
+        come with lat/lon = None.
+        """
+        stmt = (
+            select(Organization.id, Building.lat, Building.lon)
+            .outerjoin(OrganizationOffice,
+                       OrganizationOffice.organization_id == Organization.id)
+            .outerjoin(Office, Office.id == OrganizationOffice.office_id)
+            .outerjoin(Building, Building.id == Office.building_id)
+        )
+        if org_ids is not None:
+            stmt = stmt.where(Organization.id.in_(org_ids))
+        if changed_since is not None:
+            stmt = stmt.where(or_(
+                Organization.updated_at > changed_since,
+                Organization.id.in_(self._in_buildings(or_(
+                    Office.updated_at > changed_since,
+                    Building.updated_at > changed_since,
+                ))),
+            ))
         result = await self.session.execute(stmt)
-        return result.scalars().unique().all()
+        return result.all()
+
+    async def get_all(
+        self,
+        limit: int = 100,
+        after: OrgKey | None = None,
+        with_total: bool = False,
+        fields: Collection[str] | None = None,
+    ) -> Page[Organization]:
+        return await self._paginate(
+            "all", lambda: select(Organization), {},
+            limit, after, with_total, fields=fields,
+        )
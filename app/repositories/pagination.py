@@ -0,0 +1,34 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class Page(Generic[T]):
+    items: Sequence[T]
+    next_key: tuple[Any, ...] | None = None
+    total: int | None = None
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """
+    opaque cursor from sort key values.
+    """
+    raw = json.dumps([str(v) for v in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор пагинации")
+    if not isinstance(key, list) or not all(isinstance(v, str) for v in key):
+        raise ValueError("Некорректный курсор пагинации")
+    return key
@@ -0,0 +1,93 @@
+from abc import ABC, abstractmethod
+
+from sqlalchemy import ColumnElement, Float, String, bindparam, case, cast, \
+    func, or_
+
+from app.core.config import settings
+from app.database import Organization
+
+
+def _like_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+
+
+class NameSearch(ABC):
+    """
+    filter and rank expressions for organization name search, built on
+    bind parameters; values for a concrete query come from params().
+    """
+
+    def __init__(self):
+        self.query = bindparam("query", type_=String)
+        self.name = func.lower(Organization.name)
+        self.is_prefix = self.name.like(
+            bindparam("prefix_pattern", type_=String), escape="\\"
+        )
+        self.is_substring = self.name.like(
+            bindparam("substring_pattern", type_=String), escape="\\"
+        )
+
+    @staticmethod
+    def params(query: str) -> dict[str, str]:
+        query = query.lower()
+        escaped = _like_escape(query)
+        return {
+            "query": query,
+            "prefix_pattern": f"{escaped}%",
+            "substring_pattern": f"%{escaped}%",
+        }
+
+    @abstractmethod
+    def condition(self) -> ColumnElement[bool]:
+        ...
+
+    @abstractmethod
+    def rank(self) -> ColumnElement[float]:
+        ...
+
+
+class TrigramNameSearch(NameSearch):
+    """
+    pg_trgm: substring, whole-name and in-word typo tolerant matching,
+    served by GIN index ix_org_name_trgm. Typo tolerance follows
+    pg_trgm.similarity_threshold / word_similarity_threshold.
+    """
+
+    def condition(self) -> ColumnElement[bool]:
+        return or_(
+            self.is_substring,
+            self.name.op("%")(self.query),
+            self.query.op("<%")(self.name),
+        )
+
+    def rank(self) -> ColumnElement[float]:
+        similarity = func.greatest(
+            func.similarity(self.name, self.query),
+            func.word_similarity(self.query, self.name),
+        )
+        return cast(
+            similarity + case((self.is_prefix, 1.0), else_=0.0), Float
+        )
+
+
+class LikeNameSearch(NameSearch):
+    """
+    fallback without extensions: substring match, prefix first.
+    """
+
+    def condition(self) -> ColumnElement[bool]:
+        return self.is_substring
+
+    def rank(self) -> ColumnElement[float]:
+        return cast(case((self.is_prefix, 1.0), else_=0.5), Float)
+
+
+def get_name_search(dialect_name: str) -> NameSearch:
+    backend = settings.search_backend
+    if backend == "auto":
+        backend = "trigram" if dialect_name == "postgresql" else "like"
+    if backend == "trigram":
+        return TrigramNameSearch()
+    return LikeNameSearch()
@@ -15,6 +15,8 @@ class ActivityRead(ActivityBase):
 
 
 class ActivityTree(ActivityRead):
+    # только при with_counts: организации узла вместе с поддеревом
+    organizations_count: int | None = None
     children: list["ActivityTree"] = []
 
     class Config:
@@ -23,3 +25,7 @@ class ActivityTree(ActivityRead):
 
 
 ActivityTree.model_rebuild()
+
+
+class ActivityTreeResponse(BaseModel):
+    items: list[ActivityTree]
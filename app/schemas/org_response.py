@@ -1,10 +1,26 @@
+import uuid
+
 from pydantic import BaseModel, Field
-from app.schemas.organization import OrganizationReadShort, OrganizationReadDetail
+from app.schemas.organization import OrganizationReadShort, OrganizationReadDetail, \
+    OrganizationNearby
 
 
 class OrganizationListResponse(BaseModel):
-    total: int = Field(..., example=100)
+    total: int | None = Field(
+        None, example=100,
+        description="Общее количество (только при with_total=true)",
+    )
     items: list[OrganizationReadShort]
+    next_cursor: str | None = Field(
+        None, description="Курсор следующей страницы, null — страниц больше нет"
+    )
+
+    class Config:
+        from_attributes = True
+
+
+class OrganizationNearbyResponse(BaseModel):
+    items: list[OrganizationNearby]
 
     class Config:
         from_attributes = True
@@ -15,3 +31,34 @@ class OrganizationDetailResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class OrganizationBatchItem(BaseModel):
+    id: uuid.UUID
+    found: bool = Field(..., description="false — организации с таким ID нет")
+    organization: OrganizationReadDetail | None = None
+
+
+class OrganizationBatchResponse(BaseModel):
+    items: list[OrganizationBatchItem]
+
+
+class ActivityFacet(BaseModel):
+    activity_id: uuid.UUID
+    count: int = Field(
+        ..., description="Организаций с этим видом деятельности "
+                         "или вложенным в него",
+    )
+
+
+class ActivityFacetResponse(BaseModel):
+    items: list[ActivityFacet]
+
+
+class BuildingFacet(BaseModel):
+    building_id: uuid.UUID
+    count: int = Field(..., description="Организаций с офисом в здании")
+
+
+class BuildingFacetResponse(BaseModel):
+    items: list[BuildingFacet]
@@ -36,9 +36,19 @@ class OrganizationReadShort(OrganizationBase):
         from_attributes = True
 
 
+class OrganizationNearby(OrganizationReadShort):
+    distance_m: float = Field(..., example=350.5)
+
+
 class OrganizationReadDetail(OrganizationReadShort):
     offices: list[OfficeRead] = []
     activities: list[ActivityRead] = []
 
     class Config:
         from_attributes = True
+
+
+class OrganizationBatchRequest(BaseModel):
+    ids: list[uuid.UUID] = Field(
+        ..., min_length=1, description="ID организаций, порядок сохраняется"
+    )
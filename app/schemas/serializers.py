@@ -0,0 +1,83 @@
+"""
+Direct ORM -> dict serialization for hot list/detail responses.
+
+Dicts mirror field order of the pydantic schemas, so orjson output is
+byte-identical to the response_model path while skipping validation.
+UUIDs are left as is, orjson writes them natively; asyncpg's own UUID
+subclass is not, dumps() converts it through default.
+"""
+from typing import Any
+from uuid import UUID
+
+import orjson
+
+from app.database import Activity, Building, Office, Organization
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default,
+                        option=orjson.OPT_NON_STR_KEYS)
+
+
+def building(b: Building) -> dict[str, Any]:
+    return {
+        "address": b.address,
+        "lat": float(b.lat),
+        "lon": float(b.lon),
+        "id": b.id,
+    }
+
+
+def office(o: Office) -> dict[str, Any]:
+    return {
+        "id": o.id,
+        "floor": o.floor,
+        "unit": o.unit,
+        "building": building(o.building),
+    }
+
+
+def activity(a: Activity) -> dict[str, Any]:
+    return {"name": a.name, "id": a.id, "parent_id": a.parent_id}
+
+
+def organization_short(org: Organization) -> dict[str, Any]:
+    return {
+        "name": org.name,
+        "id": org.id,
+        "phones": [{"phone_number": p.phone_number} for p in org.phones],
+        "offices": [office(o) for o in org.offices],
+    }
+
+
+_SHORT_FIELDS = {
+    "name": lambda org: org.name,
+    "id": lambda org: org.id,
+    "phones": lambda org: [
+        {"phone_number": p.phone_number} for p in org.phones
+    ],
+    "offices": lambda org: [office(o) for o in org.offices],
+}
+
+# порядок полей совпадает с OrganizationReadShort
+SHORT_FIELDS = tuple(_SHORT_FIELDS)
+
+
+def organization_fields(
+    org: Organization, fields: tuple[str, ...]
+) -> dict[str, Any]:
+    """sparse fieldset of organization_short"""
+    return {name: _SHORT_FIELDS[name](org) for name in fields}
+
+
+def organization_detail(org: Organization) -> dict[str, Any]:
+    return {
+        **organization_short(org),
+        "activities": [activity(a) for a in org.activities],
+    }
@@ -0,0 +1,132 @@
+"""
+Subtree lookup benchmark: recursive CTE vs closure table vs in-process map.
+
+Synthetic tree is inserted inside a transaction and rolled back at the end,
+so the script is safe to run against a seeded database:
+
+    python -m app.scripts.bench_activity_tree --roots 200 --fanout 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import insert, select
+
+from app.database import Activity, ActivityClosure
+from app.database.database import get_database
+from app.database.events import rebuild_activity_closure
+from app.repositories.activity_repo import ActivityRepository
+from app.services.activity_tree import ActivityTreeCache
+
+
+def build_tree(roots: int, fanout: int) -> list[dict]:
+    rows = []
+    level_nodes = [None]
+    for level in range(3):
+        next_nodes = []
+        width = roots if level == 0 else fanout
+        for parent_id in level_nodes:
+            for i in range(width):
+                node_id = uuid.uuid4()
+                rows.append({
+                    "id": node_id,
+                    "parent_id": parent_id,
+                    "name": f"bench-{level}-{i}",
+                    "level": level,
+                })
+                next_nodes.append(node_id)
+        level_nodes = next_nodes
+    return rows
+
+
+def cte_subtree(activity_id: uuid.UUID):
+    cte = (
+        select(Activity.id, Activity.parent_id)
+        .where(Activity.id == activity_id)
+        .cte(name="activity_tree", recursive=True)
+    )
+    cte = cte.union_all(
+        select(Activity.id, Activity.parent_id).where(
+            Activity.parent_id == cte.c.id
+        )
+    )
+    return select(cte.c.id)
+
+
+def closure_subtree(activity_id: uuid.UUID, max_depth: int):
+    """descendant ids (self included) from closure table, one index probe"""
+    return select(ActivityClosure.descendant_id).where(
+        ActivityClosure.ancestor_id == activity_id,
+        ActivityClosure.depth < max_depth,
+    )
+
+
+def report(name: str, timings: list[float], sizes: list[int]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:<10} mean {statistics.mean(timings) * 1000:8.3f} ms  "
+        f"p95 {p95 * 1000:8.3f} ms  avg subtree {statistics.mean(sizes):.0f}"
+    )
+
+
+async def main(roots: int, fanout: int, lookups: int) -> None:
+    db = get_database()
+    rows = build_tree(roots, fanout)
+    root_ids = [r["id"] for r in rows if r["level"] == 0]
+    mid_ids = [r["id"] for r in rows if r["level"] == 1]
+    probes = [
+        random.choice(root_ids if i % 2 else mid_ids) for i in range(lookups)
+    ]
+
+    async with db.session_factory() as session:
+        await session.execute(insert(Activity), rows)
+        await session.run_sync(
+            lambda s: rebuild_activity_closure(s.connection())
+        )
+        print(f"{len(rows)} activities, {lookups} lookups")
+
+        timings, sizes = [], []
+        for activity_id in probes:
+            start = time.perf_counter()
+            ids = (await session.execute(cte_subtree(activity_id))).all()
+            timings.append(time.perf_counter() - start)
+            sizes.append(len(ids))
+        report("cte", timings, sizes)
+
+        timings, sizes = [], []
+        for activity_id in probes:
+            start = time.perf_counter()
+            ids = (await session.execute(
+                closure_subtree(activity_id, 3)
+            )).all()
+            timings.append(time.perf_counter() - start)
+            sizes.append(len(ids))
+        report("closure", timings, sizes)
+
+        cache = ActivityTreeCache(ttl=3600)
+        start = time.perf_counter()
+        cache.load(await ActivityRepository(session).get_tree_rows())
+        print(f"cache load {(time.perf_counter() - start) * 1000:.1f} ms")
+        timings, sizes = [], []
+        for activity_id in probes:
+            start = time.perf_counter()
+            ids = cache.descendants(activity_id, 3)
+            timings.append(time.perf_counter() - start)
+            sizes.append(len(ids))
+        report("cache", timings, sizes)
+
+        await session.rollback()
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roots", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=30)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.roots, args.fanout, args.lookups))
@@ -0,0 +1,398 @@
+"""
+Endpoint load test: every organizations route with a weighted request mix.
+
+Runs the app in-process (httpx ASGI transport, SQL queries are counted per
+request) or against a running server (--url, e.g. uvicorn). Request
+parameters are sampled from the current database, so the data scale is
+whatever app.scripts.seed loaded. Results are written as JSON:
+
+    python -m app.scripts.bench_endpoints run --duration 30 --out base.json
+    python -m app.scripts.bench_endpoints run --url http://localhost:8000
+    python -m app.scripts.bench_endpoints compare base.json new.json
+
+compare exits with code 1 if any route regressed beyond --threshold.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+from sqlalchemy import event, func, select
+
+from app.core.config import settings
+from app.database import Activity, Building, Organization
+from app.database.database import get_database
+
+PREFIX = "/api/v1/organizations"
+
+# route name -> share of requests
+MIX = {
+    "by_building": 20,
+    "by_activity": 20,
+    "geo": 15,
+    "nearby": 15,
+    "search": 15,
+    "detail": 10,
+    "batch": 5,
+    "query": 5,
+    "export": 2,
+    "facets_activities": 3,
+    "facets_buildings": 3,
+}
+
+current_route: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_route", default=None
+)
+
+
+@dataclass(slots=True)
+class Sample:
+    building_ids: list[str]
+    activity_ids: list[str]
+    organization_ids: list[str]
+    words: list[str]
+    points: list[tuple[float, float]]
+    organizations: int
+
+
+@dataclass(slots=True)
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+
+    def summary(self, elapsed: float, queries: int | None) -> dict[str, Any]:
+        timings = sorted(self.latencies)
+        count = len(timings)
+        quantiles = (
+            statistics.quantiles(timings, n=100, method="inclusive")
+            if count > 1 else timings * 99
+        )
+        return {
+            "requests": count,
+            "errors": dict(self.errors),
+            "rps": round(count / elapsed, 1),
+            "mean_ms": round(statistics.mean(timings) * 1000, 2)
+            if count else None,
+            "p50_ms": round(quantiles[49] * 1000, 2) if count else None,
+            "p95_ms": round(quantiles[94] * 1000, 2) if count else None,
+            "p99_ms": round(quantiles[98] * 1000, 2) if count else None,
+            "queries_per_request": round(queries / count, 2)
+            if queries is not None and count else None,
+        }
+
+
+async def load_sample(size: int) -> Sample:
+    db = get_database()
+    async with db.session() as session:
+        async def column(col, limit=size):
+            stmt = select(col).order_by(func.random()).limit(limit)
+            return list((await session.execute(stmt)).scalars())
+
+        buildings = (await session.execute(
+            select(Building.id, Building.lat, Building.lon)
+            .order_by(func.random()).limit(size)
+        )).all()
+        names = await column(Organization.name)
+        sample = Sample(
+            building_ids=[str(b.id) for b in buildings],
+            activity_ids=[str(i) for i in await column(Activity.id)],
+            organization_ids=[str(i) for i in await column(Organization.id)],
+            words=[w for name in names for w in name.split() if len(w) > 3],
+            points=[(float(b.lat), float(b.lon)) for b in buildings],
+            organizations=await session.scalar(
+                select(func.count()).select_from(Organization)
+            ),
+        )
+    await db.dispose()
+    if not sample.building_ids or not sample.organization_ids:
+        raise SystemExit("База пуста: сначала python -m app.scripts.seed")
+    return sample
+
+
+def request_factories(
+    sample: Sample, page_size: int, box_deg: float
+) -> dict[str, Callable[[random.Random], tuple[str, str, dict]]]:
+    """route name -> rng -> (method, path, httpx kwargs)"""
+
+    def box(rng):
+        lat, lon = rng.choice(sample.points)
+        return {"lat_min": lat - box_deg, "lat_max": lat + box_deg,
+                "lon_min": lon - box_deg, "lon_max": lon + box_deg}
+
+    return {
+        "by_building": lambda rng: (
+            "GET", f"{PREFIX}/by-building/{rng.choice(sample.building_ids)}",
+            {"params": {"limit": page_size}},
+        ),
+        "by_activity": lambda rng: (
+            "GET", f"{PREFIX}/by-activity/{rng.choice(sample.activity_ids)}",
+            {"params": {"limit": page_size}},
+        ),
+        "geo": lambda rng: (
+            "GET", f"{PREFIX}/geo",
+            {"params": {**box(rng), "limit": page_size}},
+        ),
+        "nearby": lambda rng: (
+            "GET", f"{PREFIX}/nearby",
+            {"params": dict(zip(("lat", "lon"), rng.choice(sample.points)),
+                            k=10)},
+        ),
+        "search": lambda rng: (
+            "GET", f"{PREFIX}/search",
+            {"params": {"q": rng.choice(sample.words)[:rng.randint(3, 6)],
+                        "limit": page_size}},
+        ),
+        "detail": lambda rng: (
+            "GET", f"{PREFIX}/{rng.choice(sample.organization_ids)}", {},
+        ),
+        "query": lambda rng: (
+            "GET", f"{PREFIX}/query",
+            {"params": {**box(rng),
+                        "activity_id": rng.choice(sample.activity_ids),
+                        "limit": page_size}},
+        ),
+        "batch": lambda rng: (
+            "POST", f"{PREFIX}/batch",
+            {"json": {"ids": rng.sample(
+                sample.organization_ids,
+                min(20, len(sample.organization_ids)),
+            )}},
+        ),
+        # выгрузка области, а не всего каталога: время ответа ограничено
+        "export": lambda rng: (
+            "GET", f"{PREFIX}/export",
+            {"params": {**box(rng),
+                        "format": rng.choice(("ndjson", "csv"))}},
+        ),
+        # фасеты считаются то по области, то по части названия
+        "facets_activities": lambda rng: (
+            "GET", f"{PREFIX}/facets/activities",
+            {"params": box(rng) if rng.random() < 0.5 else
+             {"q": rng.choice(sample.words)[:rng.randint(3, 6)]}},
+        ),
+        "facets_buildings": lambda rng: (
+            "GET", f"{PREFIX}/facets/buildings",
+            {"params": {**box(rng), "limit": page_size}},
+        ),
+    }
+
+
+def count_queries(engines) -> Counter:
+    counts: Counter = Counter()
+
+    def on_execute(*args):
+        route = current_route.get()
+        if route is not None:
+            counts[route] += 1
+
+    for engine in engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    return counts
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    factories: dict,
+    duration: float,
+    concurrency: int,
+    seed: int,
+) -> tuple[dict[str, RouteStats], float]:
+    names = list(MIX)
+    weights = [MIX[name] for name in names]
+    stats: dict[str, RouteStats] = defaultdict(RouteStats)
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int) -> None:
+        rng = random.Random(f"{seed}:{n}")
+        while time.perf_counter() < deadline:
+            route = rng.choices(names, weights)[0]
+            method, path, kwargs = factories[route](rng)
+            current_route.set(route)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            current_route.set(None)
+            if status == 200:
+                stats[route].latencies.append(elapsed)
+            else:
+                stats[route].errors[str(status)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    sample = await load_sample(args.sample)
+    factories = request_factories(sample, args.page_size, args.box_deg)
+    headers = {"X-API-Key": settings.api_key}
+    queries: Counter | None = None
+
+    if args.url:
+        client = httpx.AsyncClient(
+            base_url=args.url, headers=headers, timeout=30,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+    else:
+        from app.core.logger import logger
+        from app.main import app
+
+        logger.disabled = True
+        settings.cache_enabled = not args.no_cache
+        queries = count_queries(get_database().engines)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench", headers=headers, timeout=30,
+        )
+
+    async with client:
+        if args.warmup:
+            await drive(client, factories, args.warmup, args.concurrency,
+                        args.seed + 1)
+            if queries is not None:
+                queries.clear()
+        stats, elapsed = await drive(
+            client, factories, args.duration, args.concurrency, args.seed
+        )
+
+    routes = {
+        name: stats[name].summary(
+            elapsed, queries[name] if queries is not None else None
+        )
+        for name in MIX
+    }
+    overall = RouteStats()
+    for route_stats in stats.values():
+        overall.latencies.extend(route_stats.latencies)
+        overall.errors.update(route_stats.errors)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "target": args.url or "in-process",
+            "organizations": sample.organizations,
+            "duration_s": round(elapsed, 1),
+            "concurrency": args.concurrency,
+            "page_size": args.page_size,
+            "cache": None if args.url else not args.no_cache,
+            "mix": MIX,
+        },
+        "routes": routes,
+        "total": overall.summary(
+            elapsed, sum(queries.values()) if queries is not None else None
+        ),
+    }
+
+
+def print_report(result: dict[str, Any]) -> None:
+    print(f"{'route':<17} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} "
+          f"{'p95':>8} {'p99':>8} {'q/req':>6}")
+    for name, row in [*result["routes"].items(), ("total", result["total"])]:
+        errors = sum(row["errors"].values())
+        cells = [
+            f"{row[key]:8.2f}" if row[key] is not None else f"{'-':>8}"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        qpr = row["queries_per_request"]
+        print(f"{name:<17} {row['requests']:>7} {errors:>5} "
+              f"{row['rps']:>8.1f} {' '.join(cells)} "
+              f"{qpr if qpr is not None else '-':>6}")
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """routes/metrics that got worse by more than threshold (relative)"""
+    regressions = []
+    # больше — хуже для задержек и числа запросов, меньше — хуже для rps
+    checks = {"p50_ms": 1, "p95_ms": 1, "p99_ms": 1,
+              "queries_per_request": 1, "rps": -1}
+    print(f"{'route':<17} {'metric':<20} {'base':>10} {'new':>10} "
+          f"{'change':>8}")
+    for name in [*base["routes"], "total"]:
+        old_row = base["total"] if name == "total" else base["routes"][name]
+        new_row = new["total"] if name == "total" \
+            else new["routes"].get(name)
+        if new_row is None:
+            continue
+        for metric, direction in checks.items():
+            old_value, new_value = old_row.get(metric), new_row.get(metric)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            flag = ""
+            if change * direction > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<17} {metric:<20} {old_value:>10} {new_value:>10} "
+                  f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--url", default=None,
+                            help="адрес запущенного сервера, иначе in-process")
+    run_parser.add_argument("--duration", type=float, default=20)
+    run_parser.add_argument("--warmup", type=float, default=3)
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--page-size", type=int, default=20)
+    run_parser.add_argument("--box-deg", type=float, default=0.02)
+    run_parser.add_argument("--sample", type=int, default=2000)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--no-cache", action="store_true",
+                            help="выключить кэш ответов (только in-process)")
+    run_parser.add_argument("--out", default=None)
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        result = asyncio.run(run(args))
+        print_report(result)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+        return
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"Регрессии: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
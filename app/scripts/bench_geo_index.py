@@ -0,0 +1,124 @@
+"""
+Geo grid index vs SQL: memory footprint and bbox / nearest latency.
+
+Ends with a check of the SQL nearest path against the exact index result:
+k organizations whenever at least k have offices, same distances, also for
+points far from every building (exits with an error otherwise).
+
+    python -m app.scripts.bench_geo_index --queries 300 --box-deg 0.05
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.core.config import settings
+from app.database.database import get_database
+from app.repositories.org_repo import OrganizationRepository
+from app.services.geo_index import GeoGridIndex
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<22} mean {statistics.mean(timings) * 1000:8.3f} ms  "
+          f"p95 {p95 * 1000:8.3f} ms")
+
+
+async def timed(fn, args_list) -> list[float]:
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        result = fn(*args)
+        if asyncio.iscoroutine(result):
+            await result
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main(queries: int, box_deg: float, k: int, page: int) -> None:
+    db = get_database()
+    async with db.session() as session:
+        repository = OrganizationRepository(session)
+        rows = await repository.get_locations()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = GeoGridIndex(cell_deg=settings.geo_index_cell_deg)
+        index.load(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{len(index)} organizations, {len(rows)} points; "
+              f"build {build_ms:.0f} ms, traced peak {peak / 2**20:.1f} MiB, "
+              f"storage ~{index.memory_bytes() / 2**20:.1f} MiB")
+
+        points = [(float(r[1]), float(r[2])) for r in rows if r[1] is not None]
+        centers = [random.choice(points) for _ in range(queries)]
+        boxes = [
+            (lat - box_deg, lat + box_deg, lon - box_deg, lon + box_deg)
+            for lat, lon in centers
+        ]
+
+        report("index bbox lookup", await timed(index.in_bbox, boxes))
+        report("index nearest lookup", await timed(
+            index.nearest, [(lat, lon, k) for lat, lon in centers]
+        ))
+
+        async def index_bbox_page(*box):
+            ids = index.in_bbox(*box)
+            if len(ids) > settings.geo_index_max_ids:
+                await repository.get_in_area(*box, page)
+            elif ids:
+                await repository.get_page_by_ids(ids, page)
+
+        async def index_nearest_page(lat, lon):
+            nearest = index.nearest(lat, lon, k)
+            await repository.get_by_ids([org_id for org_id, _ in nearest])
+
+        report("index bbox + hydrate", await timed(index_bbox_page, boxes))
+        report("sql bbox page", await timed(
+            lambda *box: repository.get_in_area(*box, limit=page), boxes
+        ))
+        report("index nearest+hydrate", await timed(
+            index_nearest_page, centers
+        ))
+        report("sql nearest", await timed(
+            lambda lat, lon: repository.get_nearby(lat, lon, k), centers
+        ))
+
+        located = {r[0] for r in rows if r[1] is not None}
+        expected = min(k, len(located))
+        # вдали от зданий и у полюса первое окно KNN заведомо мало
+        probes = centers + [
+            (lat + sign * 20, lon)
+            for lat, lon in centers[:10] for sign in (-1, 1)
+        ] + [(85.0, lon) for _, lon in centers[:10]]
+        failed = 0
+        for lat, lon in probes:
+            found = await repository.get_nearby(lat, lon, k)
+            exact = index.nearest(lat, lon, k)
+            if len(found) != expected or not all(
+                math.isclose(distance, reference, rel_tol=1e-6, abs_tol=1e-3)
+                for (_, distance), (_, reference) in zip(found, exact)
+            ):
+                failed += 1
+            session.expunge_all()
+        print(f"sql nearest check: {len(probes) - failed}/{len(probes)} "
+              f"probes with {expected} exact nearest")
+    await db.dispose()
+    if failed:
+        raise SystemExit(f"sql nearest: {failed} probes differ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--box-deg", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--page", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.box_deg, args.k, args.page))
@@ -0,0 +1,111 @@
+"""
+ORM path vs JSON built by PostgreSQL (json_agg, JSON_AGG_ROUTES) for the
+detail and list routes.
+
+Both go through OrganizationService with the response cache off and
+include rendering the response body; "stmts" counts statements sent to
+the database per call:
+
+    python -m app.scripts.bench_json_agg --iterations 500
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import event
+
+from app.api.responses import respond
+from app.core.config import settings
+from app.database.database import get_database
+from app.repositories.activity_repo import ActivityRepository
+from app.repositories.json_repo import OrganizationJsonRepository
+from app.repositories.org_repo import OrganizationRepository
+from app.scripts.bench_endpoints import Sample, load_sample
+from app.services.org_service import OrganizationService
+
+PAGE = 20
+
+
+def calls(
+    sample: Sample,
+) -> dict[str, Callable[[OrganizationService, random.Random], Awaitable]]:
+    return {
+        "get_by_id": lambda service, rng: service.get_by_id(
+            UUID(rng.choice(sample.organization_ids))),
+        "get_by_building": lambda service, rng: service.get_by_building(
+            UUID(rng.choice(sample.building_ids)), PAGE, with_total=True),
+        "get_by_activity": lambda service, rng: service.get_by_activity(
+            UUID(rng.choice(sample.activity_ids)), PAGE, with_total=True),
+    }
+
+
+async def measure(
+    service: OrganizationService,
+    call: Callable[[OrganizationService, random.Random], Awaitable],
+    iterations: int,
+    statements: list[int],
+) -> tuple[float, float, float]:
+    """µs per call, statements per call, response KB"""
+    rng = random.Random(1)
+    size = 0
+    before = statements[0]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = await call(service, rng)
+        if result is not None:
+            size += len(respond(result.value, headers={}).body)
+        service.repository.session.expunge_all()
+    elapsed = time.perf_counter() - start
+    return (
+        elapsed / iterations * 1e6,
+        (statements[0] - before) / iterations,
+        size / iterations / 1024,
+    )
+
+
+async def main(iterations: int) -> None:
+    settings.cache_enabled = False
+    settings.org_documents = False
+    sample = await load_sample(2000)
+    db = get_database()
+    if db.engine.dialect.name != "postgresql":
+        raise SystemExit("json_agg работает только на PostgreSQL")
+
+    statements = [0]
+
+    @event.listens_for(db.engine.sync_engine, "before_cursor_execute")
+    def count(*args):
+        statements[0] += 1
+
+    async with db.read_session() as session:
+        service = OrganizationService(
+            OrganizationRepository(session), ActivityRepository(session),
+            json_repository=OrganizationJsonRepository(session),
+        )
+        print(f"{'route':<16} {'orm µs':>9} {'stmts':>6} {'json µs':>9} "
+              f"{'stmts':>6} {'KB':>6}")
+        for name, call in calls(sample).items():
+            results = {}
+            for routes in (set(), {name}):
+                settings.json_agg_routes = routes
+                # прогрев: дерево видов деятельности, кэш запросов
+                await measure(service, call, 5, statements)
+                results[bool(routes)] = await measure(
+                    service, call, iterations, statements
+                )
+            (orm_us, orm_stmts, _), (json_us, json_stmts, kb) = (
+                results[False], results[True]
+            )
+            print(f"{name:<16} {orm_us:>9.1f} {orm_stmts:>6.1f} "
+                  f"{json_us:>9.1f} {json_stmts:>6.1f} {kb:>6.1f}")
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,134 @@
+"""
+Per-request middleware overhead: BaseHTTPMiddleware vs pure ASGI.
+
+Requests are driven straight into the ASGI app (no sockets), logging is
+muted, so the numbers are the middleware stack cost only:
+
+    python -m app.scripts.bench_middleware --requests 20000 --concurrency 100
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api.middleware import ExceptionHandlerMiddleware, LoggingMiddleware, \
+    MetricsMiddleware
+from app.core.logger import logger
+
+
+class BaseLoggingMiddleware(BaseHTTPMiddleware):
+    """previous implementation, kept here for comparison"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = None
+        try:
+            response = await call_next(request)
+            process_time = (time.time() - start_time) * 1000
+            logger.info(
+                f"{request.method} {request.url.path} "
+                f"-> {response.status_code} ({process_time:.2f} ms)"
+            )
+            return response
+        finally:
+            if not response:
+                logger.warning(f"{request.method} {request.url.path}")
+
+
+class BaseExceptionHandlerMiddleware(BaseHTTPMiddleware):
+    """previous implementation, kept here for comparison"""
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except HTTPException as e:
+            return JSONResponse(
+                status_code=e.status_code,
+                content={"error": e.detail, "path": request.url.path},
+            )
+        except Exception:
+            return JSONResponse(
+                status_code=500,
+                content={"error": "Internal Server Error",
+                         "path": request.url.path},
+            )
+
+
+def make_app(
+    exception_middleware, logging_middleware, metrics_middleware=None
+) -> FastAPI:
+    app = FastAPI()
+    if exception_middleware:
+        app.add_middleware(exception_middleware)
+    if logging_middleware:
+        app.add_middleware(logging_middleware)
+    if metrics_middleware:
+        app.add_middleware(metrics_middleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+async def call(app: FastAPI) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call(app)
+
+    await asyncio.gather(*(one() for _ in range(200)))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int, concurrency: int) -> None:
+    logger.setLevel(logging.CRITICAL)
+    variants = {
+        "no middleware": make_app(None, None),
+        "BaseHTTPMiddleware": make_app(
+            BaseExceptionHandlerMiddleware, BaseLoggingMiddleware
+        ),
+        "pure ASGI": make_app(ExceptionHandlerMiddleware, LoggingMiddleware),
+        "pure ASGI + metrics": make_app(
+            ExceptionHandlerMiddleware, LoggingMiddleware, MetricsMiddleware
+        ),
+    }
+    baseline = None
+    for name, app in variants.items():
+        per_request = await run(app, requests, concurrency)
+        baseline = baseline if baseline is not None else per_request
+        print(f"{name:<20} {per_request * 1e6:8.1f} us/request  "
+              f"overhead {(per_request - baseline) * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
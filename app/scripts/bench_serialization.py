@@ -0,0 +1,129 @@
+"""
+List serialization: from_orm + response_model vs direct dict + orjson.
+
+Builds in-memory ORM objects (no database), renders the same page through
+both paths via the ASGI app, checks the bodies are byte-identical and
+reports CPU time per response:
+
+    python -m app.scripts.bench_serialization --items 1000 --rounds 50
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from fastapi import FastAPI
+
+from app.api.responses import respond
+from app.database import Activity, Building, Office, Organization, \
+    OrganizationPhone
+from app.schemas import serializers
+from app.schemas.org_response import OrganizationListResponse
+from app.schemas.organization import OrganizationReadShort
+
+
+def make_organizations(count: int) -> list[Organization]:
+    rnd = random.Random(1)
+    activities = [
+        Activity(id=uuid.uuid4(), name=f"Вид {i}", parent_id=None)
+        for i in range(20)
+    ]
+    buildings = [
+        Building(
+            id=uuid.uuid4(),
+            address=f"г. Москва, ул. Ленина {i}",
+            lat=Decimal(f"{rnd.uniform(55.5, 56):.6f}"),
+            lon=Decimal(f"{rnd.uniform(37.3, 37.9):.6f}"),
+        )
+        for i in range(count // 5 + 1)
+    ]
+    organizations = []
+    for i in range(count):
+        org = Organization(id=uuid.uuid4(), name=f"ООО «Организация {i}»")
+        org.phones = [
+            OrganizationPhone(phone_number=f"8-800-{i:03d}-{n:02d}")
+            for n in range(rnd.randint(1, 3))
+        ]
+        org.offices = [
+            Office(
+                id=uuid.uuid4(),
+                floor=rnd.choice([None, rnd.randint(1, 20)]),
+                unit=str(rnd.randint(1, 300)),
+                building=rnd.choice(buildings),
+            )
+            for _ in range(rnd.randint(1, 2))
+        ]
+        org.activities = rnd.sample(activities, 2)
+        organizations.append(org)
+    return organizations
+
+
+def make_app(organizations: list[Organization]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/classic", response_model=OrganizationListResponse)
+    async def classic():
+        return OrganizationListResponse(
+            total=len(organizations),
+            items=[OrganizationReadShort.from_orm(o) for o in organizations],
+            next_cursor=None,
+        )
+
+    @app.get("/fast", response_model=OrganizationListResponse)
+    async def fast():
+        return respond({
+            "total": len(organizations),
+            "items": [serializers.organization_short(o) for o in organizations],
+            "next_cursor": None,
+        })
+
+    return app
+
+
+async def fetch(app: FastAPI, path: str) -> bytes:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path,
+        "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def main(items: int, rounds: int) -> None:
+    organizations = make_organizations(items)
+    app = make_app(organizations)
+
+    classic = await fetch(app, "/classic")
+    fast = await fetch(app, "/fast")
+    print(f"{items} items, {len(classic)} bytes, "
+          f"byte-identical: {classic == fast}")
+    OrganizationListResponse.model_validate_json(fast)
+
+    for path in ("/classic", "/fast"):
+        start = time.process_time()
+        for _ in range(rounds):
+            await fetch(app, path)
+        cpu = (time.process_time() - start) / rounds
+        print(f"{path:<10} {cpu * 1000:8.2f} ms CPU per response")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.rounds))
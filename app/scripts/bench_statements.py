@@ -0,0 +1,207 @@
+"""
+Statement construction cost: select() rebuilt per call vs statements
+prebuilt once per shape with bind parameters (OrganizationRepository).
+
+Both variants run against the configured database with the same values;
+"build" is the Python-side cost of constructing the statement and its
+SQLAlchemy cache key, which prebuilt statements pay once:
+
+    python -m app.scripts.bench_statements --iterations 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import Select, select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Building, Organization, Office, \
+    OrganizationActivity, OrganizationOffice
+from app.database.database import get_database
+from app.repositories.geo import distance_sq_m, in_bbox, radius_bbox
+from app.repositories.org_repo import OrganizationRepository
+from app.repositories.search import get_name_search
+from app.scripts.bench_endpoints import Sample, load_sample
+
+PAGE = 20
+
+
+def fresh_builders(
+    dialect_name: str,
+) -> dict[str, Callable[[Sample, random.Random], tuple[Select, dict]]]:
+    """previous per-call construction, kept here for comparison"""
+    repo = OrganizationRepository
+
+    def page(stmt: Select) -> Select:
+        return repo._list_options(
+            stmt.order_by(Organization.name, Organization.id).limit(PAGE + 1)
+        )
+
+    def by_building(sample, rng):
+        return page(select(Organization).where(Organization.id.in_(
+            select(OrganizationOffice.organization_id)
+            .join(Office, Office.id == OrganizationOffice.office_id)
+            .where(Office.building_id == UUID(
+                rng.choice(sample.building_ids)))
+        ))), {}
+
+    def by_activity(sample, rng):
+        ids = [UUID(i) for i in rng.sample(sample.activity_ids, 5)]
+        return page(select(Organization).where(Organization.id.in_(
+            select(OrganizationActivity.organization_id)
+            .where(OrganizationActivity.activity_id.in_(ids))
+        ))), {}
+
+    def search(sample, rng):
+        name_search = get_name_search(dialect_name)
+        rank = name_search.rank()
+        stmt = (
+            select(Organization).where(name_search.condition())
+            .add_columns(rank)
+            .order_by(rank.desc(), Organization.name, Organization.id)
+            .limit(PAGE + 1)
+        )
+        return repo._list_options(stmt), name_search.params(
+            rng.choice(sample.words)[:4]
+        )
+
+    def geo(sample, rng):
+        lat, lon = rng.choice(sample.points)
+        bbox = radius_bbox(lat, lon, 2000)
+        return page(select(Organization).where(Organization.id.in_(
+            repo._in_buildings(in_bbox(dialect_name, *bbox))
+        ))), {}
+
+    def nearby(sample, rng):
+        lat, lon = rng.choice(sample.points)
+        dist_sq = distance_sq_m(lat, lon)
+        buildings = select(
+            Building.id.label("building_id"), dist_sq.label("dist_sq")
+        ).where(
+            in_bbox(dialect_name, *radius_bbox(lat, lon, 2000)),
+            dist_sq <= 2000 * 2000,
+        ).subquery()
+        min_dist = func.min(buildings.c.dist_sq)
+        nearest = (
+            select(OrganizationOffice.organization_id,
+                   min_dist.label("dist_sq"))
+            .join(Office, Office.id == OrganizationOffice.office_id)
+            .join(buildings, buildings.c.building_id == Office.building_id)
+            .group_by(OrganizationOffice.organization_id)
+            .order_by(min_dist, OrganizationOffice.organization_id)
+            .limit(10)
+            .subquery()
+        )
+        return repo._list_options(
+            select(Organization, nearest.c.dist_sq)
+            .join(nearest, nearest.c.organization_id == Organization.id)
+            .order_by(nearest.c.dist_sq, Organization.id)
+        ), {}
+
+    def batch(sample, rng):
+        ids = [UUID(i) for i in rng.sample(sample.organization_ids, 20)]
+        return repo._with_relations(
+            select(Organization).where(Organization.id.in_(ids))
+        ), {}
+
+    def after_page(sample, rng):
+        stmt = select(Organization).where(
+            tuple_(Organization.name, Organization.id)
+            > tuple_(rng.choice(sample.words), UUID(int=0))
+        )
+        return page(stmt), {}
+
+    return {"by_building": by_building, "by_activity": by_activity,
+            "search": search, "geo": geo, "nearby": nearby,
+            "batch": batch, "cursor_page": after_page}
+
+
+def prepared_calls(
+) -> dict[str, Callable[[OrganizationRepository, Sample, random.Random],
+                        Awaitable]]:
+    def point(sample, rng):
+        return rng.choice(sample.points)
+
+    return {
+        "by_building": lambda repo, sample, rng: repo.get_by_building(
+            UUID(rng.choice(sample.building_ids)), PAGE),
+        "by_activity": lambda repo, sample, rng: repo.get_by_activity(
+            [UUID(i) for i in rng.sample(sample.activity_ids, 5)], PAGE),
+        "search": lambda repo, sample, rng: repo.search_by_name(
+            rng.choice(sample.words)[:4], PAGE),
+        "geo": lambda repo, sample, rng: repo.get_in_area(
+            *radius_bbox(*point(sample, rng), 2000), PAGE),
+        "nearby": lambda repo, sample, rng: repo.get_nearby(
+            *point(sample, rng), 10, 2000),
+        "batch": lambda repo, sample, rng: repo.get_details_by_ids(
+            [UUID(i) for i in rng.sample(sample.organization_ids, 20)]),
+        "cursor_page": lambda repo, sample, rng: repo.get_all(
+            PAGE, after=(rng.choice(sample.words), UUID(int=0))),
+    }
+
+
+def build_cost(build, sample: Sample, iterations: int) -> float:
+    """µs per call for statement construction + cache key"""
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        stmt, _params = build(sample, rng)
+        stmt._generate_cache_key()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def execute_cost(
+    session: AsyncSession, call: Callable[[], Awaitable], iterations: int
+) -> float:
+    """µs per call, including the database round trip"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+        session.expunge_all()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(iterations: int, only: str | None) -> None:
+    sample = await load_sample(2000)
+    if len(sample.activity_ids) < 5 or len(sample.organization_ids) < 20:
+        raise SystemExit("Мало данных: сначала python -m app.scripts.seed")
+    db = get_database()
+    async with db.read_session() as session:
+        repo = OrganizationRepository(session)
+        fresh = fresh_builders(repo.dialect_name)
+        prepared = prepared_calls()
+        print(f"{'shape':<12} {'build':>9} {'fresh':>10} {'prepared':>10} "
+              f"{'saved':>9}   (µs per call)")
+        for name, build in fresh.items():
+            if only and name != only:
+                continue
+            rng = random.Random(1)
+
+            async def run_fresh():
+                stmt, params = build(sample, rng)
+                return (await session.execute(stmt, params)).all()
+
+            async def run_prepared():
+                return await prepared[name](repo, sample, rng)
+
+            # прогрев: первый вызов собирает и компилирует запрос
+            await run_fresh()
+            await run_prepared()
+            built = build_cost(build, sample, iterations)
+            t_fresh = await execute_cost(session, run_fresh, iterations)
+            t_prepared = await execute_cost(session, run_prepared, iterations)
+            print(f"{name:<12} {built:>9.1f} {t_fresh:>10.1f} "
+                  f"{t_prepared:>10.1f} {t_fresh - t_prepared:>9.1f}")
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--only", default=None,
+                        help="только одна форма запроса")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.only))
@@ -0,0 +1,246 @@
+"""
+Deterministic synthetic dataset for load tests and benchmarks.
+
+Everything is derived from (seed, table, chunk index), so any chunk can be
+generated in any process in any order and the result is byte-for-byte the
+same. Rows are plain tuples in `COLUMNS` order, ready for COPY.
+
+Shape:
+- buildings are laid out city by city (index ranges proportional to city
+  weight), scattered around a few gaussian "districts" per city;
+- activity tree is `roots x fanout x fanout` (levels 0..2, the schema max);
+- organizations have 1..3 phones, 1..3 activities with a skewed popularity,
+  usually one office; a small share are chains with many offices, mostly
+  in their home city. Popular buildings (business centres) get more offices.
+"""
+import bisect
+import random
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+
+Row = tuple[Any, ...]
+Point = tuple[float, float]
+
+COLUMNS: dict[str, tuple[str, ...]] = {
+    "activity": ("id", "name", "parent_id", "level"),
+    "building": ("id", "address", "lat", "lon"),
+    "organization": ("id", "name"),
+    "office": ("id", "building_id", "floor", "unit"),
+    "organization_phone": ("id", "organization_id", "phone_number"),
+    "organization_office": ("organization_id", "office_id"),
+    "organization_activity": ("organization_id", "activity_id"),
+}
+
+# name, lat, lon, weight, spread (degrees)
+CITIES = (
+    ("Москва", 55.7558, 37.6173, 40, 0.18),
+    ("Санкт-Петербург", 59.9343, 30.3351, 18, 0.12),
+    ("Новосибирск", 55.0084, 82.9357, 6, 0.08),
+    ("Екатеринбург", 56.8389, 60.6057, 6, 0.08),
+    ("Казань", 55.7963, 49.1088, 5, 0.07),
+    ("Нижний Новгород", 56.2965, 43.9361, 5, 0.07),
+    ("Краснодар", 45.0355, 38.9753, 5, 0.06),
+    ("Самара", 53.1959, 50.1002, 4, 0.06),
+    ("Ростов-на-Дону", 47.2357, 39.7015, 4, 0.06),
+    ("Воронеж", 51.6720, 39.1843, 3, 0.05),
+    ("Пермь", 58.0105, 56.2502, 2, 0.05),
+    ("Владивосток", 43.1198, 131.8869, 2, 0.04),
+)
+DISTRICTS_PER_CITY = 8
+
+STREETS = (
+    "Ленина", "Мира", "Советская", "Гагарина", "Пушкина", "Садовая",
+    "Московская", "Лесная", "Центральная", "Набережная", "Школьная",
+    "Кирова", "Молодёжная", "Заводская", "Первомайская", "Победы",
+)
+FORMS = ("ООО", "АО", "ИП", "ПАО", "ЗАО")
+ADJECTIVES = (
+    "Северный", "Южный", "Первый", "Городской", "Новый", "Главный",
+    "Народный", "Столичный", "Быстрый", "Добрый", "Мясной", "Молочный",
+)
+NOUNS = (
+    "двор", "дом", "рынок", "склад", "сервис", "мир", "центр", "стиль",
+    "маркет", "край", "берег", "путь", "Рога и копыта", "торг",
+)
+ACTIVITY_ROOTS = (
+    "Еда", "Автомобили", "Строительство", "Одежда", "Медицина",
+    "Образование", "Финансы", "Туризм", "Спорт", "Электроника",
+    "Мебель", "Логистика",
+)
+
+CHAIN_SHARE = 0.02
+CHAIN_OFFICES = (5, 50)
+CHAIN_HOME_SHARE = 0.8
+
+
+@dataclass(frozen=True, slots=True)
+class DatasetConfig:
+    organizations: int
+    buildings: int
+    activity_roots: int = 12
+    activity_fanout: int = 6
+    chunk_size: int = 10_000
+    seed: int = 1
+
+    def chunks(self, total: int) -> range:
+        return range((total + self.chunk_size - 1) // self.chunk_size)
+
+    def bounds(self, chunk: int, total: int) -> range:
+        start = chunk * self.chunk_size
+        return range(start, min(start + self.chunk_size, total))
+
+
+def stable_id(seed: int, kind: str, index: int) -> uuid.UUID:
+    """ids other tables refer to, computable from the index alone"""
+    return uuid.uuid5(uuid.NAMESPACE_OID, f"{seed}:{kind}:{index}")
+
+
+def random_id(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _rng(cfg: DatasetConfig, kind: str, chunk: int) -> random.Random:
+    return random.Random(f"{cfg.seed}:{kind}:{chunk}")
+
+
+@lru_cache(maxsize=8)
+def city_ranges(cfg: DatasetConfig) -> tuple[int, ...]:
+    """cumulative building index bounds per city"""
+    total_weight = sum(city[3] for city in CITIES)
+    bounds, acc = [], 0
+    for city in CITIES:
+        acc += city[3]
+        bounds.append(cfg.buildings * acc // total_weight)
+    return tuple(bounds)
+
+
+@lru_cache(maxsize=8)
+def districts(cfg: DatasetConfig) -> tuple[tuple[Point, ...], ...]:
+    rng = _rng(cfg, "district", 0)
+    return tuple(
+        tuple(
+            (rng.gauss(lat, spread), rng.gauss(lon, spread * 1.7))
+            for _ in range(DISTRICTS_PER_CITY)
+        )
+        for _, lat, lon, _, spread in CITIES
+    )
+
+
+def city_of(cfg: DatasetConfig, building_index: int) -> int:
+    return bisect.bisect_right(city_ranges(cfg), building_index)
+
+
+def building_chunk(cfg: DatasetConfig, chunk: int) -> dict[str, list[Row]]:
+    rng = _rng(cfg, "building", chunk)
+    rows = []
+    for i in cfg.bounds(chunk, cfg.buildings):
+        city = city_of(cfg, i)
+        name, _, _, _, spread = CITIES[city]
+        lat, lon = rng.choice(districts(cfg)[city])
+        rows.append((
+            stable_id(cfg.seed, "building", i),
+            f"г. {name}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 200)}",
+            Decimal(f"{rng.gauss(lat, spread / 6):.6f}"),
+            Decimal(f"{rng.gauss(lon, spread / 4):.6f}"),
+        ))
+    return {"building": rows}
+
+
+@lru_cache(maxsize=8)
+def activity_rows(cfg: DatasetConfig) -> tuple[Row, ...]:
+    rows = []
+    parents: list[tuple[uuid.UUID | None, str]] = [(None, "")]
+    for level in range(3):
+        width = cfg.activity_roots if level == 0 else cfg.activity_fanout
+        next_parents = []
+        for parent_id, parent_name in parents:
+            for i in range(width):
+                if level == 0:
+                    name = ACTIVITY_ROOTS[i % len(ACTIVITY_ROOTS)]
+                    if i >= len(ACTIVITY_ROOTS):
+                        name = f"{name} {i // len(ACTIVITY_ROOTS) + 1}"
+                else:
+                    name = f"{parent_name} / {i + 1}"
+                activity_id = stable_id(cfg.seed, "activity", len(rows))
+                rows.append((activity_id, name, parent_id, level))
+                next_parents.append((activity_id, name))
+        parents = next_parents
+    return tuple(rows)
+
+
+@lru_cache(maxsize=8)
+def activity_popularity(cfg: DatasetConfig) -> tuple[uuid.UUID, ...]:
+    """activity ids in random order; low positions are picked more often"""
+    ids = [row[0] for row in activity_rows(cfg)]
+    _rng(cfg, "activity", 0).shuffle(ids)
+    return tuple(ids)
+
+
+def _skewed(rng: random.Random, start: int, stop: int, power: float) -> int:
+    return start + int((stop - start) * rng.random() ** power)
+
+
+def _pick_city(rng: random.Random) -> int:
+    return rng.choices(range(len(CITIES)), [c[3] for c in CITIES])[0]
+
+
+def _pick_building(cfg: DatasetConfig, rng: random.Random, city: int) -> int:
+    bounds = city_ranges(cfg)
+    start = bounds[city - 1] if city else 0
+    if bounds[city] == start:
+        return rng.randrange(cfg.buildings)
+    return _skewed(rng, start, bounds[city], 2)
+
+
+def organization_chunk(
+    cfg: DatasetConfig, chunk: int
+) -> dict[str, list[Row]]:
+    rng = _rng(cfg, "organization", chunk)
+    popularity = activity_popularity(cfg)
+    tables: dict[str, list[Row]] = {
+        name: [] for name in COLUMNS if name not in ("activity", "building")
+    }
+    for i in cfg.bounds(chunk, cfg.organizations):
+        org_id = random_id(rng)
+        name = (f"{rng.choice(FORMS)} «{rng.choice(ADJECTIVES)} "
+                f"{rng.choice(NOUNS)}»")
+        tables["organization"].append((org_id, name))
+
+        phones = {
+            f"8-9{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}-"
+            f"{rng.randint(0, 99):02d}-{rng.randint(0, 99):02d}"
+            for _ in range(rng.randint(1, 3))
+        }
+        tables["organization_phone"].extend(
+            (random_id(rng), org_id, phone) for phone in sorted(phones)
+        )
+
+        home = _pick_city(rng)
+        if rng.random() < CHAIN_SHARE:
+            count = rng.randint(*CHAIN_OFFICES)
+        else:
+            count = 1 if rng.random() < 0.85 else rng.randint(2, 3)
+        for n in range(count):
+            city = home if rng.random() < CHAIN_HOME_SHARE else _pick_city(rng)
+            office_id = random_id(rng)
+            building = _pick_building(cfg, rng, city)
+            tables["office"].append((
+                office_id,
+                stable_id(cfg.seed, "building", building),
+                rng.randint(1, 25),
+                # офисы уникальны в здании: номер организации + номер офиса
+                f"{i}-{n + 1}",
+            ))
+            tables["organization_office"].append((org_id, office_id))
+
+        activities = {
+            popularity[_skewed(rng, 0, len(popularity), 3)]
+            for _ in range(rng.randint(1, 3))
+        }
+        tables["organization_activity"].extend(
+            (org_id, activity_id) for activity_id in sorted(activities)
+        )
+    return tables
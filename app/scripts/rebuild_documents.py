@@ -0,0 +1,31 @@
+"""
+Full rebuild of organization_document, in one transaction (readers keep
+seeing the previous documents until it commits). Needed after loads that
+bypass the ORM hooks; app.scripts.seed runs it itself:
+
+    python -m app.scripts.rebuild_documents --batch-size 1000
+"""
+import argparse
+import asyncio
+import time
+
+from app.database.database import get_database
+from app.database.documents import rebuild_documents
+
+
+async def main(batch_size: int) -> None:
+    db = get_database()
+    started = time.perf_counter()
+    async with db.engine.begin() as conn:
+        total = await conn.run_sync(rebuild_documents, batch_size)
+    await db.dispose()
+    print(f"Пересобрано {total} документов за "
+          f"{time.perf_counter() - started:.1f} с.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="организаций в одной пачке")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -1,128 +1,192 @@
+"""
+Bulk load of the synthetic dataset from app.scripts.datagen.
+
+Chunks are generated in a process pool while the previous ones are being
+written: asyncpg COPY on PostgreSQL, batched INSERT otherwise (or with
+--method insert). The activity closure table and organization documents
+are rebuilt once at the end.
+
+    python -m app.scripts.seed
+    python -m app.scripts.seed --organizations 1000000 --workers 8 --truncate
+"""
+import argparse
 import asyncio
-import random
-
-from faker import Faker
-
-from app.database import (
-    Building,
-    Activity,
-    Office,
-    Organization,
-    OrganizationPhone,
-    OrganizationActivity,
-    OrganizationOffice,
-)
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.database.base import Base
 from app.database.database import get_database
+from app.core.config import settings
+from app.database.documents import rebuild_documents
+from app.database.events import rebuild_activity_closure
+from app.scripts.datagen import COLUMNS, DatasetConfig, Row, \
+    activity_rows, building_chunk, organization_chunk
+
+# порядок очистки: сначала зависимые таблицы
+TRUNCATE_ORDER = (
+    "organization_document", "activity_closure", "organization_activity",
+    "organization_office", "organization_phone", "office", "organization",
+    "building", "activity",
+)
+
+Writer = Callable[[AsyncConnection, str, list[Row]], Awaitable[None]]
+
+
+async def copy_rows(conn: AsyncConnection, table: str, rows: list[Row]):
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        table, records=rows, columns=COLUMNS[table]
+    )
+
+
+def insert_rows(batch_size: int):
+    async def write(conn: AsyncConnection, table: str, rows: list[Row]):
+        columns = COLUMNS[table]
+        stmt = insert(Base.metadata.tables[table])
+        for start in range(0, len(rows), batch_size):
+            await conn.execute(stmt, [
+                dict(zip(columns, row))
+                for row in rows[start:start + batch_size]
+            ])
+
+    return write
+
+
+async def write_tables(
+    engine: AsyncEngine, tables: dict[str, list[Row]], writer: Writer
+) -> int:
+    """one transaction per chunk, tables in foreign key order"""
+    async with engine.begin() as conn:
+        for table in COLUMNS:
+            if tables.get(table):
+                await writer(conn, table, tables[table])
+    return sum(len(rows) for rows in tables.values())
+
 
-fake = Faker("ru_RU")
-Faker.seed(1)
-random.seed(1)
-
-
-async def seed_buildings(session, count: int = 50) -> list[Building]:
-    buildings = [
-        Building(
-            address=fake.address().replace("\n", ", "),
-            lat=fake.latitude(),
-            lon=fake.longitude(),
-        )
-        for _ in range(count)
-    ]
-    session.add_all(buildings)
-    await session.flush()
-    print(f"Добавлено {count} зданий.")
-    return buildings
-
-
-async def seed_activities(session) -> list[Activity]:
-    root_food = Activity(name="Еда", level=0)
-    meat = Activity(name="Мясная продукция", parent=root_food, level=1)
-    dairy = Activity(name="Молочная продукция", parent=root_food, level=1)
-    cars = Activity(name="Автомобили", level=0)
-    trucks = Activity(name="Грузовые", parent=cars, level=1)
-    cars_light = Activity(name="Легковые", parent=cars, level=1)
-    parts = Activity(name="Запчасти", parent=cars_light, level=2)
-    accessories = Activity(name="Аксессуары", parent=cars_light, level=2)
-
-    all_acts = [root_food, meat, dairy, cars, trucks, cars_light, parts, accessories]
-    session.add_all(all_acts)
-    await session.flush()
-    print(f"Добавлено {len(all_acts)} видов деятельности.")
-    return all_acts
-
-
-async def seed_organizations(session, buildings, activities, count: int = 100):
-    used_pairs: dict[str, set[tuple[int, str]]] = {}
-
-    organizations: list[Organization] = []
-
-    for _ in range(count):
-        org = Organization(name=fake.company())
-        organizations.append(org)
-    session.add_all(organizations)
-    await session.flush()
-
-    phones: list[OrganizationPhone] = []
-    for org in organizations:
-        for _ in range(random.randint(1, 3)):
-            phones.append(
-                OrganizationPhone(
-                    organization_id=org.id,
-                    phone_number=fake.phone_number(),
-                )
-            )
-    session.add_all(phones)
-
-    offices: list[Office] = []
-    org_offices: list[OrganizationOffice] = []
-    for org in organizations:
-        b = random.choice(buildings)
-        if b.id not in used_pairs:
-            used_pairs[b.id] = set()
-
-        for _ in range(100):
-            floor = random.randint(1, 10)
-            unit = str(random.randint(1, 20))
-            if (floor, unit) not in used_pairs[b.id]:
-                used_pairs[b.id].add((floor, unit))
-                break
+async def truncate(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text(f"TRUNCATE {', '.join(TRUNCATE_ORDER)}"))
         else:
-            raise RuntimeError(
-                f"Не удалось подобрать уникальный офис для здания {b.id}")
-
-        office = Office(building_id=b.id, floor=floor, unit=unit)
-        offices.append(office)
-        session.add(office)
-        await session.flush()
-        org_offices.append(
-            OrganizationOffice(organization_id=org.id, office_id=office.id))
-
-    session.add_all(offices)
-    session.add_all(org_offices)
-
-    org_activities: list[OrganizationActivity] = []
-    for org in organizations:
-        acts = random.sample(activities,
-                             random.randint(1, min(3, len(activities))))
-        for act in acts:
-            org_activities.append(
-                OrganizationActivity(organization_id=org.id,
-                                     activity_id=act.id)
-            )
-    session.add_all(org_activities)
-
-    print(f"{len(organizations)} организаций, {len(phones)} телефонов, "
-          f"{len(offices)} офисов, {len(org_activities)} связей по видам деятельности.")
-
-
-async def main():
+            for table in TRUNCATE_ORDER:
+                await conn.execute(text(f"DELETE FROM {table}"))
+
+
+async def generated(
+    executor: Executor | None,
+    fn: Callable[[DatasetConfig, int], dict[str, list[Row]]],
+    cfg: DatasetConfig,
+    chunks: range,
+    window: int,
+) -> AsyncIterator[dict[str, list[Row]]]:
+    """chunks in order, at most `window` generated ahead of the writer"""
+    loop = asyncio.get_running_loop()
+    pending: deque[asyncio.Future] = deque()
+    for chunk in chunks:
+        pending.append(loop.run_in_executor(executor, fn, cfg, chunk))
+        if len(pending) >= window:
+            yield await pending.popleft()
+    while pending:
+        yield await pending.popleft()
+
+
+async def load(
+    engine: AsyncEngine,
+    executor: Executor | None,
+    fn: Callable[[DatasetConfig, int], dict[str, list[Row]]],
+    cfg: DatasetConfig,
+    total: int,
+    writer: Writer,
+    window: int,
+    label: str,
+) -> None:
+    start = time.perf_counter()
+    rows = done = 0
+    async for tables in generated(
+        executor, fn, cfg, cfg.chunks(total), window
+    ):
+        rows += await write_tables(engine, tables, writer)
+        done = min(done + cfg.chunk_size, total)
+        elapsed = time.perf_counter() - start
+        print(f"\r{label}: {done}/{total}, {rows} строк, "
+              f"{rows / elapsed:,.0f} строк/с", end="", flush=True)
+    print()
+
+
+async def main(
+    cfg: DatasetConfig,
+    workers: int,
+    method: str,
+    batch_size: int,
+    clear: bool,
+) -> None:
     db = get_database()
-    async with db.session() as session:
-        buildings = await seed_buildings(session)
-        activities = await seed_activities(session)
-        await seed_organizations(session, buildings, activities)
+    engine = db.engine
+    if method == "auto":
+        method = "copy" if engine.dialect.driver == "asyncpg" else "insert"
+    writer = copy_rows if method == "copy" else insert_rows(batch_size)
+    print(f"{cfg.organizations} организаций, {cfg.buildings} зданий, "
+          f"seed={cfg.seed}, {workers} процессов, метод {method}")
+
+    started = time.perf_counter()
+    if clear:
+        await truncate(engine)
+
+    await write_tables(engine, {"activity": list(activity_rows(cfg))}, writer)
+    print(f"Добавлено {len(activity_rows(cfg))} видов деятельности.")
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        window = max(2, workers * 2)
+        await load(engine, executor, building_chunk, cfg, cfg.buildings,
+                   writer, window, "Здания")
+        await load(engine, executor, organization_chunk, cfg,
+                   cfg.organizations, writer, window, "Организации")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # COPY идёт мимо ORM-хуков, поэтому closure и документы строятся целиком
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_activity_closure)
+        if settings.org_documents:
+            await conn.run_sync(rebuild_documents)
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text("ANALYZE"))
     await db.dispose()
+    print(f"Готово за {time.perf_counter() - started:.1f} с.")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--organizations", type=int, default=1000)
+    parser.add_argument("--buildings", type=int, default=None,
+                        help="по умолчанию organizations / 5, не меньше 50")
+    parser.add_argument("--activity-roots", type=int, default=12)
+    parser.add_argument("--activity-fanout", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", choices=("auto", "copy", "insert"),
+                        default="auto")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="строк в одном INSERT для --method insert")
+    parser.add_argument("--truncate", action="store_true",
+                        help="очистить таблицы справочника перед загрузкой")
+    args = parser.parse_args()
+    config = DatasetConfig(
+        organizations=args.organizations,
+        buildings=args.buildings or max(50, args.organizations // 5),
+        activity_roots=args.activity_roots,
+        activity_fanout=args.activity_fanout,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+    )
+    asyncio.run(main(config, args.workers, args.method, args.batch_size,
+                     args.truncate))
@@ -0,0 +1,47 @@
+from typing import Any
+from uuid import UUID
+
+from app.core.config import settings
+from app.repositories.activity_repo import ActivityRepository
+from app.schemas.activity import ActivityTree, ActivityTreeResponse
+from app.services.activity_tree import ActivityTreeCache, fresh_activity_tree
+from app.services.etag import Versioned, digest
+
+Payload = dict[str, Any]
+
+
+class ActivityService:
+
+    def __init__(self, repository: ActivityRepository):
+        self.repository = repository
+
+    @staticmethod
+    def _version(tree: ActivityTreeCache, with_counts: bool) -> str:
+        if with_counts:
+            return digest(tree.content_version, tree.counts_version)
+        return tree.content_version
+
+    async def get_tree(
+            self, with_counts: bool = False
+    ) -> Versioned[ActivityTreeResponse | Payload]:
+        tree = await fresh_activity_tree(self.repository, with_counts)
+        payload = {"items": tree.tree(with_counts)}
+        if not settings.fast_serialization:
+            payload = ActivityTreeResponse.model_validate(payload)
+        return Versioned(payload, self._version(tree, with_counts))
+
+    async def get_subtree(
+            self, activity_id: UUID, max_depth: int = 3,
+            with_counts: bool = False,
+    ) -> Versioned[ActivityTree | Payload] | None:
+        if max_depth > 3:
+            raise ValueError("Максимальная глубина вложенности видов деятельности — 3")
+        if max_depth < 1:
+            raise ValueError("Минимальная глубина вложенности — 1")
+        tree = await fresh_activity_tree(self.repository, with_counts)
+        payload = tree.subtree(activity_id, max_depth, with_counts)
+        if payload is None:
+            return None
+        if not settings.fast_serialization:
+            payload = ActivityTree.model_validate(payload)
+        return Versioned(payload, self._version(tree, with_counts))
@@ -0,0 +1,211 @@
+import time
+from collections.abc import Iterable
+from typing import Any
+from uuid import UUID
+
+from app.core.config import settings
+from app.database.events import Changes, subscribe
+from app.repositories.activity_repo import ActivityRepository
+from app.services.etag import digest
+
+
+class ActivityTreeCache:
+    """
+    in-process copy of the activity tree (id -> name, parent, children).
+
+    Reloaded when older than ttl, when a commit in this process touched
+    the activity table, or when the table version (max(updated_at), count)
+    differs; the version is checked at most every check_interval seconds,
+    so other processes' changes show up within that delay.
+    Per-node organization counts are kept separately with their own ttl.
+    """
+
+    def __init__(self, ttl: float, check_interval: float = 0,
+                 counts_ttl: float = 0):
+        self._ttl = ttl
+        self._check_interval = check_interval
+        self._counts_ttl = counts_ttl
+        self._children: dict[UUID, list[UUID]] = {}
+        self._known: set[UUID] = set()
+        self._names: dict[UUID, str] = {}
+        self._parents: dict[UUID, UUID | None] = {}
+        self._roots: list[UUID] = []
+        self._loaded_at: float | None = None
+        self._checked_at: float | None = None
+        self.version: str | None = None
+        # digest of the tree itself: ETag, same in every process
+        self.content_version: str | None = None
+        self._counts: dict[UUID, int] = {}
+        self._counts_at: float | None = None
+        self.counts_version: str | None = None
+        # собранные ответы: (корень, глубина, with_counts) -> payload
+        self._rendered: dict[tuple, Any] = {}
+
+    def is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        now = time.monotonic()
+        return (
+            now - self._loaded_at < self._ttl
+            and now - self._checked_at < self._check_interval
+        )
+
+    def confirm(self, version: str) -> bool:
+        """
+        result of a version probe: True (and the check interval restarts)
+        if the loaded tree is still current, False if it must be reloaded.
+        """
+        if (
+            self._loaded_at is None
+            or version != self.version
+            or time.monotonic() - self._loaded_at >= self._ttl
+        ):
+            return False
+        self._checked_at = time.monotonic()
+        return True
+
+    def counts_fresh(self) -> bool:
+        return (
+            self._counts_at is not None
+            and time.monotonic() - self._counts_at < self._counts_ttl
+        )
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+        self.invalidate_counts()
+
+    def invalidate_counts(self) -> None:
+        self._counts_at = None
+
+    def load(
+        self,
+        rows: Iterable[tuple[UUID, UUID | None] | tuple[UUID, UUID | None, str]],
+        version: str | None = None,
+    ) -> None:
+        children: dict[UUID, list[UUID]] = {}
+        known: set[UUID] = set()
+        names: dict[UUID, str] = {}
+        parents: dict[UUID, UUID | None] = {}
+        for activity_id, parent_id, *name in rows:
+            known.add(activity_id)
+            parents[activity_id] = parent_id
+            if name:
+                names[activity_id] = name[0]
+            if parent_id is not None:
+                children.setdefault(parent_id, []).append(activity_id)
+        # стабильный порядок узлов в ответах
+        for nodes in children.values():
+            nodes.sort(key=lambda node: (names.get(node, ""), node))
+        self._children = children
+        self._known = known
+        self._names = names
+        self._parents = parents
+        self._roots = sorted(
+            (node for node, parent in parents.items()
+             if parent is None or parent not in known),
+            key=lambda node: (names.get(node, ""), node),
+        )
+        self.version = version
+        self.content_version = digest(*sorted(
+            f"{node}:{parents[node]}:{names.get(node, '')}" for node in known
+        ))
+        self._rendered = {}
+        self._loaded_at = self._checked_at = time.monotonic()
+
+    def load_counts(self, rows: Iterable[tuple[UUID, int]]) -> None:
+        self._counts = dict(rows)
+        self.counts_version = digest(*sorted(
+            f"{node}:{count}" for node, count in self._counts.items()
+        ))
+        self._rendered = {}
+        self._counts_at = time.monotonic()
+
+    def descendants(self, activity_id: UUID, max_depth: int) -> list[UUID]:
+        """
+        activity itself and its children down to max_depth levels
+        (max_depth=1 -> only the activity).
+        """
+        if activity_id not in self._known:
+            return []
+        result = [activity_id]
+        level = [activity_id]
+        for _ in range(max_depth - 1):
+            level = [
+                child
+                for node in level
+                for child in self._children.get(node, ())
+            ]
+            if not level:
+                break
+            result.extend(level)
+        return result
+
+    def _node(self, activity_id: UUID, depth: int, with_counts: bool) -> dict:
+        """ActivityTree-shaped dict, children down to depth levels"""
+        parent_id = self._parents[activity_id]
+        node: dict[str, Any] = {
+            "name": self._names.get(activity_id, ""),
+            "id": str(activity_id),
+            "parent_id": str(parent_id) if parent_id is not None else None,
+            "organizations_count": (
+                self._counts.get(activity_id, 0) if with_counts else None
+            ),
+        }
+        node["children"] = [
+            self._node(child, depth - 1, with_counts)
+            for child in self._children.get(activity_id, ())
+        ] if depth > 1 else []
+        return node
+
+    def tree(self, with_counts: bool = False) -> list[dict]:
+        key = (None, None, with_counts)
+        if key not in self._rendered:
+            self._rendered[key] = [
+                self._node(root, len(self._known), with_counts)
+                for root in self._roots
+            ]
+        return self._rendered[key]
+
+    def subtree(
+        self, activity_id: UUID, max_depth: int, with_counts: bool = False
+    ) -> dict | None:
+        if activity_id not in self._known:
+            return None
+        key = (activity_id, max_depth, with_counts)
+        if key not in self._rendered:
+            self._rendered[key] = self._node(activity_id, max_depth,
+                                             with_counts)
+        return self._rendered[key]
+
+
+activity_tree = ActivityTreeCache(
+    ttl=settings.activity_cache_ttl,
+    check_interval=settings.activity_version_check_s,
+    counts_ttl=settings.activity_counts_ttl,
+)
+
+
+async def fresh_activity_tree(
+    repository: ActivityRepository, with_counts: bool = False
+) -> ActivityTreeCache:
+    """
+    shared tree, reloaded in one query if its version changed;
+    counts are one aggregate over the closure table when requested.
+    """
+    if not activity_tree.is_fresh():
+        version = digest(*await repository.get_version())
+        if not activity_tree.confirm(version):
+            activity_tree.load(await repository.get_tree_rows(), version)
+    if with_counts and not activity_tree.counts_fresh():
+        activity_tree.load_counts(
+            await repository.get_organization_counts()
+        )
+    return activity_tree
+
+
+@subscribe
+def _invalidate_on_change(changes: Changes) -> None:
+    if "activity" in changes:
+        activity_tree.invalidate()
+    elif "organization" in changes:
+        activity_tree.invalidate_counts()
@@ -0,0 +1,186 @@
+import functools
+import inspect
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+from uuid import UUID
+
+from app.core.config import settings
+from app.database.events import Changes, subscribe
+
+# списки зависят от всей коллекции, детальные ответы — от конкретных id
+LIST_TAGS = ("organization", "office", "building", "activity")
+
+
+class CacheBackend(ABC):
+    """
+    async key/value store with tag invalidation.
+
+    Invalidation is synchronous: it runs in the after_commit hook, so
+    a request that starts after the commit never reads a stale entry.
+    A Redis implementation would keep values under keys and tags
+    as sets of keys (SADD on set, SMEMBERS + DEL on invalidate, the
+    latter through a sync client).
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:
+        ...
+
+    @abstractmethod
+    async def set(
+        self, key: str, value: Any, tags: Iterable[str], ttl: float
+    ) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]:
+        ...
+
+
+class MemoryCache(CacheBackend):
+    """
+    in-process LRU with per-entry TTL.
+
+    Every worker has its own copy and sees only its own commits: with
+    several workers an entry stays stale in the others until its TTL.
+    """
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = (
+            OrderedDict()
+        )
+        self._tags: dict[str, set[str]] = {}
+        self._counters = dict.fromkeys(
+            ("hits", "misses", "evictions", "expirations", "invalidations"), 0
+        )
+
+    def _drop(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters["misses"] += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return value
+
+    async def set(
+        self, key: str, value: Any, tags: Iterable[str], ttl: float
+    ) -> None:
+        if key in self._entries:
+            self._drop(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self._max_entries:
+            self._drop(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.get(tag, set())
+        for key in keys:
+            self._drop(key)
+        self._counters["invalidations"] += len(keys)
+        return len(keys)
+
+    def stats(self) -> dict[str, int]:
+        return {**self._counters, "size": len(self._entries)}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def make_key(namespace: str, params: dict[str, Any]) -> str:
+    normalized = {name: _normalize(v) for name, v in params.items()}
+    return f"{namespace}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+def cached(
+    namespace: str,
+    tags: Callable[[Any], Iterable[str]] = lambda value: LIST_TAGS,
+    normalizers: dict[str, Callable[[Any], Any]] | None = None,
+    ttl: Callable[[], float] = lambda: settings.cache_ttl,
+):
+    """
+    cache result of a service coroutine by its normalized arguments.
+    None results are not cached; ttl is read on every store.
+    """
+    normalizers = normalizers or {}
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not settings.cache_enabled:
+                return await fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop("self", None)
+            for name, normalize in normalizers.items():
+                params[name] = normalize(params[name])
+            key = make_key(namespace, params)
+
+            value = await response_cache.get(key)
+            if value is not None:
+                return value
+            value = await fn(*args, **kwargs)
+            if value is not None:
+                await response_cache.set(
+                    key, value, tags(value), ttl()
+                )
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def change_tags(changes: Changes) -> set[str]:
+    tags = set()
+    for table, ids in changes.items():
+        tags.add(table)
+        tags.update(f"{table}:{entity_id}" for entity_id in ids)
+    return tags
+
+
+response_cache: CacheBackend = MemoryCache(
+    max_entries=settings.cache_max_entries
+)
+
+
+@subscribe
+def _invalidate_on_change(changes: Changes) -> None:
+    response_cache.invalidate_tags(change_tags(changes))
@@ -0,0 +1,54 @@
+"""
+Response versions for ETag / If-None-Match.
+
+A version is a digest of max(updated_at) and the row count over every
+entity a response is built from: the count catches removed phones, offices
+and links, which leave no newer updated_at behind.
+"""
+import hashlib
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class Versioned(Generic[T]):
+    value: T
+    version: str
+
+
+def latest(timestamps: Iterable[datetime]) -> tuple[datetime | None, int]:
+    """max timestamp and number of timestamps"""
+    newest, count = None, 0
+    for ts in timestamps:
+        count += 1
+        if newest is None or ts > newest:
+            newest = ts
+    return newest, count
+
+
+def digest(*parts: Any) -> str:
+    raw = "\x1f".join(map(str, parts)).encode()
+    return hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+
+def make_etag(version: str, *params: Any, weak: bool = False) -> str:
+    """strong "<version>" or weak W/"<digest of version and params>" """
+    tag = digest(version, *params) if params else version
+    return f'W/"{tag}"' if weak else f'"{tag}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque
+        for tag in if_none_match.split(",")
+    )
@@ -0,0 +1,98 @@
+"""
+Streaming catalog export: NDJSON or CSV, optionally gzip-compressed.
+
+Rows are encoded chunk by chunk straight from a server-side cursor, so
+memory use does not depend on the size of the catalog.
+"""
+import asyncio
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator, Callable, Sequence
+from uuid import UUID
+
+from app.database import Organization
+from app.database.database import get_read_session
+from app.repositories.org_repo import OrganizationRepository
+from app.schemas import serializers
+
+CSV_COLUMNS = (
+    "id", "name", "phones", "activity_ids", "building_ids", "addresses",
+)
+# несколько значений в одной ячейке CSV
+CSV_LIST_SEPARATOR = "|"
+
+
+def ndjson_chunk(orgs: Sequence[Organization]) -> bytes:
+    return b"".join(
+        serializers.dumps(serializers.organization_detail(org)) + b"\n"
+        for org in orgs
+    )
+
+
+def csv_row(org: Organization) -> tuple[str, ...]:
+    join = CSV_LIST_SEPARATOR.join
+    return (
+        str(org.id),
+        org.name,
+        join(phone.phone_number for phone in org.phones),
+        join(str(activity.id) for activity in org.activities),
+        join(str(office.building.id) for office in org.offices),
+        join(office.building.address for office in org.offices),
+    )
+
+
+def csv_chunk(
+    orgs: Sequence[Organization], header: bool = False
+) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    writer.writerows(csv_row(org) for org in orgs)
+    return buffer.getvalue().encode()
+
+
+# формат -> (media type, расширение файла)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+_ENCODERS: dict[str, Callable[[Sequence[Organization]], bytes]] = {
+    "ndjson": ndjson_chunk,
+    "csv": csv_chunk,
+}
+
+
+async def export_rows(
+    fmt: str,
+    activity_ids: Sequence[UUID] | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    own read session (snapshot): the response outlives request-scoped
+    dependencies.
+    """
+    encode = _ENCODERS[fmt]
+    async with get_read_session(snapshot=True) as session:
+        repository = OrganizationRepository(session)
+        if fmt == "csv":
+            yield csv_chunk((), header=True)
+        async for chunk in repository.stream_details(
+            activity_ids, bbox, chunk_size
+        ):
+            yield encode(chunk)
+
+
+async def gzip_stream(
+    chunks: AsyncIterator[bytes], level: int
+) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for data in chunks:
+        # zlib отпускает GIL: сжатие в потоке не блокирует event loop
+        compressed = await asyncio.to_thread(compressor.compress, data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
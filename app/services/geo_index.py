@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import math
+import time
+from array import array
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.database.database import get_read_session
+from app.database.events import Changes, subscribe
+from app.repositories.geo import METERS_PER_DEG_LAT, METERS_PER_DEG_LON
+from app.repositories.org_repo import OrganizationRepository
+
+OrgLocation = tuple[UUID, float | None, float | None]
+
+
+class GeoGridIndex:
+    """
+    in-process uniform lat/lon grid of organization office points.
+
+    Coordinates live in flat float arrays, grid cells hold point numbers,
+    so the whole index is a few arrays plus one dict of cells.
+    """
+
+    def __init__(self, cell_deg: float):
+        self._cell = cell_deg
+        self._reset()
+        self.ready = False
+        self.watermark: datetime | None = None
+        self.built_at: float | None = None
+
+    def _reset(self) -> None:
+        self._lat = array("d")
+        self._lon = array("d")
+        self._owner = array("l")
+        self._free: list[int] = []
+        self._cells: dict[tuple[int, int], array] = {}
+
+        self._org_ids: list[UUID] = []
+        self._org_slot: dict[UUID, int] = {}
+        self._org_points: dict[int, list[int]] = {}
+        self._extent: tuple[int, int, int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self._org_points)
+
+    def _cell_of(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self._cell), math.floor(lon / self._cell)
+
+    def _add_point(self, org_slot: int, lat: float, lon: float) -> int:
+        if self._free:
+            point = self._free.pop()
+            self._lat[point], self._lon[point] = lat, lon
+            self._owner[point] = org_slot
+        else:
+            point = len(self._lat)
+            self._lat.append(lat)
+            self._lon.append(lon)
+            self._owner.append(org_slot)
+        key = self._cell_of(lat, lon)
+        if key not in self._cells:
+            self._cells[key] = array("l")
+            self._extent = None
+        self._cells[key].append(point)
+        return point
+
+    def _drop_point(self, point: int) -> None:
+        key = self._cell_of(self._lat[point], self._lon[point])
+        cell = self._cells[key]
+        cell.remove(point)
+        if not cell:
+            del self._cells[key]
+            self._extent = None
+        self._owner[point] = -1
+        self._free.append(point)
+
+    def set_organization(
+        self, org_id: UUID, points: Iterable[tuple[float, float]]
+    ) -> None:
+        slot = self._org_slot.get(org_id)
+        if slot is None:
+            slot = len(self._org_ids)
+            self._org_ids.append(org_id)
+            self._org_slot[org_id] = slot
+        else:
+            for point in self._org_points.pop(slot, ()):
+                self._drop_point(point)
+        self._org_points[slot] = [
+            self._add_point(slot, lat, lon) for lat, lon in points
+        ]
+
+    def remove_organization(self, org_id: UUID) -> None:
+        slot = self._org_slot.get(org_id)
+        if slot is None:
+            return
+        for point in self._org_points.pop(slot, ()):
+            self._drop_point(point)
+
+    def load(self, rows: Iterable[OrgLocation]) -> None:
+        """full rebuild from (org_id, lat, lon) rows"""
+        self._reset()
+        self.apply(rows)
+        self.ready = True
+        self.built_at = time.monotonic()
+
+    def apply(self, rows: Iterable[OrgLocation]) -> None:
+        """replace points of every organization present in rows"""
+        grouped: dict[UUID, list[tuple[float, float]]] = {}
+        for org_id, lat, lon in rows:
+            points = grouped.setdefault(org_id, [])
+            if lat is not None:
+                points.append((float(lat), float(lon)))
+        for org_id, points in grouped.items():
+            self.set_organization(org_id, points)
+
+    def _cells_in(
+        self, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> Iterable[array]:
+        i_min, j_min = self._cell_of(lat_min, lon_min)
+        i_max, j_max = self._cell_of(lat_max, lon_max)
+        if (i_max - i_min + 1) * (j_max - j_min + 1) > len(self._cells):
+            return [
+                cell for (i, j), cell in self._cells.items()
+                if i_min <= i <= i_max and j_min <= j <= j_max
+            ]
+        return [
+            self._cells[(i, j)]
+            for i in range(i_min, i_max + 1)
+            for j in range(j_min, j_max + 1)
+            if (i, j) in self._cells
+        ]
+
+    def in_bbox(
+        self, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> list[UUID]:
+        """
+        ids of organizations with an office in area, unordered: pages are
+        ordered by the database, in its collation.
+        """
+        lat, lon, owner = self._lat, self._lon, self._owner
+        slots = {
+            owner[p]
+            for cell in self._cells_in(lat_min, lat_max, lon_min, lon_max)
+            for p in cell
+            if lat_min <= lat[p] <= lat_max and lon_min <= lon[p] <= lon_max
+        }
+        return [self._org_ids[s] for s in slots]
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        radius_m: float | None = None,
+    ) -> list[tuple[UUID, float]]:
+        """
+        k nearest organizations by closest point, ring search over cells.
+        Same equirectangular metric as the SQL path.
+        """
+        if not self._cells:
+            return []
+        kx = METERS_PER_DEG_LON * math.cos(math.radians(lat))
+        ring_step_m = self._cell * min(METERS_PER_DEG_LAT, kx)
+        ci, cj = self._cell_of(lat, lon)
+        if self._extent is None:
+            rows = [i for i, _ in self._cells]
+            cols = [j for _, j in self._cells]
+            self._extent = min(rows), max(rows), min(cols), max(cols)
+        i_min, i_max, j_min, j_max = self._extent
+        max_ring = max(ci - i_min, i_max - ci, cj - j_min, j_max - cj, 0)
+
+        best: dict[int, float] = {}
+        for ring in range(max_ring + 1):
+            for i in range(ci - ring, ci + ring + 1):
+                step = 1 if abs(i - ci) == ring else 2 * ring
+                for j in range(cj - ring, cj + ring + 1, step):
+                    for p in self._cells.get((i, j), ()):
+                        dx = (self._lon[p] - lon) * kx
+                        dy = (self._lat[p] - lat) * METERS_PER_DEG_LAT
+                        dist = math.sqrt(dx * dx + dy * dy)
+                        if radius_m is not None and dist > radius_m:
+                            continue
+                        slot = self._owner[p]
+                        if dist < best.get(slot, math.inf):
+                            best[slot] = dist
+            # всё, что дальше этого кольца, не ближе ring * ring_step_m
+            bound = ring * ring_step_m
+            if radius_m is not None and bound > radius_m:
+                break
+            if len(best) >= k and heapq.nsmallest(k, best.values())[-1] <= bound:
+                break
+
+        nearest = sorted(
+            (dist, self._org_ids[slot]) for slot, dist in best.items()
+        )
+        return [(org_id, dist) for dist, org_id in nearest[:k]]
+
+    def memory_bytes(self) -> int:
+        """approximate size of index storage"""
+        arrays = (
+            self._lat.buffer_info()[1] * self._lat.itemsize
+            + self._lon.buffer_info()[1] * self._lon.itemsize
+            + self._owner.buffer_info()[1] * self._owner.itemsize
+            + sum(c.buffer_info()[1] * c.itemsize for c in self._cells.values())
+        )
+        return arrays + len(self._cells) * 120 + len(self._org_ids) * 200
+
+
+geo_index = GeoGridIndex(cell_deg=settings.geo_index_cell_deg)
+
+_pending_orgs: set[UUID] = set()
+
+
+@subscribe
+def _track_changes(changes: Changes) -> None:
+    _pending_orgs.update(changes.get("organization", ()))
+
+
+async def build_geo_index() -> None:
+    async with get_read_session() as session:
+        repository = OrganizationRepository(session)
+        watermark = await repository.db_now()
+        start = time.perf_counter()
+        geo_index.load(await repository.get_locations())
+    geo_index.watermark = watermark
+    logger.info(
+        f"Geo index built: {len(geo_index)} организаций, "
+        f"{geo_index.memory_bytes() / 1024:.0f} KiB, "
+        f"{(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+
+
+async def refresh_geo_index() -> None:
+    """
+    apply rows changed since last watermark (with overlap for transactions
+    that committed late) plus organizations touched in this process.
+    """
+    overlap = timedelta(seconds=settings.geo_index_refresh_overlap_s)
+    org_ids = set(_pending_orgs)
+    _pending_orgs.difference_update(org_ids)
+    async with get_read_session() as session:
+        repository = OrganizationRepository(session)
+        watermark = await repository.db_now()
+        rows = await repository.get_locations(
+            changed_since=geo_index.watermark - overlap
+        )
+        if org_ids:
+            rows = [*rows, *await repository.get_locations(org_ids=org_ids)]
+    geo_index.apply(rows)
+    for org_id in org_ids - {row[0] for row in rows}:
+        geo_index.remove_organization(org_id)
+    geo_index.watermark = watermark
+
+
+async def run_geo_index() -> None:
+    """build, then keep index fresh until cancelled"""
+    while True:
+        try:
+            if (not geo_index.ready or time.monotonic() - geo_index.built_at
+                    > settings.geo_index_full_rebuild_s):
+                await build_geo_index()
+            else:
+                await refresh_geo_index()
+        except Exception as e:
+            logger.exception(f"Ошибка обновления geo index: {e}")
+        await asyncio.sleep(settings.geo_index_refresh_s)
@@ -1,60 +1,608 @@
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
+from typing import Any
 from uuid import UUID
 
-from app.repositories.org_repo import OrganizationRepository
+import orjson
+from sqlalchemy import Row
+
+from app.core.config import settings
+from app.core.profiler import span
+from app.database import Organization
+from app.repositories.activity_repo import ActivityRepository
+from app.repositories.document_repo import OrganizationDocumentRepository
+from app.repositories.json_repo import JsonPage, OrganizationJsonRepository
+from app.repositories.org_repo import OrganizationQuery, \
+    OrganizationRepository, OrgKey, QUERY_SORTS
+from app.repositories.pagination import Page, encode_cursor, decode_cursor
 from app.schemas.org_response import OrganizationListResponse, \
-    OrganizationDetailResponse
+    OrganizationDetailResponse, OrganizationNearbyResponse, \
+    OrganizationBatchItem, OrganizationBatchResponse, ActivityFacetResponse, \
+    BuildingFacetResponse
+from app.schemas import serializers
 from app.schemas.organization import OrganizationReadShort, \
-    OrganizationReadDetail
+    OrganizationReadDetail, OrganizationNearby
+from app.services.activity_tree import fresh_activity_tree
+from app.services.cache import LIST_TAGS, cached
+from app.services.etag import Versioned, digest, latest
+from app.services.export import EXPORT_FORMATS, export_rows, gzip_stream
+from app.services.geo_index import geo_index
+
+
+# при fast_serialization сервис отдаёт готовые dict-ответы вместо моделей,
+# на маршрутах из json_agg_routes — готовый JSON от базы
+Payload = dict[str, Any] | bytes
+
+
+def _detail_tags(
+    versioned: Versioned[OrganizationDetailResponse | Payload],
+) -> set[str]:
+    response = versioned.value
+    if isinstance(response, bytes):
+        # JSON от базы не разбираем: сбрасывается любым изменением таблиц
+        return set(LIST_TAGS)
+    if not isinstance(response, dict):
+        response = response.model_dump()
+    org = response["organization"]
+    return {
+        f"organization:{org['id']}",
+        *(f"office:{office['id']}" for office in org["offices"]),
+        *(f"building:{office['building']['id']}" for office in org["offices"]),
+        *(f"activity:{activity['id']}" for activity in org["activities"]),
+    }
+
+
+_NAME_NORMALIZERS = {
+    "q": lambda q: q.strip().lower() if q is not None else None,
+}
+
+
+def _area(
+    lat_min: float | None, lat_max: float | None,
+    lon_min: float | None, lon_max: float | None,
+) -> tuple[float, float, float, float] | None:
+    """bbox from optional coordinates: all four or none, min <= max"""
+    bbox = (lat_min, lat_max, lon_min, lon_max)
+    if all(value is None for value in bbox):
+        return None
+    if any(value is None for value in bbox):
+        raise ValueError(
+            "Область задаётся всеми четырьмя координатами: "
+            "lat_min, lat_max, lon_min, lon_max"
+        )
+    if lat_min > lat_max or lon_min > lon_max:
+        # box(point, point) в PostgreSQL переставил бы углы, а сравнения
+        # на остальных бэкендах не нашли бы ничего
+        raise ValueError(
+            "Минимальные координаты области больше максимальных"
+        )
+    return bbox
+
+
+def _name_query(q: str | None) -> str | None:
+    if q is None:
+        return None
+    q = q.strip()
+    if len(q) < 2:
+        raise ValueError("Минимальная длина запроса — 2 символа")
+    return q
+
+
+def _timestamps(
+    org: Organization,
+    fields: tuple[str, ...] | None = None,
+    activities: bool = False,
+) -> Iterator[datetime]:
+    """updated_at of the organization and of the relations in its response"""
+    yield org.updated_at
+    if fields is None or "phones" in fields:
+        for phone in org.phones:
+            yield phone.updated_at
+    if fields is None or "offices" in fields:
+        for office in org.offices:
+            yield office.updated_at
+            yield office.building.updated_at
+    if activities:
+        for activity in org.activities:
+            yield activity.updated_at
+
+
+def _detail_version(
+    organization_id: UUID, ts: datetime | None, count: int
+) -> str:
+    return digest(organization_id, ts, count)
 
 
 class OrganizationService:
-    def __init__(self, repository: OrganizationRepository):
+    def __init__(
+            self,
+            repository: OrganizationRepository,
+            activity_repository: ActivityRepository,
+            document_repository: OrganizationDocumentRepository | None = None,
+            json_repository: OrganizationJsonRepository | None = None,
+    ):
         self.repository = repository
+        self.activity_repository = activity_repository
+        # by-building / by-activity из organization_document, если включено
+        self.document_repository = (
+            document_repository if settings.org_documents else None
+        )
+        self.json_repository = json_repository
+
+    def _json_backend(self, route: str) -> OrganizationJsonRepository | None:
+        """json_agg repository if enabled for the route (postgresql only)"""
+        if (
+            route in settings.json_agg_routes
+            and self.json_repository is not None
+            and self.json_repository.dialect_name == "postgresql"
+        ):
+            return self.json_repository
+        return None
+
+    @staticmethod
+    def _after_key(cursor: str | None, ranked: bool = False) -> OrgKey | None:
+        if cursor is None:
+            return None
+        key = decode_cursor(cursor)
+        try:
+            if ranked:
+                rank, name, org_id = key
+                return float(rank), name, UUID(org_id)
+            name, org_id = key
+            return name, UUID(org_id)
+        except ValueError:
+            raise ValueError("Некорректный курсор пагинации")
+
+    @staticmethod
+    @span("serialize")
+    def _to_list_response(
+            page: Page[Organization],
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        next_cursor = encode_cursor(page.next_key) if page.next_key else None
+        version = digest(
+            *latest(
+                ts for org in page.items for ts in _timestamps(org, fields)
+            ),
+            page.total, next_cursor, *(org.id for org in page.items),
+        )
+        if fields is not None:
+            # неполный набор полей не проходит через pydantic-схему
+            return Versioned({
+                "total": page.total,
+                "items": [
+                    serializers.organization_fields(org, fields)
+                    for org in page.items
+                ],
+                "next_cursor": next_cursor,
+            }, version)
+        if settings.fast_serialization:
+            return Versioned({
+                "total": page.total,
+                "items": [
+                    serializers.organization_short(org) for org in page.items
+                ],
+                "next_cursor": next_cursor,
+            }, version)
+        return Versioned(OrganizationListResponse(
+            total=page.total,
+            items=[OrganizationReadShort.from_orm(org) for org in page.items],
+            next_cursor=next_cursor,
+        ), version)
+
+    @staticmethod
+    @span("serialize")
+    def _documents_response(
+            page: Page[Row],
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        """list response from organization_document rows"""
+        next_cursor = encode_cursor(page.next_key) if page.next_key else None
+        newest = max(
+            (row.source_updated_at for row in page.items), default=None
+        )
+        version = digest(
+            newest, sum(row.source_parts for row in page.items),
+            page.total, next_cursor,
+            *(row.organization_id for row in page.items),
+        )
+        if fields is not None:
+            items = [
+                {name: row.organization_id if name == "id"
+                 else getattr(row, name) for name in fields}
+                for row in page.items
+            ]
+        else:
+            items = [
+                {"name": row.name, "id": row.organization_id,
+                 "phones": row.phones, "offices": row.offices}
+                for row in page.items
+            ]
+        if fields is None and not settings.fast_serialization:
+            return Versioned(OrganizationListResponse(
+                total=page.total,
+                items=[OrganizationReadShort.model_validate(item)
+                       for item in items],
+                next_cursor=next_cursor,
+            ), version)
+        return Versioned({
+            "total": page.total,
+            "items": items,
+            "next_cursor": next_cursor,
+        }, version)
+
+    @staticmethod
+    @span("serialize")
+    def _json_list_response(page: JsonPage) -> Versioned[bytes]:
+        """list response around the items array rendered by the database"""
+        next_cursor = encode_cursor(page.next_key) if page.next_key else None
+        version = digest(
+            page.updated_at, page.parts, page.total, next_cursor, *page.ids
+        )
+        body = b"".join((
+            b'{"total":', orjson.dumps(page.total),
+            b',"items":', page.items.encode(),
+            b',"next_cursor":', orjson.dumps(next_cursor), b"}",
+        ))
+        return Versioned(body, version)
 
-    async def get_by_building(self, building_id: UUID) -> OrganizationListResponse:
-        organizations = await self.repository.get_by_building(building_id)
-        return OrganizationListResponse(
-            total=len(organizations),
-            items=[OrganizationReadShort.from_orm(org) for org in organizations],
+    @cached("get_by_building")
+    async def get_by_building(
+            self, building_id: UUID, limit: int,
+            cursor: str | None = None, with_total: bool = False,
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        if json_repository := self._json_backend("get_by_building"):
+            return self._json_list_response(
+                await json_repository.get_by_building(
+                    building_id, limit, self._after_key(cursor), with_total,
+                    fields=fields,
+                )
+            )
+        if self.document_repository is not None:
+            page = await self.document_repository.get_by_building(
+                building_id, limit, self._after_key(cursor), with_total,
+                fields=fields,
+            )
+            return self._documents_response(page, fields)
+        page = await self.repository.get_by_building(
+            building_id, limit, self._after_key(cursor), with_total,
+            fields=fields,
         )
+        return self._to_list_response(page, fields)
 
-    async def get_by_activity(self, activity_id: UUID, max_depth: int = 3) -> OrganizationListResponse:
+    async def _activity_subtree(
+            self, activity_id: UUID, max_depth: int
+    ) -> list[UUID]:
         if max_depth > 3:
             raise ValueError("Максимальная глубина вложенности видов деятельности — 3")
-        organizations = await self.repository.get_by_activity(activity_id)
-        return OrganizationListResponse(
-            total=len(organizations),
-            items=[OrganizationReadShort.from_orm(org) for org in organizations],
+        if max_depth < 1:
+            raise ValueError("Минимальная глубина вложенности — 1")
+        tree = await fresh_activity_tree(self.activity_repository)
+        return tree.descendants(activity_id, max_depth)
+
+    @cached("get_by_activity")
+    async def get_by_activity(
+            self, activity_id: UUID, limit: int,
+            cursor: str | None = None, with_total: bool = False,
+            max_depth: int = 3, fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        json_repository = self._json_backend("get_by_activity")
+        if (
+            json_repository is None
+            and self.document_repository is not None
+            and max_depth == 3
+        ):
+            # уровней в дереве три: всё поддерево — это совпадение по пути
+            # предков, само дерево не нужно
+            page = await self.document_repository.get_by_activity(
+                [activity_id], limit, self._after_key(cursor), with_total,
+                fields=fields, subtree=True,
+            )
+            return self._documents_response(page, fields)
+        activity_ids = await self._activity_subtree(activity_id, max_depth)
+        if not activity_ids:
+            return self._to_list_response(
+                Page(items=[], total=0 if with_total else None), fields
+            )
+        if json_repository is not None:
+            return self._json_list_response(
+                await json_repository.get_by_activity(
+                    activity_ids, limit, self._after_key(cursor), with_total,
+                    fields=fields,
+                )
+            )
+        if self.document_repository is not None:
+            page = await self.document_repository.get_by_activity(
+                activity_ids, limit, self._after_key(cursor), with_total,
+                fields=fields,
+            )
+            return self._documents_response(page, fields)
+        page = await self.repository.get_by_activity(
+            activity_ids, limit, self._after_key(cursor), with_total,
+            fields=fields,
         )
+        return self._to_list_response(page, fields)
 
+    @cached("get_in_area")
     async def get_in_area(
             self, lat_min: float, lat_max: float,
-            lon_min: float, lon_max: float
-    ) -> OrganizationListResponse:
-        organizations = await self.repository.get_in_area(
-            lat_min, lat_max, lon_min, lon_max
+            lon_min: float, lon_max: float, limit: int,
+            cursor: str | None = None, with_total: bool = False,
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        _area(lat_min, lat_max, lon_min, lon_max)
+        after = self._after_key(cursor)
+        ids = None
+        if geo_index.ready:
+            ids = geo_index.in_bbox(lat_min, lat_max, lon_min, lon_max)
+        if ids is not None and len(ids) <= settings.geo_index_max_ids:
+            # индекс отбирает id, страницу упорядочивает база: курсоры
+            # те же, что у SQL-пути
+            page = Page(items=[])
+            if ids:
+                page = await self.repository.get_page_by_ids(
+                    ids, limit, after, fields=fields
+                )
+        else:
+            # без индекса или в большой области: список id дороже выборки
+            # по GiST, от индекса остаётся только total
+            page = await self.repository.get_in_area(
+                lat_min, lat_max, lon_min, lon_max,
+                limit, after, with_total and ids is None, fields=fields,
+            )
+        if ids is not None and with_total:
+            page.total = len(ids)
+        return self._to_list_response(page, fields)
+
+    @cached("get_nearby")
+    async def get_nearby(
+            self, lat: float, lon: float, k: int,
+            radius_m: float | None = None,
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationNearbyResponse | Payload]:
+        if geo_index.ready:
+            nearest = geo_index.nearest(lat, lon, k, radius_m)
+            distances = dict(nearest)
+            orgs = await self.repository.get_by_ids(
+                [org_id for org_id, _ in nearest], fields
+            )
+            rows = [(org, distances[org.id]) for org in orgs]
+        else:
+            rows = await self.repository.get_nearby(
+                lat, lon, k, radius_m, fields=fields
+            )
+        version = digest(
+            *latest(ts for org, _ in rows for ts in _timestamps(org, fields)),
+            *((org.id, round(distance, 1)) for org, distance in rows),
+        )
+        if fields is not None:
+            return Versioned({
+                "items": [
+                    {
+                        **serializers.organization_fields(org, fields),
+                        "distance_m": round(distance, 1),
+                    }
+                    for org, distance in rows
+                ]
+            }, version)
+        if settings.fast_serialization:
+            return Versioned({
+                "items": [
+                    {
+                        **serializers.organization_short(org),
+                        "distance_m": round(distance, 1),
+                    }
+                    for org, distance in rows
+                ]
+            }, version)
+        return Versioned(OrganizationNearbyResponse(
+            items=[
+                OrganizationNearby(
+                    **dict(OrganizationReadShort.from_orm(org)),
+                    distance_m=round(distance, 1),
+                )
+                for org, distance in rows
+            ]
+        ), version)
+
+    @cached("search_by_name", normalizers=_NAME_NORMALIZERS)
+    async def search_by_name(
+            self, q: str, limit: int,
+            cursor: str | None = None, with_total: bool = False,
+            fields: tuple[str, ...] | None = None,
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        page = await self.repository.search_by_name(
+            _name_query(q), limit, self._after_key(cursor, ranked=True),
+            with_total, fields=fields,
+        )
+        return self._to_list_response(page, fields)
+
+    @cached("query", normalizers=_NAME_NORMALIZERS)
+    async def query(
+            self, limit: int,
+            cursor: str | None = None, with_total: bool = False,
+            fields: tuple[str, ...] | None = None,
+            activity_id: UUID | None = None, max_depth: int = 3,
+            building_id: UUID | None = None,
+            lat_min: float | None = None, lat_max: float | None = None,
+            lon_min: float | None = None, lon_max: float | None = None,
+            lat: float | None = None, lon: float | None = None,
+            radius_m: float | None = None,
+            q: str | None = None, sort: str = "name",
+    ) -> Versioned[OrganizationListResponse | Payload]:
+        """any combination of filters in one statement"""
+        if sort not in QUERY_SORTS:
+            raise ValueError(f"Неизвестная сортировка: {sort}")
+        bbox = _area(lat_min, lat_max, lon_min, lon_max)
+        if (lat is None) != (lon is None):
+            raise ValueError("Точка задаётся двумя координатами: lat, lon")
+        point = (lat, lon) if lat is not None else None
+        if radius_m is not None and point is None:
+            raise ValueError("Для радиуса нужна точка: lat, lon")
+        if radius_m is not None and bbox is not None:
+            raise ValueError("Укажите либо область, либо радиус")
+        if sort == "distance" and point is None:
+            raise ValueError("Для сортировки по расстоянию нужна точка")
+        q = _name_query(q)
+        if q is None and sort == "relevance":
+            raise ValueError("Для сортировки по релевантности нужен запрос q")
+
+        activity_ids = None
+        if activity_id is not None:
+            activity_ids = tuple(
+                await self._activity_subtree(activity_id, max_depth)
+            )
+            if not activity_ids:
+                return self._to_list_response(
+                    Page(items=[], total=0 if with_total else None), fields
+                )
+        filters = OrganizationQuery(
+            activity_ids=activity_ids, building_id=building_id, bbox=bbox,
+            point=point, radius_m=radius_m, name=q,
+        )
+        page = await self.repository.query(
+            filters, limit, self._after_key(cursor, ranked=sort != "name"),
+            with_total, sort=sort, fields=fields,
         )
-        return OrganizationListResponse(
-            total=len(organizations),
-            items=[OrganizationReadShort.from_orm(org) for org in organizations],
+        return self._to_list_response(page, fields)
+
+    @cached("facets_by_activity", normalizers=_NAME_NORMALIZERS,
+            ttl=lambda: settings.facet_cache_ttl)
+    async def facets_by_activity(
+            self,
+            lat_min: float | None = None, lat_max: float | None = None,
+            lon_min: float | None = None, lon_max: float | None = None,
+            q: str | None = None,
+    ) -> ActivityFacetResponse | Payload:
+        """organization counts per activity, rolled up over subtrees"""
+        rows = await self.repository.count_by_activity(
+            _area(lat_min, lat_max, lon_min, lon_max), _name_query(q)
         )
+        items = [
+            {"activity_id": activity_id, "count": count}
+            for activity_id, count in rows
+        ]
+        if settings.fast_serialization:
+            return {"items": items}
+        return ActivityFacetResponse(items=items)
 
-    async def search_by_name(self, query: str) -> OrganizationListResponse:
-        query = query.strip()
-        if len(query) < 2:
-            raise ValueError("Минимальная длина запроса — 2 символа")
-        organizations = await self.repository.search_by_name(query)
-        return OrganizationListResponse(
-            total=len(organizations),
-            items=[OrganizationReadShort.from_orm(org) for org in organizations],
+    @cached("facets_by_building", normalizers=_NAME_NORMALIZERS,
+            ttl=lambda: settings.facet_cache_ttl)
+    async def facets_by_building(
+            self, limit: int,
+            lat_min: float | None = None, lat_max: float | None = None,
+            lon_min: float | None = None, lon_max: float | None = None,
+            q: str | None = None,
+    ) -> BuildingFacetResponse | Payload:
+        """organization counts per building, most populated first"""
+        rows = await self.repository.count_by_building(
+            limit, _area(lat_min, lat_max, lon_min, lon_max), _name_query(q)
         )
+        items = [
+            {"building_id": building_id, "count": count}
+            for building_id, count in rows
+        ]
+        if settings.fast_serialization:
+            return {"items": items}
+        return BuildingFacetResponse(items=items)
 
+    @cached("get_by_id", tags=_detail_tags)
     async def get_by_id(
             self, organization_id: UUID
-    ) -> OrganizationDetailResponse | None:
+    ) -> Versioned[OrganizationDetailResponse | Payload] | None:
+        if json_repository := self._json_backend("get_by_id"):
+            detail = await json_repository.get_detail(organization_id)
+            if detail is None:
+                return None
+            return Versioned(
+                b'{"organization":' + detail.body.encode() + b"}",
+                _detail_version(
+                    organization_id, detail.updated_at, detail.parts
+                ),
+            )
         org = await self.repository.get_by_id(organization_id)
         if not org:
             return None
-        return OrganizationDetailResponse(
+        version = _detail_version(
+            org.id, *latest(_timestamps(org, activities=True))
+        )
+        if settings.fast_serialization:
+            return Versioned(
+                {"organization": serializers.organization_detail(org)},
+                version,
+            )
+        return Versioned(OrganizationDetailResponse(
             organization=OrganizationReadDetail.from_orm(org)
+        ), version)
+
+    async def get_version(self, organization_id: UUID) -> str | None:
+        """
+        detail response version from a single probe query, None if the
+        organization does not exist.
+        """
+        ts, count = await self.repository.get_version(organization_id)
+        if not count:
+            return None
+        return _detail_version(organization_id, ts, count)
+
+    async def get_batch(
+            self, organization_ids: list[UUID]
+    ) -> OrganizationBatchResponse | Payload:
+        if len(organization_ids) > settings.batch_max_ids:
+            raise ValueError(
+                f"Не более {settings.batch_max_ids} ID в одном запросе"
+            )
+        orgs = await self.repository.get_details_by_ids(
+            set(organization_ids)
+        )
+        found = [(org_id, orgs.get(org_id)) for org_id in organization_ids]
+        if settings.fast_serialization:
+            return {
+                "items": [
+                    {
+                        "id": org_id,
+                        "found": org is not None,
+                        "organization": (
+                            serializers.organization_detail(org)
+                            if org is not None else None
+                        ),
+                    }
+                    for org_id, org in found
+                ]
+            }
+        return OrganizationBatchResponse(
+            items=[
+                OrganizationBatchItem(
+                    id=org_id,
+                    found=org is not None,
+                    organization=(
+                        OrganizationReadDetail.from_orm(org)
+                        if org is not None else None
+                    ),
+                )
+                for org_id, org in found
+            ]
+        )
+
+    async def export(
+            self, fmt: str,
+            activity_id: UUID | None = None, max_depth: int = 3,
+            bbox: tuple[float | None, ...] = (None, None, None, None),
+            compress: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        filters are resolved here, within the request; rows are read
+        later, while the response streams.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+        activity_ids = None
+        if activity_id is not None:
+            activity_ids = await self._activity_subtree(activity_id, max_depth)
+        chunks = export_rows(
+            fmt, activity_ids, _area(*bbox), settings.export_chunk_size
         )
+        if compress:
+            return gzip_stream(chunks, settings.export_gzip_level)
+        return chunks
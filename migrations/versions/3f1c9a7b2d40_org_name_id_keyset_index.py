@@ -0,0 +1,29 @@
+"""org (name, id) keyset index
+
+Revision ID: 3f1c9a7b2d40
+Revises: 6ab4e60ed2f1
+Create Date: 2026-10-18 09:12:04.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7b2d40'
+down_revision: Union[str, Sequence[str], None] = '6ab4e60ed2f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_org_name_id', 'organization', ['name', 'id'], unique=False)
+    op.drop_index('ix_org_name', table_name='organization')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_org_name', 'organization', ['name'], unique=False)
+    op.drop_index('ix_org_name_id', table_name='organization')
@@ -0,0 +1,34 @@
+"""building location gist index
+
+Revision ID: 5b93d0e8f2c6
+Revises: c41f7e09a3b5
+Create Date: 2026-10-18 12:40:13.290571
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b93d0e8f2c6'
+down_revision: Union[str, Sequence[str], None] = 'c41f7e09a3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_building_location', 'building',
+        [sa.text('point(CAST(lon AS FLOAT), CAST(lat AS FLOAT))')],
+        unique=False, postgresql_using='gist',
+    )
+    op.drop_index('ix_building_lat_lon', table_name='building')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_building_lat_lon', 'building', ['lat', 'lon'], unique=False)
+    op.drop_index('ix_building_location', table_name='building')
@@ -0,0 +1,51 @@
+"""activity closure table
+
+Revision ID: 8d2e4b61c7a9
+Revises: 3f1c9a7b2d40
+Create Date: 2026-10-18 10:02:37.551906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b61c7a9'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7b2d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.UUID(), nullable=False),
+    sa.Column('descendant_id', sa.UUID(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_ancestor_depth', 'activity_closure', ['ancestor_id', 'depth', 'descendant_id'], unique=False)
+    op.create_index('ix_activity_closure_descendant', 'activity_closure', ['descendant_id'], unique=False)
+    op.execute(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM activity
+            UNION ALL
+            SELECT tree.ancestor_id, a.id, tree.depth + 1
+            FROM tree JOIN activity a ON a.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_activity_closure_descendant', table_name='activity_closure')
+    op.drop_index('ix_activity_closure_ancestor_depth', table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,104 @@
+"""organization document read model
+
+Revision ID: a7c3e5f19d28
+Revises: 5b93d0e8f2c6
+Create Date: 2026-10-18 15:21:48.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5f19d28'
+down_revision: Union[str, Sequence[str], None] = '5b93d0e8f2c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_document',
+    sa.Column('organization_id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(length=300), nullable=False),
+    sa.Column('phones', sa.JSON(), nullable=False),
+    sa.Column('offices', sa.JSON(), nullable=False),
+    sa.Column('activity_ids', postgresql.ARRAY(sa.UUID()), nullable=False),
+    sa.Column('activity_path_ids', postgresql.ARRAY(sa.UUID()), nullable=False),
+    sa.Column('building_ids', postgresql.ARRAY(sa.UUID()), nullable=False),
+    sa.Column('source_updated_at', sa.DateTime(), nullable=False),
+    sa.Column('source_parts', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organization.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+    op.create_index('ix_org_document_name_id', 'organization_document', ['name', 'organization_id'], unique=False)
+    op.execute(
+        """
+        INSERT INTO organization_document (
+            organization_id, name, phones, offices, activity_ids,
+            activity_path_ids, building_ids, source_updated_at, source_parts
+        )
+        SELECT
+            o.id, o.name,
+            coalesce(p.phones, '[]'::json),
+            coalesce(f.offices, '[]'::json),
+            coalesce(a.activity_ids, '{}'),
+            coalesce(a.activity_path_ids, '{}'),
+            coalesce(f.building_ids, '{}'),
+            greatest(o.updated_at, p.updated_at, f.updated_at),
+            1 + coalesce(p.parts, 0) + coalesce(f.parts, 0)
+        FROM organization o
+        LEFT JOIN LATERAL (
+            SELECT
+                json_agg(json_build_object('phone_number', ph.phone_number)
+                         ORDER BY ph.phone_number) AS phones,
+                max(ph.updated_at) AS updated_at,
+                count(*) AS parts
+            FROM organization_phone ph
+            WHERE ph.organization_id = o.id
+        ) p ON true
+        LEFT JOIN LATERAL (
+            SELECT
+                json_agg(json_build_object(
+                    'id', ofc.id, 'floor', ofc.floor, 'unit', ofc.unit,
+                    'building', json_build_object(
+                        'address', b.address,
+                        'lat', CAST(b.lat AS FLOAT),
+                        'lon', CAST(b.lon AS FLOAT),
+                        'id', b.id
+                    )
+                ) ORDER BY ofc.id) AS offices,
+                array_agg(DISTINCT b.id) AS building_ids,
+                greatest(max(ofc.updated_at), max(b.updated_at)) AS updated_at,
+                2 * count(*) AS parts
+            FROM organization_office oo
+            JOIN office ofc ON ofc.id = oo.office_id
+            JOIN building b ON b.id = ofc.building_id
+            WHERE oo.organization_id = o.id
+        ) f ON true
+        LEFT JOIN LATERAL (
+            SELECT
+                array_agg(DISTINCT oa.activity_id) AS activity_ids,
+                array_agg(DISTINCT c.ancestor_id) AS activity_path_ids
+            FROM organization_activity oa
+            JOIN activity_closure c ON c.descendant_id = oa.activity_id
+            WHERE oa.organization_id = o.id
+        ) a ON true
+        """
+    )
+    for column in ('activity_ids', 'activity_path_ids', 'building_ids'):
+        op.create_index(
+            f'ix_org_document_{column}', 'organization_document', [column],
+            unique=False, postgresql_using='gin',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in ('building_ids', 'activity_path_ids', 'activity_ids'):
+        op.drop_index(f'ix_org_document_{column}', table_name='organization_document')
+    op.drop_index('ix_org_document_name_id', table_name='organization_document')
+    op.drop_table('organization_document')
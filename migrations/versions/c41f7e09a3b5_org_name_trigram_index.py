@@ -0,0 +1,32 @@
+"""org name trigram index
+
+Revision ID: c41f7e09a3b5
+Revises: 8d2e4b61c7a9
+Create Date: 2026-10-18 11:24:51.803117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7e09a3b5'
+down_revision: Union[str, Sequence[str], None] = '8d2e4b61c7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_org_name_trgm', 'organization', [sa.text('lower(name) gin_trgm_ops')],
+        unique=False, postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_org_name_trgm', table_name='organization')
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import pytest
+
+# настройки читаются при импорте app: до него подменяем окружение,
+# тесты идут на отдельной SQLite и не трогают базу из .env
+_tmp = tempfile.mkdtemp(prefix="restapi-tests-")
+os.environ.update(
+    API_KEY="test-key",
+    DATABASE_URL=f"sqlite+aiosqlite:///{_tmp}/test.sqlite",
+    SYNC_DATABASE_URL=f"sqlite:///{_tmp}/test.sqlite",
+    POSTGRES_USER="test",
+    POSTGRES_PASSWORD="test",
+    POSTGRES_DB="test",
+    DATABASE_REPLICA_URLS="[]",
+    GEO_INDEX_ENABLED="false",
+    LOG_DIR=os.path.join(_tmp, "logs"),
+    LOG_CONSOLE="false",
+)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def tmp_sqlite(tmp_path):
+    """async url of an empty SQLite file"""
+    return lambda name="db": f"sqlite+aiosqlite:///{tmp_path / name}.sqlite"
@@ -0,0 +1,119 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.api.v1.dependencies import get_client_id
+from app.database import Building
+from app.database import database as database_module
+from app.database.base import Base
+from app.database.database import Database
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # только для синхронных тестов: цикл событий тоже читает monotonic
+    clock = Clock()
+    monkeypatch.setattr(database_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+async def db(tmp_sqlite):
+    db = Database(
+        tmp_sqlite("primary"),
+        replica_urls=[tmp_sqlite("replica")],
+        read_your_writes_s=60,
+    )
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield db
+    await db.dispose()
+
+
+def test_pin_expires(tmp_sqlite, clock):
+    db = Database(tmp_sqlite(), read_your_writes_s=5)
+    db.pin("client")
+    assert db.is_pinned("client")
+    clock.now += 5
+    assert db.is_pinned("client")
+    clock.now += 0.1
+    assert not db.is_pinned("client")
+    assert "client" not in db._pinned
+
+
+def test_pin_prunes_expired_entries(tmp_sqlite, clock):
+    db = Database(tmp_sqlite(), read_your_writes_s=5)
+    db.pin("a")
+    clock.now += 3
+    db.pin("b")
+    clock.now += 3
+    db.pin("c")
+    assert list(db._pinned) == ["b", "c"]
+    db.pin("b")
+    assert list(db._pinned) == ["c", "b"]
+    assert db._pinned["b"] == clock.now + 5
+
+
+def test_pin_disabled(tmp_sqlite, clock):
+    db = Database(tmp_sqlite(), read_your_writes_s=0)
+    db.pin("client")
+    assert not db.is_pinned("client")
+    assert not db._pinned
+
+
+def test_no_client_id_no_pin():
+    assert get_client_id(None) is None
+    assert get_client_id("") is None
+    assert get_client_id("client") == "client"
+
+
+@pytest.mark.anyio
+async def test_write_pins_only_that_client(db):
+    async with db.session("writer") as session:
+        session.add(Building(address="a", lat=55.75, lon=37.61))
+    async with db.session(None) as session:
+        session.add(Building(address="b", lat=55.80, lon=37.70))
+    async with db.session("reader") as session:
+        await session.get(Building, uuid4())
+    assert list(db._pinned) == ["writer"]
+
+    async with db.read_session("writer") as session:
+        assert session.bind.url.database.endswith("primary.sqlite")
+    async with db.read_session("reader") as session:
+        assert session.bind.url.database.endswith("replica.sqlite")
+    async with db.read_session(None) as session:
+        assert session.bind.url.database.endswith("replica.sqlite")
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(("error", "healthy"), [
+    (DBAPIError("SELECT 1", {}, Exception("terminated"),
+                connection_invalidated=True), False),
+    (ConnectionRefusedError("refused"), False),
+    (DBAPIError("SELECT 1", {}, Exception("statement timeout")), True),
+    (ValueError("not a database error"), True),
+])
+async def test_replica_ejected_on_connection_loss(db, error, healthy):
+    replica = db.replicas[0]
+    with pytest.raises(type(error)):
+        async with db.read_session() as session:
+            assert session.bind.url.database.endswith("replica.sqlite")
+            raise error
+    assert replica.healthy is healthy
+    assert replica.in_use == 0
+
+    # без здоровых реплик чтения идут в primary, проверка возвращает реплику
+    async with db.read_session() as session:
+        expected = "replica.sqlite" if healthy else "primary.sqlite"
+        assert session.bind.url.database.endswith(expected)
+    await db.check_replicas()
+    assert replica.healthy
@@ -0,0 +1,273 @@
+import base64
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.database import Activity, Building, Office, Organization, \
+    OrganizationPhone
+from app.database.base import Base
+from app.database.database import get_database
+from app.main import app
+from app.repositories.pagination import encode_cursor
+
+PREFIX = "/api/v1/organizations"
+MOSCOW = {"lat_min": 55.7, "lat_max": 55.9, "lon_min": 37.5, "lon_max": 37.8}
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def catalog():
+    """30 organizations, names repeat three times: order ties go to id"""
+    db = get_database()
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with db.session() as session:
+        food = Activity(name="Food", level=0)
+        meat = Activity(name="Meat", parent=food, level=1)
+        beef = Activity(name="Beef", parent=meat, level=2)
+        cars = Activity(name="Cars", level=0)
+        activities = [food, meat, beef, cars]
+        buildings = [
+            Building(address="Moscow, 1", lat=55.75, lon=37.61),
+            Building(address="Moscow, 2", lat=55.80, lon=37.70),
+            Building(address="Saint Petersburg, 1", lat=59.93, lon=30.31),
+        ]
+        orgs = []
+        for i in range(30):
+            org = Organization(name=f"Org {i % 10:02d}")
+            org.phones = [OrganizationPhone(phone_number=f"8-800-{i:03d}")]
+            org.offices = [Office(building=buildings[i % 3], floor=i)]
+            org.activities = [activities[i % 4]]
+            orgs.append(org)
+        session.add_all([*activities, *buildings, *orgs])
+    yield {
+        "activities": {a.name: a.id for a in activities},
+        "buildings": [b.id for b in buildings],
+        "orgs": {
+            org.id: {
+                "name": org.name,
+                "building": buildings[i % 3].id,
+                "activity": activities[i % 4].name,
+            }
+            for i, org in enumerate(orgs)
+        },
+    }
+    await db.dispose()
+
+
+@pytest.fixture
+async def client(catalog, monkeypatch):
+    # бэкенды и сериализаторы переключаются настройками: без кэша ответов
+    monkeypatch.setattr(settings, "cache_enabled", False)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test",
+        headers={"X-API-Key": settings.api_key},
+    ) as client:
+        yield client
+
+
+async def walk(client, path, params, limit=4):
+    """every page of a list route, checking total on each of them"""
+    items, cursor, totals = [], None, set()
+    while True:
+        query = {**params, "limit": limit, "with_total": True}
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = await client.get(f"{PREFIX}{path}", params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["items"]) <= limit
+        totals.add(body["total"])
+        items.extend(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            assert totals == {len(items)}
+            return items
+
+
+def expected(catalog, keep):
+    return sorted(
+        (org["name"], str(org_id))
+        for org_id, org in catalog["orgs"].items() if keep(org)
+    )
+
+
+def in_subtree(*names):
+    return lambda org: org["activity"] in names
+
+
+@pytest.mark.parametrize("org_documents", [True, False])
+async def test_walk_by_building_and_activity(
+    client, catalog, monkeypatch, org_documents,
+):
+    monkeypatch.setattr(settings, "org_documents", org_documents)
+    building = catalog["buildings"][0]
+    items = await walk(client, f"/by-building/{building}", {})
+    assert [(i["name"], i["id"]) for i in items] == expected(
+        catalog, lambda org: org["building"] == building
+    )
+
+    food = catalog["activities"]["Food"]
+    items = await walk(client, f"/by-activity/{food}", {})
+    assert [(i["name"], i["id"]) for i in items] == expected(
+        catalog, in_subtree("Food", "Meat", "Beef")
+    )
+    items = await walk(client, f"/by-activity/{food}", {"max_depth": 2})
+    assert [(i["name"], i["id"]) for i in items] == expected(
+        catalog, in_subtree("Food", "Meat")
+    )
+
+
+async def test_walk_geo_and_query(client, catalog):
+    moscow = catalog["buildings"][:2]
+    items = await walk(client, "/geo", MOSCOW)
+    assert [(i["name"], i["id"]) for i in items] == expected(
+        catalog, lambda org: org["building"] in moscow
+    )
+
+    meat = catalog["activities"]["Meat"]
+    items = await walk(client, "/query", {**MOSCOW, "activity_id": meat})
+    assert [(i["name"], i["id"]) for i in items] == expected(
+        catalog,
+        lambda org: org["building"] in moscow
+        and org["activity"] in ("Meat", "Beef"),
+    )
+
+
+async def test_walk_ranked_search(client, catalog):
+    items = await walk(client, "/search", {"q": "org 0"}, limit=7)
+    assert sorted((i["name"], i["id"]) for i in items) == expected(
+        catalog, lambda org: True
+    )
+    items = await walk(client, "/search", {"q": "Org 07"}, limit=2)
+    assert {i["name"] for i in items} == {"Org 07"}
+    assert len(items) == 3
+
+
+def _raw_cursor(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(("path", "cursor"), [
+    ("/geo", "not a cursor"),
+    ("/geo", _raw_cursor(b'{"name": "Org 00"}')),
+    ("/geo", _raw_cursor(b"[1, 2]")),
+    ("/geo", encode_cursor(["Org 00"])),
+    ("/geo", encode_cursor(["Org 00", "not-a-uuid"])),
+    ("/geo", encode_cursor(["0.5", "Org 00", str(uuid4())])),
+    ("/search", encode_cursor(["Org 00", str(uuid4())])),
+    ("/search", encode_cursor(["high", "Org 00", str(uuid4())])),
+])
+async def test_tampered_cursor_is_400(client, path, cursor):
+    params = {**MOSCOW, "q": "org", "cursor": cursor}
+    response = await client.get(f"{PREFIX}{path}", params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Некорректный курсор пагинации"
+
+
+async def rename(org_id: UUID, name: str) -> None:
+    async with get_database().session() as session:
+        org = await session.get(Organization, org_id)
+        org.name = name
+        # now() в SQLite с точностью до секунды: правка в ту же секунду
+        # не сдвинула бы updated_at
+        org.updated_at += timedelta(seconds=1)
+
+
+@pytest.mark.parametrize("kind", ["detail", "list"])
+async def test_etag_not_modified(client, catalog, kind):
+    org_id = next(iter(catalog["orgs"]))
+    if kind == "detail":
+        path = f"{PREFIX}/{org_id}"
+    else:
+        path = f"{PREFIX}/by-building/{catalog['orgs'][org_id]['building']}"
+
+    first = await client.get(path)
+    etag = first.headers["ETag"]
+    cached = await client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    if kind == "list":
+        # слабый тег зависит и от параметров запроса
+        other = await client.get(path, params={"limit": 5})
+        assert other.headers["ETag"] != etag
+
+    await rename(org_id, "Org 00 renamed")
+    try:
+        changed = await client.get(path, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert "Org 00 renamed" in changed.text
+    finally:
+        await rename(org_id, catalog["orgs"][org_id]["name"])
+
+
+async def test_batch_keeps_order_and_reports_missing(client, catalog):
+    known = list(catalog["orgs"])[:3]
+    missing = uuid4()
+    ids = [str(known[2]), str(missing), str(known[0])]
+    response = await client.post(f"{PREFIX}/batch", json={"ids": ids})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["id"] for item in items] == ids
+    assert [item["found"] for item in items] == [True, False, True]
+    assert items[1]["organization"] is None
+    assert items[0]["organization"]["id"] == ids[0]
+    assert items[0]["organization"]["activities"]
+
+
+async def test_fields_projection(client, catalog):
+    building = catalog["buildings"][0]
+    response = await client.get(
+        f"{PREFIX}/by-building/{building}", params={"fields": "id,name"}
+    )
+    assert response.status_code == 200
+    assert all(set(item) == {"id", "name"}
+               for item in response.json()["items"])
+    response = await client.get(
+        f"{PREFIX}/by-building/{building}", params={"fields": "id,secret"}
+    )
+    assert response.status_code == 400
+
+
+async def test_fast_serialization_is_byte_identical(
+    client, catalog, monkeypatch,
+):
+    org_ids = list(catalog["orgs"])
+    food = catalog["activities"]["Food"]
+    requests = [
+        ("GET", f"/{org_ids[0]}", {}),
+        ("GET", f"/by-building/{catalog['buildings'][1]}", {}),
+        ("GET", f"/by-activity/{food}", {"with_total": True}),
+        ("GET", "/geo", MOSCOW),
+        ("GET", "/geo", {**MOSCOW, "fields": "name,phones"}),
+        ("GET", "/search", {"q": "org 0"}),
+        ("GET", "/nearby", {"lat": 55.75, "lon": 37.61, "k": 5}),
+        ("GET", "/facets/activities", MOSCOW),
+        ("POST", "/batch", {"ids": [str(org_ids[1]), str(uuid4())]}),
+    ]
+
+    async def fetch(fast: bool) -> list[tuple[int, bytes, str | None]]:
+        monkeypatch.setattr(settings, "fast_serialization", fast)
+        responses = []
+        for method, path, params in requests:
+            if method == "POST":
+                response = await client.post(f"{PREFIX}{path}", json=params)
+            else:
+                response = await client.get(f"{PREFIX}{path}", params=params)
+            responses.append((
+                response.status_code, response.content,
+                response.headers.get("ETag"),
+            ))
+        return responses
+
+    fast, classic = await fetch(True), await fetch(False)
+    assert all(status == 200 for status, _, _ in fast)
+    assert fast == classic